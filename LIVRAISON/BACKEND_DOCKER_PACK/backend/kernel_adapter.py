@@ -1,11 +1,17 @@
 """
 Adapter pour intégrer le noyau Al Sâdika au backend FastAPI.
-- Orchestrateurs par session
-- Fonctions d'aide: run_kernel, memory_approve/get, evaluator_feedback, mutate_summarizer
+- Orchestrateurs par session (pool borné LRU + TTL, composants partagés), session_stats
+- Fonctions d'aide: run_kernel(_cached), run_kernel_chunked, memory_approve/get, evaluator_feedback, mutate_summarizer
+- Doublons concurrents de run_kernel_chunked coalescés (single-flight)
 - Hybride: build_hybrid_system_message, post_filter_identity
 """
-from typing import Dict, Optional, Tuple
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+import os
 import re
+import sys
+import threading
+import time
 from al_sadika_core_v2 import (
     Verrou,
     Memory,
@@ -25,28 +31,155 @@ except Exception:
         def critique(self, prompt: str, draft: str):
             return {"cautions": [], "confidence": 0.9}
 
-_sessions: Dict[str, Orchestrator] = {}
+# Cache de réponses (patch KCACHE du noyau, opt-in via ALSADIKA_KCACHE); absent -> pas de cache
+try:
+    from al_sadika_core_v2 import KCACHE, KCACHE_ENABLED, kernel_cache_key, kcache_charge, kcache_footers  # type: ignore
+except Exception:
+    KCACHE, KCACHE_ENABLED = None, False
+
+# Single-flight: version d'état du noyau dans la clé, débit énergie rejoué pour chaque doublon
+try:
+    from al_sadika_core_v2 import kernel_state_stamp, kcache_charge as _charge_duplicate  # type: ignore
+except Exception:
+    import al_sadika_core_v2 as _core
 
+    def kernel_state_stamp() -> str:
+        """Noyau sans patch KCACHE: version (mtime, taille) des fichiers d'état connus."""
+        parts = []
+        for name in ("MEM_FILE", "VARIANTS_FILE", "DOCS_INDEX"):
+            try:
+                st = os.stat(getattr(_core, name))
+                parts.append(f"{st.st_mtime_ns}:{st.st_size}")
+            except Exception:
+                parts.append("-")
+        return "|".join(parts)
+
+    _charge_duplicate = None
+from singleflight import SingleFlight, flight_key, normalize
+
+SESSION_MAX = int(os.environ.get("ALSADIKA_SESSION_MAX", "256"))
+SESSION_TTL = float(os.environ.get("ALSADIKA_SESSION_TTL", "1800"))  # secondes d'inactivité
+
+
+class _Shared:
+    """Composants sans état par session (verrou, mémoire, skills, moteurs), partagés par tous les orchestrateurs."""
+
+    def __init__(self):
+        self.version = 0
+        self._parts: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+
+    def parts(self) -> Dict[str, Any]:
+        with self._lock:
+            if self._parts is None:
+                skills = SkillRegistry()
+                self._parts = {
+                    "verrou": Verrou(True),
+                    "memory": Memory.load(),
+                    "lang": LanguageEngine(skills),
+                    "logic": LogicEngine(),
+                    "act": ActionEngine(),
+                }
+                self.version += 1
+            return self._parts
+
+    def invalidate(self) -> None:
+        # après approbation mémoire ou mutation de skill: instantané rechargé au prochain accès
+        with self._lock:
+            self._parts = None
+
+
+_shared = _Shared()
+
+
+def _entry_bytes(orch: Orchestrator) -> int:
+    # coût propre à la session: l'orchestrateur et ses attributs hors composants partagés
+    shared = {id(v) for v in (_shared._parts or {}).values()}
+    n = sys.getsizeof(orch) + sys.getsizeof(orch.__dict__)
+    for v in orch.__dict__.values():
+        if id(v) not in shared:
+            n += sys.getsizeof(v)
+    return n
+
+
+class SessionPool:
+    """Orchestrateurs par session: LRU borné à max_size, expiration après ttl secondes d'inactivité."""
+
+    def __init__(self, max_size: int = SESSION_MAX, ttl: float = SESSION_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._items: "OrderedDict[str, list]" = OrderedDict()   # sid -> [orch, last_used, bytes, shared_version]
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evicted_lru = self.evicted_ttl = 0
+
+    def _expire(self, now: float) -> None:
+        while self._items:
+            sid, ent = next(iter(self._items.items()))
+            if now - ent[1] < self.ttl:
+                break
+            del self._items[sid]
+            self.evicted_ttl += 1
+
+    def get(self, session_id: str, mode: str = "public") -> Orchestrator:
+        parts = _shared.parts()
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            ent = self._items.get(session_id)
+            if ent is None:
+                self.misses += 1
+                orch = Orchestrator(parts["verrou"], parts["memory"], parts["lang"], parts["logic"], parts["act"], mode=mode)
+                ent = [orch, now, 0, _shared.version]
+                self._items[session_id] = ent
+                while len(self._items) > self.max_size:
+                    self._items.popitem(last=False)
+                    self.evicted_lru += 1
+            else:
+                self.hits += 1
+                orch = ent[0]
+                if ent[3] != _shared.version:
+                    for k, v in parts.items():
+                        setattr(orch, k, v)
+                    ent[3] = _shared.version
+                if getattr(orch, "mode", None) != mode:
+                    setattr(orch, "mode", mode)
+                ent[1] = now
+                self._items.move_to_end(session_id)
+            ent[2] = _entry_bytes(orch)
+            return orch
+
+    def drop(self, session_id: str) -> bool:
+        with self._lock:
+            return self._items.pop(session_id, None) is not None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._expire(time.monotonic())
+            return {
+                "size": len(self._items),
+                "max_size": self.max_size,
+                "ttl_s": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evicted_lru": self.evicted_lru,
+                "evicted_ttl": self.evicted_ttl,
+                "bytes": sum(e[2] for e in self._items.values()),
+                "shared_version": _shared.version,
+            }
 
-def _new_orchestrator(mode: str = "public") -> Orchestrator:
-    verrou = Verrou(True)
-    mem = Memory.load()
-    skills = SkillRegistry()
-    return Orchestrator(verrou, mem, LanguageEngine(skills), LogicEngine(), ActionEngine(), mode=mode)
+
+_sessions = SessionPool()
 
 
 def get_orchestrator(session_id: str, mode: str = "public") -> Orchestrator:
-    orch = _sessions.get(session_id)
-    if orch is None:
-        orch = _new_orchestrator(mode)
-        _sessions[session_id] = orch
-    else:
-        if getattr(orch, "mode", None) != mode:
-            setattr(orch, "mode", mode)
-    return orch
+    return _sessions.get(session_id, mode)
 
 
-def run_kernel(session_id: str, prompt: str, mode: str = "public", council: Optional[int] = None, truth: Optional[bool] = None) -> str:
+def session_stats() -> Dict[str, Any]:
+    return _sessions.stats()
+
+
+def _run_kernel(session_id: str, prompt: str, mode: str = "public", council: Optional[int] = None, truth: Optional[bool] = None) -> str:
     orch = get_orchestrator(session_id, mode)
     if isinstance(council, int) and 1 <= council <= 5:
         setattr(orch, "council_n", council)
@@ -55,6 +188,81 @@ def run_kernel(session_id: str, prompt: str, mode: str = "public", council: Opti
     out = orch.handle(prompt)
     return out or ""
 
+
+def run_kernel_cached(session_id: str, prompt: str, mode: str = "public", council: Optional[int] = None,
+                      truth: Optional[bool] = None) -> Tuple[str, bool]:
+    """-> (réponse, hit). Clé: prompt, mode, council, truth + versions d'état du noyau.
+    Sur un hit: corps mis en cache + pieds de page (provenance, miroir, cachets) recalculés."""
+    if not KCACHE_ENABLED:
+        return _run_kernel(session_id, prompt, mode=mode, council=council, truth=truth), False
+    key = kernel_cache_key(prompt, fn="run_kernel", mode=mode, council=council, truth=truth)
+    ent = KCACHE.get(key)
+    if ent is not None:
+        refused = kcache_charge(prompt)
+        if refused:
+            return refused, False
+        return ent["body"] + kcache_footers(prompt, ent["body"], ent["tail"], mode=mode), True
+    out = _run_kernel(session_id, prompt, mode=mode, council=council, truth=truth)
+    KCACHE.put(key, out)
+    return out, False
+
+
+def run_kernel(session_id: str, prompt: str, mode: str = "public", council: Optional[int] = None, truth: Optional[bool] = None) -> str:
+    return run_kernel_cached(session_id, prompt, mode=mode, council=council, truth=truth)[0]
+
+
+# Blocs ajoutés en fin de réponse par le noyau (prudence, confiance, cachets)
+_STAGE_SPLIT = re.compile(r"(?=\n\n\[Prudence\]|\n\[Confiance\]|\s\[KP:|\n\[KernelPrimus\]|\n\[Prov\]|\s\[Mirror|\n\[Cathedral\])")
+_STAGE_OF = (("[Prudence]", "cautions"), ("[Confiance]", "footer"), ("[KP:", "footer"), ("[KernelPrimus]", "footer"), ("[Prov]", "footer"),
+            ("[Mirror", "footer"), ("[Cathedral]", "footer"))
+
+
+def _split_stages(text: str) -> Iterator[Dict[str, str]]:
+    for part in _STAGE_SPLIT.split(text):
+        if not part:
+            continue
+        head = part.lstrip()
+        stage = next((s for tag, s in _STAGE_OF if head.startswith(tag)), "draft")
+        yield {"stage": stage, "text": part}
+
+
+KERNEL_FLIGHT = SingleFlight("kernel")
+
+# Réponses propres au meneur (quotas), jamais partagées avec les doublons
+_NOT_SHARED = re.compile(r"^\s*(Énergie insuffisante|Limite de débit|Je suis épuisée)")
+
+
+def _kernel_chunks(session_id: str, prompt: str, mode: str, council: Optional[int], truth: Optional[bool]) -> Iterator[Dict[str, str]]:
+    out, hit = run_kernel_cached(session_id, prompt, mode=mode, council=council, truth=truth)
+    return iter([{"stage": "cached", "text": out, "hit": True}]) if hit else _split_stages(out)
+
+
+def _join_refusal(prompt: str):
+    refused = _charge_duplicate(prompt) if _charge_duplicate is not None else None
+    return [{"stage": "draft", "text": refused}] if refused else None
+
+
+def run_kernel_chunked(session_id: str, prompt: str, mode: str = "public", council: Optional[int] = None,
+                       truth: Optional[bool] = None, on_chunk: Optional[Callable[[dict], None]] = None) -> Iterator[Dict[str, str]]:
+    """
+    run_kernel découpé a posteriori en {"stage", "text"} (draft, cautions, footer). Orchestrator.handle
+    s'exécute en entier avant le premier fragment: aucun gain de latence (flux réellement incrémental:
+    kernel_stream du noyau complet). La concaténation des textes est identique à run_kernel.
+    Sur un hit du cache: un seul fragment {"stage": "cached", "hit": True}. Les requêtes identiques
+    concurrentes (prompt normalisé, mode, council, truth) partagent une exécution: fragments marqués "shared".
+    """
+    key = flight_key("run_kernel", normalize(prompt), mode, council, truth, kernel_state_stamp())
+    chunks = KERNEL_FLIGHT.stream(
+        key, lambda: _kernel_chunks(session_id, prompt, mode, council, truth),
+        shareable=lambda ch: not _NOT_SHARED.match(ch["text"]),
+        on_join=lambda: _join_refusal(prompt),
+        mark=lambda ch: {**ch, "shared": True},
+    )
+    for ch in chunks:
+        if on_chunk is not None:
+            on_chunk(ch)
+        yield ch
+
 # --- Mémoire & Feedback ---
 
 def memory_get() -> dict:
@@ -64,6 +272,7 @@ def memory_get() -> dict:
 def memory_approve(key: str, value) -> None:
     mem = Memory.load()
     mem.approve(key, value)
+    _shared.invalidate()
 
 
 def evaluator_feedback(label: str) -> None:
@@ -72,7 +281,9 @@ def evaluator_feedback(label: str) -> None:
 
 
 def mutate_summarizer(trials: int = 5) -> dict:
-    return SkillRegistry().mutate("summarizer", trials=max(1, int(trials)))
+    res = SkillRegistry().mutate("summarizer", trials=max(1, int(trials)))
+    _shared.invalidate()
+    return res
 
 
 # --- Hybride Noyau + LLM ---
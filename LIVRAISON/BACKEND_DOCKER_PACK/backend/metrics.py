@@ -0,0 +1,201 @@
+"""
+Métriques au format texte Prometheus (exposition 0.0.4), sans dépendance.
+- Counter / Gauge / Histogram avec labels
+- Collecteurs appelés au scrape (état du noyau, pools, caches)
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _esc(v) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_esc(v)}"' for n, v in zip(names, values)) + "}"
+
+
+def _num(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple, object] = {}
+
+    def _key(self, labels: Dict[str, object]) -> Tuple:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        k = self._key(labels)
+        with self._lock:
+            self._values[k] = self._values.get(k, 0) + amount
+
+    def lines(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [f"{self.name}{_labels(self.labelnames, k)} {_num(v)}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        k = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            st = self._values.get(k)
+            if st is None:
+                st = self._values[k] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            st[0][i] += 1
+            st[1] += value
+            st[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def lines(self) -> List[str]:
+        with self._lock:
+            items = [(k, ([*st[0]], st[1], st[2])) for k, st in self._values.items()]
+        out = self.header()
+        for k, (counts, total, n) in items:
+            out += histogram_series(self.name, self.labelnames, k, self.buckets, counts, total, n)
+        return out
+
+
+def histogram_series(name: str, labelnames: Sequence[str], labelvalues: Sequence, buckets: Sequence[float],
+                     counts: Sequence[int], total: float, n: int) -> List[str]:
+    """Série d'un histogramme à partir de comptes par bucket (non cumulés, dernier = +Inf)."""
+    out, acc = [], 0
+    for le, c in zip(list(buckets) + [float("inf")], counts):
+        acc += c
+        out.append(f"{name}_bucket{_labels(tuple(labelnames) + ('le',), tuple(labelvalues) + (_num(le),))} {acc}")
+    out.append(f"{name}_sum{_labels(labelnames, labelvalues)} {_num(float(total))}")
+    out.append(f"{name}_count{_labels(labelnames, labelvalues)} {n}")
+    return out
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], Iterable[str]]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, fn: Callable[[], Iterable[str]]) -> Callable[[], Iterable[str]]:
+        """fn() -> lignes d'exposition, appelée à chaque scrape; une erreur n'interrompt pas le scrape."""
+        self._collectors.append(fn)
+        return fn
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for m in self._metrics:
+            lines += m.lines()
+        for fn in self._collectors:
+            try:
+                lines += list(fn())
+            except Exception:
+                pass
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, help, labelnames))
+
+
+def gauge(name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+    return REGISTRY.register(Gauge(name, help, labelnames))
+
+
+def histogram(name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, help, labelnames, buckets))
+
+
+def family(name: str, kind: str, help: str, samples: Iterable[Tuple[Dict[str, object], float]]) -> List[str]:
+    """Famille simple (counter/gauge) pour les collecteurs: samples = [(labels, valeur)]."""
+    out = [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+    for labels, v in samples:
+        out.append(f"{name}{_labels(tuple(labels), tuple(labels.values()))} {_num(v)}")
+    return out
+
+
+def render() -> str:
+    return REGISTRY.render()
+
+
+def kstats_lines(snap: dict) -> List[str]:
+    """Exposition de al_sadika_core_v2.kstats_snapshot(): RAG, portes, E/S du store, cache de réponses."""
+    out = ["# HELP alsadika_rag_query_seconds Latence des requêtes RAG par moteur",
+           "# TYPE alsadika_rag_query_seconds histogram"]
+    for engine, h in sorted((snap.get("rag") or {}).items()):
+        out += histogram_series("alsadika_rag_query_seconds", ("engine",), (engine,), h["buckets"], h["counts"], h["sum"], h["count"])
+    out += family("alsadika_gate_rejections_total", "counter", "Refus des portes énergie/fatigue",
+                  [({"gate": g}, n) for g, n in sorted((snap.get("gates") or {}).items())])
+    out += family("alsadika_store_file_ops_total", "counter", "Lectures/écritures du store .alsadika (backend d'état, LogStore, helpers JSON)",
+                  [({"op": op}, n) for op, n in sorted((snap.get("store") or {}).items())])
+    kc = snap.get("kcache")
+    if kc:
+        out += family("alsadika_kernel_cache_requests_total", "counter", "Consultations du cache de réponses noyau",
+                      [({"result": "hit"}, kc.get("hits", 0)), ({"result": "miss"}, kc.get("misses", 0))])
+        out += family("alsadika_kernel_cache_entries", "gauge", "Entrées en mémoire du cache de réponses noyau",
+                      [({}, kc.get("size", 0))])
+    return out
+
+
+def sflight_lines(stats: dict) -> List[str]:
+    """Exposition de singleflight.stats(): {nom: {leader, joined, fallback, inflight}}."""
+    out = family("alsadika_singleflight_requests_total", "counter",
+                 "Requêtes coalescées: leader = exécution, joined = doublon servi, fallback = exécution indépendante",
+                 [({"flight": name, "role": role}, st.get(role, 0))
+                  for name, st in sorted(stats.items()) for role in ("leader", "joined", "fallback")])
+    out += family("alsadika_singleflight_inflight", "gauge", "Exécutions partagées en cours",
+                  [({"flight": name}, st.get("inflight", 0)) for name, st in sorted(stats.items())])
+    return out
@@ -1,8 +1,11 @@
-from fastapi import FastAPI, APIRouter, HTTPException
-from fastapi.responses import StreamingResponse
+from fastapi import FastAPI, APIRouter, HTTPException, Query
+from fastapi.responses import Response, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING
+from bson import ObjectId
+from bson.errors import InvalidId
 import os
 import logging
 from pathlib import Path
@@ -12,6 +15,7 @@ import uuid
 from datetime import datetime
 import json
 import asyncio
+import time
 
 # LLM integration (Emergent Integrations)
 from emergentintegrations.llm.chat import LlmChat, UserMessage
@@ -19,15 +23,24 @@ from emergentintegrations.llm.chat import LlmChat, UserMessage
 try:
     from kernel_adapter import (
         run_kernel,
+        run_kernel_chunked,
         memory_get,
         memory_approve,
         evaluator_feedback,
         mutate_summarizer,
         build_hybrid_system_message,
         post_filter_identity,
+        session_stats,
     )
 except Exception:
     run_kernel = None
+    session_stats = None
+try:
+    from al_sadika_core_v2 import kstats_snapshot  # patch KSTATS (noyau complet uniquement)
+except Exception:
+    kstats_snapshot = None
+import metrics
+import singleflight
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env', override=True)
@@ -41,6 +54,10 @@ db = client[os.environ['DB_NAME']]
 EMERGENT_LLM_KEY = os.environ.get('EMERGENT_LLM_KEY')
 llm_client = True if EMERGENT_LLM_KEY else None  # flag only; we instantiate LlmChat per-request
 
+# Regroupement des fragments SSE: 0 = chaque fragment part immédiatement
+SSE_COALESCE_CHARS = int(os.environ.get('ALSADIKA_SSE_COALESCE_CHARS', '0'))
+SSE_COALESCE_MS = float(os.environ.get('ALSADIKA_SSE_COALESCE_MS', '0'))
+
 # Create the main app without a prefix
 app = FastAPI()
 
@@ -69,8 +86,9 @@ async def create_status_check(input: StatusCheckCreate):
     return status_obj
 
 @api_router.get("/status", response_model=List[StatusCheck])
-async def get_status_checks():
-    status_checks = await db.status_checks.find().to_list(1000)
+async def get_status_checks(limit: int = Query(100, ge=1, le=1000)):
+    cursor = db.status_checks.find({}, {"_id": 0}).sort("timestamp", DESCENDING).limit(limit)
+    status_checks = await cursor.to_list(limit)
     return [StatusCheck(**status_check) for status_check in status_checks]
 
 
@@ -91,43 +109,166 @@ class ChatStreamInput(BaseModel):
 class ChatHistoryResponse(BaseModel):
     session_id: str
     messages: List[Dict[str, Any]]
-
-SESSION_COL = "chat_sessions"
+    next_cursor: Optional[str] = None
+
+SESSION_COL = "chat_sessions"     # métadonnées de session (sans les messages)
+MESSAGE_COL = "chat_messages"     # un document par message, index (session_id, ts, _id)
+HISTORY_WINDOW = int(os.environ.get('CHAT_HISTORY_WINDOW', '40'))   # derniers messages envoyés au LLM
+HISTORY_PAGE_MAX = 500
+
+@app.on_event("startup")
+async def ensure_indexes():
+    # _id départage les ts égaux (pagination par curseur) sans tri en mémoire
+    await db[MESSAGE_COL].create_index([("session_id", ASCENDING), ("ts", ASCENDING), ("_id", ASCENDING)])
+
+async def _migrate_embedded(session_id: str) -> None:
+    # anciennes sessions: messages $push-és dans le document de session -> collection dédiée.
+    # Le tableau est réclamé atomiquement ($unset): une seule requête concurrente le migre.
+    doc = await db[SESSION_COL].find_one_and_update(
+        {"session_id": session_id, "messages": {"$exists": True}},
+        {"$unset": {"messages": ""}},
+        projection={"messages": 1},
+    )
+    if not doc:
+        return
+    msgs = doc.get("messages") or []
+    if msgs:
+        await db[MESSAGE_COL].insert_many([
+            {"session_id": session_id, "role": m.get("role"), "content": m.get("content"),
+             "ts": m.get("ts") or datetime.utcnow(), "meta": m.get("meta") or {}}
+            for m in msgs
+        ])
+        await db[SESSION_COL].update_one({"_id": doc["_id"]}, {"$inc": {"message_count": len(msgs)}})
 
 async def ensure_session(session_id: Optional[str]) -> str:
     sid = session_id or (str(uuid.uuid4()))
-    existing = await db[SESSION_COL].find_one({"session_id": sid})
-    if not existing:
-        await db[SESSION_COL].insert_one({
-            "session_id": sid,
-            "created_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow(),
-            "messages": []
-        })
+    res = await db[SESSION_COL].update_one(
+        {"session_id": sid},
+        {"$setOnInsert": {"session_id": sid, "created_at": datetime.utcnow(), "updated_at": datetime.utcnow(), "message_count": 0}},
+        upsert=True
+    )
+    if res.upserted_id is None:
+        await _migrate_embedded(sid)
     return sid
 
 async def append_message(session_id: str, role: str, content: str, meta: Optional[Dict[str, Any]] = None):
+    ts = datetime.utcnow()
+    await db[MESSAGE_COL].insert_one({"session_id": session_id, "role": role, "content": content, "ts": ts, "meta": meta or {}})
     await db[SESSION_COL].update_one(
         {"session_id": session_id},
-        {
-            "$push": {"messages": {"role": role, "content": content, "ts": datetime.utcnow(), "meta": meta or {}}},
-            "$set": {"updated_at": datetime.utcnow()}
-        },
+        {"$set": {"updated_at": ts}, "$inc": {"message_count": 1}},
         upsert=True
     )
 
-async def get_history(session_id: str) -> List[Dict[str, Any]]:
-    doc = await db[SESSION_COL].find_one({"session_id": session_id})
-    return (doc or {}).get("messages", [])
+async def get_history(session_id: str, limit: int = HISTORY_WINDOW, projection: Optional[Dict[str, int]] = None) -> List[Dict[str, Any]]:
+    """Les `limit` derniers messages, du plus ancien au plus récent."""
+    proj = projection or {"_id": 0, "role": 1, "content": 1, "ts": 1, "meta": 1}
+    cursor = db[MESSAGE_COL].find({"session_id": session_id}, proj).sort([("ts", DESCENDING), ("_id", DESCENDING)]).limit(limit)
+    msgs = await cursor.to_list(limit)
+    msgs.reverse()
+    return msgs
+
+def _encode_cursor(m: Dict[str, Any]) -> str:
+    return f"{m['ts'].isoformat()}|{m['_id']}"
+
+def _decode_cursor(cursor: str):
+    try:
+        ts, oid = cursor.split("|", 1)
+        return datetime.fromisoformat(ts), ObjectId(oid)
+    except (ValueError, InvalidId):
+        raise HTTPException(status_code=400, detail="cursor invalide")
 
 
 # ======== Chat Endpoints ========
 @api_router.get("/chat/history", response_model=ChatHistoryResponse)
-async def chat_history(sessionId: str):
+async def chat_history(sessionId: str, limit: int = Query(50, ge=1, le=HISTORY_PAGE_MAX), before: Optional[str] = None):
+    """Pagination à rebours: `before` = next_cursor de la page précédente."""
     if not sessionId:
         raise HTTPException(status_code=400, detail="sessionId required")
-    msgs = await get_history(sessionId)
-    return {"session_id": sessionId, "messages": msgs}
+    await _migrate_embedded(sessionId)
+    query: Dict[str, Any] = {"session_id": sessionId}
+    if before:
+        ts, oid = _decode_cursor(before)
+        query["$or"] = [{"ts": {"$lt": ts}}, {"ts": ts, "_id": {"$lt": oid}}]
+    cursor = (db[MESSAGE_COL]
+              .find(query, {"role": 1, "content": 1, "ts": 1, "meta": 1})
+              .sort([("ts", DESCENDING), ("_id", DESCENDING)])
+              .limit(limit + 1))
+    page = await cursor.to_list(limit + 1)
+    next_cursor = _encode_cursor(page[limit - 1]) if len(page) > limit else None
+    msgs = [{k: v for k, v in m.items() if k != "_id"} for m in page[:limit]]
+    msgs.reverse()
+    return {"session_id": sessionId, "messages": msgs, "next_cursor": next_cursor}
+
+
+def _sse_content(text: str) -> str:
+    return f"data: {json.dumps({'type': 'content', 'content': text})}\n\n"
+
+
+async def _iter_in_thread(it) -> AsyncGenerator[Any, None]:
+    """Itère un générateur bloquant (noyau) hors de la boucle asyncio."""
+    it = iter(it)
+    done = object()
+    while True:
+        item = await asyncio.to_thread(next, it, done)
+        if item is done:
+            return
+        yield item
+
+
+async def _coalesce(chunks: AsyncGenerator[str, None]) -> AsyncGenerator[str, None]:
+    """Regroupe les fragments jusqu'à SSE_COALESCE_CHARS caractères ou SSE_COALESCE_MS ms, sans jamais attendre."""
+    buf, n, t0 = [], 0, time.monotonic()
+    async for c in chunks:
+        if not c:
+            continue
+        buf.append(c)
+        n += len(c)
+        if n >= SSE_COALESCE_CHARS or (SSE_COALESCE_MS and (time.monotonic() - t0) * 1000 >= SSE_COALESCE_MS):
+            yield "".join(buf)
+            buf, n, t0 = [], 0, time.monotonic()
+    if buf:
+        yield "".join(buf)
+
+
+# ======== Metrics (/api/metrics, format texte Prometheus) ========
+REQUESTS = metrics.counter("alsadika_requests_total", "Requêtes chat par fournisseur", ["provider"])
+FIRST_CHUNK = metrics.histogram("alsadika_request_ttfb_seconds", "Délai jusqu'au premier fragment de contenu", ["provider"])
+STREAM_TIME = metrics.histogram("alsadika_sse_stream_seconds", "Durée totale des flux SSE", ["provider"])
+LLM_TTFT = metrics.histogram("alsadika_llm_ttft_seconds", "Délai amont LLM jusqu'au premier token (réponse complète pour LlmChat)", ["provider"])
+
+# Single-flight des appels hybrides identiques concurrents (le noyau est coalescé dans kernel_adapter)
+LLM_FLIGHT = singleflight.AsyncSingleFlight("llm")
+
+@metrics.REGISTRY.collector
+def _kernel_metrics():
+    out = []
+    if kstats_snapshot is not None:
+        out += metrics.kstats_lines(kstats_snapshot())
+    if session_stats is not None:
+        st = session_stats()
+        out += metrics.family("alsadika_sessions", "gauge", "Orchestrateurs en pool", [({}, st["size"])])
+        out += metrics.family("alsadika_sessions_bytes", "gauge", "Mémoire estimée des sessions en pool", [({}, st["bytes"])])
+        out += metrics.family("alsadika_session_lookups_total", "counter", "Accès au pool de sessions",
+                              [({"result": "hit"}, st["hits"]), ({"result": "miss"}, st["misses"])])
+        out += metrics.family("alsadika_session_evictions_total", "counter", "Sessions évincées du pool",
+                              [({"reason": "lru"}, st["evicted_lru"]), ({"reason": "ttl"}, st["evicted_ttl"])])
+    out += metrics.sflight_lines(singleflight.stats())
+    return out
+
+
+async def _measured(gen: AsyncGenerator[str, None], provider: str) -> AsyncGenerator[str, None]:
+    REQUESTS.inc(provider=provider)
+    t0 = time.perf_counter()
+    first = True
+    try:
+        async for ev in gen:
+            if first and '"type": "content"' in ev:
+                FIRST_CHUNK.observe(time.perf_counter() - t0, provider=provider)
+                first = False
+            yield ev
+    finally:
+        STREAM_TIME.observe(time.perf_counter() - t0, provider=provider)
 
 
 async def sse_chat_generator(payload: ChatStreamInput) -> AsyncGenerator[str, None]:
@@ -135,18 +276,22 @@ async def sse_chat_generator(payload: ChatStreamInput) -> AsyncGenerator[str, No
     await append_message(sid, "user", payload.message)
     yield f"data: {json.dumps({'type': 'session', 'session_id': sid})}\n\n"
 
-    history = await get_history(sid)
-    messages = [{"role": m["role"], "content": m["content"]} for m in history]
-
     full = ""
+    shared = False
     try:
         provider = (payload.provider or "kernel").lower()
         if provider == "kernel" and run_kernel is not None:
-            final_text = run_kernel(sid, payload.message, mode=(payload.mode or "public"), council=payload.council, truth=payload.truth)
-            for part in final_text.split(" "):
-                full += part + " "
-                yield f"data: {json.dumps({'type': 'content', 'content': part + ' '})}\n\n"
-                await asyncio.sleep(0.005)
+            stages = run_kernel_chunked(sid, payload.message, mode=(payload.mode or "public"), council=payload.council, truth=payload.truth)
+
+            async def texts():
+                nonlocal shared
+                async for ch in _iter_in_thread(stages):
+                    shared = shared or bool(ch.get("shared"))
+                    yield ch["text"]
+
+            async for part in _coalesce(texts()):
+                full += part
+                yield _sse_content(part)
         elif provider == "hybrid" and llm_client and EMERGENT_LLM_KEY:
             # 1) Construire system prompt identitaire via noyau
             sysmsg = build_hybrid_system_message()
@@ -158,13 +303,21 @@ async def sse_chat_generator(payload: ChatStreamInput) -> AsyncGenerator[str, No
                 .with_model(prov, modl)
                 .with_params(max_tokens=payload.max_tokens or 1024)
             )
-            raw = await chat.send_message(UserMessage(text=payload.message))
+
+            async def call():
+                t_llm = time.perf_counter()
+                text = await chat.send_message(UserMessage(text=payload.message))
+                LLM_TTFT.observe(time.perf_counter() - t_llm, provider=provider)
+                yield text, False
+
+            # sans historique: deux requêtes identiques concurrentes partagent le même appel amont
+            key = singleflight.flight_key("hybrid", modl, payload.max_tokens or 1024, sysmsg, singleflight.normalize(payload.message))
+            async for raw, shared in LLM_FLIGHT.stream(key, call, mark=lambda r: (r[0], True)):
+                pass
             # 3) Post-filtre identité et vérité par noyau
             filtered = post_filter_identity(payload.message, raw, strict_identity=bool(payload.strict_identity))
-            for part in filtered.split(" "):
-                full += part + " "
-                yield f"data: {json.dumps({'type': 'content', 'content': part + ' '})}\n\n"
-                await asyncio.sleep(0.008)
+            full += filtered
+            yield _sse_content(filtered)
         else:
             # Fallback LLM simple
             prov = provider
@@ -175,15 +328,16 @@ async def sse_chat_generator(payload: ChatStreamInput) -> AsyncGenerator[str, No
                 prov = "openai"
                 if not (modl.startswith("gpt-") or modl.startswith("o4") or modl.startswith("gpt4") or modl.startswith("o3")):
                     modl = "o4-mini"
+            messages = await get_history(sid, projection={"_id": 0, "role": 1, "content": 1})
             chat = (LlmChat(api_key=EMERGENT_LLM_KEY, session_id=sid, system_message="Tu es al sadika.", initial_messages=messages)
                     .with_model(prov, modl)
                     .with_params(max_tokens=payload.max_tokens or 1024))
+            t_llm = time.perf_counter()
             final_text = await chat.send_message(UserMessage(text=payload.message))
+            LLM_TTFT.observe(time.perf_counter() - t_llm, provider=provider)
             filtered = post_filter_identity(payload.message, final_text, strict_identity=True)
-            for part in filtered.split(" "):
-                full += part + " "
-                yield f"data: {json.dumps({'type': 'content', 'content': part + ' '})}\n\n"
-                await asyncio.sleep(0.01)
+            full += filtered
+            yield _sse_content(filtered)
 
         await append_message(sid, "assistant", full.strip(), meta={
             "provider": provider,
@@ -192,15 +346,14 @@ async def sse_chat_generator(payload: ChatStreamInput) -> AsyncGenerator[str, No
             "council": payload.council,
             "truth": payload.truth,
             "strict_identity": payload.strict_identity,
+            "shared": shared,
         })
-        yield f"data: {json.dumps({'type': 'complete', 'session_id': sid})}\n\n"
+        yield f"data: {json.dumps({'type': 'complete', 'session_id': sid, 'shared': shared})}\n\n"
     except Exception as e:
         logging.exception("Kernel/LLM streaming error")
         if not full:
             demo = "Désolé, le service a rencontré un souci."
-            for token in demo.split(" "):
-                yield f"data: {json.dumps({'type': 'content', 'content': token + ' '})}\n\n"
-                await asyncio.sleep(0.02)
+            yield _sse_content(demo)
             await append_message(sid, "assistant", demo, meta={"error": str(e)})
             yield f"data: {json.dumps({'type': 'complete', 'session_id': sid})}\n\n"
         else:
@@ -210,7 +363,7 @@ async def sse_chat_generator(payload: ChatStreamInput) -> AsyncGenerator[str, No
 @api_router.post("/chat/stream")
 async def chat_stream(input: ChatStreamInput):
     return StreamingResponse(
-        sse_chat_generator(input),
+        _measured(sse_chat_generator(input), (input.provider or "kernel").lower()),
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
@@ -235,7 +388,7 @@ async def chat_stream_get(q: str, sessionId: Optional[str] = None, provider: Opt
         refusal_handling=refusal_handling,
     )
     return StreamingResponse(
-        sse_chat_generator(input),
+        _measured(sse_chat_generator(input), (input.provider or "kernel").lower()),
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
@@ -290,6 +443,10 @@ async def kernel_mutate(body: MutateBody):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.get("/metrics")
+async def prom_metrics():
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
 # Include the router in the main app
 app.include_router(api_router)
 
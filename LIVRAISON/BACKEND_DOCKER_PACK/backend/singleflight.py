@@ -0,0 +1,280 @@
+"""
+Coalescence « single-flight » des requêtes identiques concurrentes, sans dépendance.
+- Le premier appelant exécute le travail; les doublons arrivés pendant l'exécution s'abonnent
+  au même flux (relecture des fragments déjà produits, puis diffusion au fil de l'eau)
+- Attente bornée (SFLIGHT_WAIT_S): sans premier fragment à temps, le doublon s'exécute seul
+- SingleFlight (générateurs bloquants, threads) / AsyncSingleFlight (générateurs async, asyncio)
+"""
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional
+
+SFLIGHT_ENABLED = os.getenv("ALSADIKA_SFLIGHT", "1").lower() in ("1", "true", "yes", "on")
+SFLIGHT_WAIT_S = float(os.getenv("ALSADIKA_SFLIGHT_WAIT_S", "30"))   # attente max du premier fragment partagé
+
+FLIGHTS: List["SingleFlight"] = []
+
+
+class FlightAbandoned(RuntimeError):
+    """Le meneur a été interrompu avant la fin (client parti, annulation)."""
+
+
+def normalize(text: str) -> str:
+    return " ".join((text or "").split())
+
+
+def flight_key(*parts: Any) -> str:
+    blob = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(blob.encode("utf-8")).hexdigest()
+
+
+def stats() -> Dict[str, Dict[str, int]]:
+    return {f.name: f.stats() for f in FLIGHTS}
+
+
+class _Flight:
+    __slots__ = ("chunks", "done", "error", "subs", "cond")
+
+    def __init__(self):
+        self.chunks: List[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subs = 0
+        self.cond = threading.Condition()
+
+
+class SingleFlight:
+    """
+    stream(key, produce, shareable, on_join, mark):
+    - produce()            -> itérable de fragments (exécuté par le meneur seulement)
+    - shareable(fragment)  -> False si le premier fragment est propre au meneur (refus): le doublon s'exécute seul
+    - on_join()            -> None, ou fragments à émettre à la place du flux partagé (ex. refus énergie du doublon)
+    - mark(fragment)       -> fragment tel que reçu par un doublon
+    """
+
+    def __init__(self, name: str, wait: float = SFLIGHT_WAIT_S, enabled: bool = SFLIGHT_ENABLED):
+        self.name = name
+        self.wait = wait
+        self.enabled = enabled
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self._stats = {"leader": 0, "joined": 0, "fallback": 0}
+        FLIGHTS.append(self)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._stats, "inflight": len(self._flights)}
+
+    def _count(self, role: str) -> None:
+        with self._lock:
+            self._stats[role] += 1
+
+    def stream(self, key: str, produce: Callable[[], Iterable[Any]],
+               shareable: Optional[Callable[[Any], bool]] = None,
+               on_join: Optional[Callable[[], Optional[Iterable[Any]]]] = None,
+               mark: Optional[Callable[[Any], Any]] = None) -> Iterator[Any]:
+        if not self.enabled:
+            yield from produce()
+            return
+        with self._lock:
+            fl = self._flights.get(key)
+            lead = fl is None
+            if lead:
+                fl = self._flights[key] = _Flight()
+            else:
+                fl.subs += 1
+            self._stats["leader" if lead else "joined"] += 1
+        if lead:
+            yield from self._lead(key, fl, produce)
+            return
+        try:
+            shared = yield from self._follow(fl, shareable, on_join, mark)
+        finally:
+            with self._lock:
+                fl.subs -= 1
+        if not shared:
+            self._count("fallback")
+            yield from produce()
+
+    def _publish(self, fl: _Flight, ch: Any) -> None:
+        with fl.cond:
+            fl.chunks.append(ch)
+            fl.cond.notify_all()
+
+    def _lead(self, key: str, fl: _Flight, produce: Callable[[], Iterable[Any]]) -> Iterator[Any]:
+        it = iter(produce())
+        err: Optional[BaseException] = None
+        handed = False
+        try:
+            for ch in it:
+                self._publish(fl, ch)
+                yield ch
+        except GeneratorExit:
+            # client du meneur parti: s'il reste des abonnés, un thread termine le travail pour eux
+            # (close() rend la main tout de suite); sinon on s'arrête
+            with self._lock:
+                handed = fl.subs > 0
+            if handed:
+                threading.Thread(target=self._drain, args=(key, fl, it),
+                                 name=f"sflight-{self.name}", daemon=True).start()
+            else:
+                err = FlightAbandoned(self.name)
+            raise
+        except BaseException as e:
+            err = e
+            raise
+        finally:
+            if not handed:
+                self._finish(key, fl, it, err)
+
+    def _drain(self, key: str, fl: _Flight, it: Iterator[Any]) -> None:
+        err: Optional[BaseException] = None
+        try:
+            for ch in it:
+                self._publish(fl, ch)
+        except Exception as e:
+            err = e
+        finally:
+            self._finish(key, fl, it, err)
+
+    def _finish(self, key: str, fl: _Flight, it: Iterator[Any], err: Optional[BaseException]) -> None:
+        close = getattr(it, "close", None)
+        if close is not None:
+            close()
+        with self._lock:
+            if self._flights.get(key) is fl:
+                del self._flights[key]
+        with fl.cond:
+            fl.error, fl.done = err, True
+            fl.cond.notify_all()
+
+    def _follow(self, fl: _Flight, shareable, on_join, mark):
+        """Générateur; renvoie False s'il faut s'exécuter seul (rien n'a encore été émis)."""
+        i = 0
+        while True:
+            with fl.cond:
+                ready = fl.cond.wait_for(lambda: len(fl.chunks) > i or fl.done, timeout=self.wait)
+                batch, done, err = fl.chunks[i:], fl.done, fl.error
+            if not ready:
+                if i == 0:
+                    return False
+                raise TimeoutError(f"single-flight {self.name}: flux partagé sans progrès depuis {self.wait}s")
+            if i == 0 and batch:
+                if shareable is not None and not shareable(batch[0]):
+                    return False
+                alt = on_join() if on_join is not None else None
+                if alt is not None:
+                    yield from alt
+                    return True
+            for ch in batch:
+                yield mark(ch) if mark is not None else ch
+            i += len(batch)
+            if done:
+                if err is None:
+                    return True
+                if i == 0:
+                    return False
+                raise err
+
+
+class _AFlight:
+    __slots__ = ("chunks", "done", "error", "subs", "changed", "task")
+
+    def __init__(self):
+        self.chunks: List[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subs = 0
+        self.changed = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    def notify(self) -> None:
+        ev, self.changed = self.changed, asyncio.Event()
+        ev.set()
+
+
+class AsyncSingleFlight(SingleFlight):
+    """
+    Variante asyncio: le premier appelant lance produce() dans une tâche dont les fragments sont
+    diffusés à tous les abonnés (lui compris). La tâche est annulée quand le dernier abonné part.
+    """
+
+    async def stream(self, key: str, produce: Callable[[], AsyncIterator[Any]],
+                     shareable: Optional[Callable[[Any], bool]] = None,
+                     on_join: Optional[Callable[[], Optional[Iterable[Any]]]] = None,
+                     mark: Optional[Callable[[Any], Any]] = None) -> AsyncIterator[Any]:
+        if not self.enabled:
+            async with aclosing(produce()) as it:
+                async for ch in it:
+                    yield ch
+            return
+        fl = self._flights.get(key)   # boucle asyncio unique: pas de verrou
+        lead = fl is None
+        if lead:
+            fl = self._flights[key] = _AFlight()
+            fl.task = asyncio.create_task(self._run(key, fl, produce))
+        self._stats["leader" if lead else "joined"] += 1
+        fl.subs += 1
+        shared, i = True, 0
+        try:
+            while True:
+                if i < len(fl.chunks):
+                    if i == 0 and not lead:
+                        if shareable is not None and not shareable(fl.chunks[0]):
+                            shared = False
+                            break
+                        alt = on_join() if on_join is not None else None
+                        if alt is not None:
+                            for ch in alt:
+                                yield ch
+                            return
+                    ch = fl.chunks[i]
+                    i += 1
+                    yield ch if lead or mark is None else mark(ch)
+                    continue
+                if fl.done:
+                    if fl.error is None:
+                        return
+                    if i == 0 and not lead:
+                        shared = False
+                        break
+                    raise fl.error
+                try:
+                    await asyncio.wait_for(fl.changed.wait(), timeout=None if lead else self.wait)
+                except asyncio.TimeoutError:
+                    if i == 0:
+                        shared = False
+                        break
+                    raise TimeoutError(f"single-flight {self.name}: flux partagé sans progrès depuis {self.wait}s")
+        finally:
+            fl.subs -= 1
+            if fl.subs == 0 and not fl.done:   # plus personne n'écoute: on coupe l'amont
+                fl.task.cancel()
+                if self._flights.get(key) is fl:
+                    del self._flights[key]
+        if not shared:
+            self._stats["fallback"] += 1
+            async with aclosing(produce()) as it:
+                async for ch in it:
+                    yield ch
+
+    async def _run(self, key: str, fl: _AFlight, produce: Callable[[], AsyncIterator[Any]]) -> None:
+        try:
+            async with aclosing(produce()) as it:
+                async for ch in it:
+                    fl.chunks.append(ch)
+                    fl.notify()
+        except asyncio.CancelledError:
+            fl.error = FlightAbandoned(self.name)
+            raise
+        except Exception as e:
+            fl.error = e
+        finally:
+            fl.done = True
+            if self._flights.get(key) is fl:
+                del self._flights[key]
+            fl.notify()
@@ -9,6 +9,7 @@ db = db.getSiblingDB('alsadika_db');
 
 // Création des collections principales
 db.createCollection('chat_sessions');
+db.createCollection('chat_messages');
 db.createCollection('kernel_memory');
 db.createCollection('kernel_logs');
 db.createCollection('user_feedback');
@@ -21,7 +22,10 @@ db.chat_sessions.createIndex({ "session_id": 1 }, { unique: true });
 db.chat_sessions.createIndex({ "created_at": 1 });
 db.chat_sessions.createIndex({ "updated_at": 1 });
 
-print('📈 Index chat_sessions créés');
+// Messages: un document par message, historique fenêtré par session
+db.chat_messages.createIndex({ "session_id": 1, "ts": 1, "_id": 1 });
+
+print('📈 Index chat_sessions / chat_messages créés');
 
 // Index pour la mémoire du kernel
 db.kernel_memory.createIndex({ "key": 1 }, { unique: true });
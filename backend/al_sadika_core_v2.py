@@ -562,8 +562,7 @@ def main(argv: List[str]) -> int:
         log(f"ERROR | {e}")
         return 1
 
-if __name__ == "__main__":
-    sys.exit(main(sys.argv[1:]))
+# point d'entrée: en fin de fichier (PATCH CLI-ENTRY), une fois tous les patchs chargés
 # ===============================
 # PATCHS "MAGIC" — AJOUTS SEULEMENT
 # ===============================
@@ -3813,10 +3812,7 @@ def _kp_get_subparsers(p):
 
 def _kp_inject_cli():
     # On redéfinit build_parser pour l’avenir ET on patche le parser courant si présent.
-    try:
-        _prev_build = build_parser
-    except NameError:
-        _prev_build = None
+    _prev_build = globals().get("build_parser")     # (build_parser est local ici: lecture explicite du global)
 
     def build_parser():
         p = _prev_build() if _prev_build else argparse.ArgumentParser(prog="alsadika")
@@ -4813,12 +4809,12 @@ def daemon_loop(interval=20, notify=True):
 
 # ---- CLI ----
 try:
-    _prev_build = build_parser
+    _daemon_prev_build = build_parser
 except NameError:
-    _prev_build = None
+    _daemon_prev_build = None
 
 def build_parser():
-    p = _prev_build() if _prev_build else argparse.ArgumentParser(prog="alsadika")
+    p = _daemon_prev_build() if _daemon_prev_build else argparse.ArgumentParser(prog="alsadika")
     sp = [a for a in p._subparsers._actions if getattr(a,'dest',None)=='cmd'][0]
     d1 = sp.add_parser("daemon", help="Boucle autonome (watch inbox, maintenance)")
     d1.add_argument("--interval", type=int, default=20)
@@ -5430,12 +5426,12 @@ def auto_retain_once(batch_pages: int = 10):
 
 # ---------- CLI wiring ----------
 try:
-    _prev_build = build_parser
+    _ar_prev_build = build_parser
 except NameError:
-    _prev_build = None
+    _ar_prev_build = None
 
 def build_parser():
-    p = _prev_build() if _prev_build else argparse.ArgumentParser(prog="alsadika")
+    p = _ar_prev_build() if _ar_prev_build else argparse.ArgumentParser(prog="alsadika")
     sp = [a for a in p._subparsers._actions if getattr(a,'dest',None)=='cmd'][0]
 
     c1 = sp.add_parser("auto-retain", help="Rétention automatique des faits (sans approbation manuelle)")
@@ -5948,3 +5944,3415 @@ def build_parser():
 # ===============================
 # FIN PATCH
 # ===============================
+# ===============================
+# PATCH "RAG-BENCH" — banc d'essai RAG (append-only)
+# ===============================
+import argparse, json, time, random, shutil, tempfile, contextlib
+from pathlib import Path
+from typing import Dict, Any, List, Tuple
+
+# Vocabulaire FR + arabe translittéré (déterministe)
+_RB_FR = ("patience verite sincerite sagesse lumiere chemin coeur esprit parole silence memoire "
+          "justice misericorde confiance humilite gratitude priere savoir raison espoir douceur "
+          "courage pardon promesse fidelite equilibre purete intention effort voyage source").split()
+_RB_AR = ("sabr sidq ikhlas hikma nur tariq qalb ruh kalam samt dhikr adl rahma tawakkul tawadu "
+          "shukr dua ilm aql raja rifq shaja afw ahd wafa mizan tahara niyya jihad safar").split()
+_RB_SIZES = {"1k": 1000, "10k": 10000, "100k": 100000}
+
+def _rb_pick(rng: random.Random, n: int) -> List[str]:
+    return [rng.choice(_RB_FR if rng.random() < 0.6 else _RB_AR) for _ in range(n)]
+
+def rag_bench_corpus(root: Path, n_docs: int, n_queries: int = 50, seed: int = 1337) -> List[Tuple[str, str]]:
+    """Écrit n_docs fichiers .txt et renvoie [(requête, chemin attendu)].
+    Chaque requête vise un document via deux termes rares plantés (vérité terrain)."""
+    rng = random.Random(seed)
+    root.mkdir(parents=True, exist_ok=True)
+    targets = sorted(rng.sample(range(n_docs), min(n_queries, n_docs)))
+    planted = {}
+    for j, i in enumerate(targets):
+        planted[i] = (f"qx{j:04d}{_RB_AR[j % len(_RB_AR)]}", f"zk{j:04d}{_RB_FR[j % len(_RB_FR)]}")
+    truth = []
+    for i in range(n_docs):
+        words = _rb_pick(rng, rng.randint(40, 120))
+        if i in planted:
+            a, b = planted[i]
+            words.insert(rng.randrange(len(words)), a); words.insert(rng.randrange(len(words)), b)
+        p = root / f"d{i // 1000:03d}" / f"doc{i:06d}.txt"
+        p.parent.mkdir(exist_ok=True)
+        p.write_text(" ".join(words), encoding="utf-8")
+        if i in planted:
+            truth.append((" ".join(planted[i]) + " " + _rb_pick(rng, 1)[0], str(p.resolve())))
+    return truth
+
+def _rb_size(paths: List[Path]) -> int:
+    tot = 0
+    for p in paths:
+        try:
+            tot += sum(f.stat().st_size for f in p.rglob("*") if f.is_file()) if p.is_dir() else p.stat().st_size
+        except Exception:
+            pass
+    return tot
+
+def _rb_pct(xs: List[float], q: float) -> float:
+    if not xs: return 0.0
+    s = sorted(xs); i = min(len(s) - 1, max(0, int(round(q * (len(s) - 1)))))
+    return round(s[i] * 1000.0, 3)
+
+@contextlib.contextmanager
+def _rb_redirect(work: Path):
+    """Redirige les index persistants vers un dossier jetable (pas d'écrasement des vrais index)."""
+    g = globals(); saved = {k: g.get(k) for k in ("DOCS_INDEX", "CPU_RAG_VEC", "CPU_RAG_MAP")}
+    g["DOCS_INDEX"] = work / "docs_index.json"
+    g["CPU_RAG_VEC"] = work / "cpu_vectors.npy"; g["CPU_RAG_MAP"] = work / "cpu_map.json"
+    try:
+        yield
+    finally:
+        for k, v in saved.items():
+            if v is not None: g[k] = v
+
+def _rb_run(name: str, build, query, files: List[Path], truth: List[Tuple[str, str]], k: int) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    try:
+        res = build()
+    except Exception as e:
+        return {"engine": name, "ok": False, "msg": f"{type(e).__name__}: {e}"}
+    t_build = time.perf_counter() - t0
+    if isinstance(res, dict) and res.get("ok") is False:
+        return {"engine": name, "ok": False, "msg": res.get("msg", "build échoué")}
+    lat, hit = [], 0
+    for q, expected in truth:
+        t1 = time.perf_counter()
+        hits = query(q, k) or []
+        lat.append(time.perf_counter() - t1)
+        if any(h.get("path") == expected for h in hits[:k]): hit += 1
+    return {"engine": name, "ok": True, "build_s": round(t_build, 3), "index_bytes": _rb_size(files),
+            "p50_ms": _rb_pct(lat, 0.50), "p99_ms": _rb_pct(lat, 0.99),
+            f"recall@{k}": round(hit / max(1, len(truth)), 4), "queries": len(truth)}
+
+def rag_bench(sizes: List[str] = None, k: int = 5, n_queries: int = 50, seed: int = 1337,
+              engines: List[str] = None, keep: bool = False) -> Dict[str, Any]:
+    sizes = sizes or ["1k", "10k", "100k"]
+    engines = engines or ["docs", "cpu", "gpu"]
+    report = {"seed": seed, "k": k, "runs": []}
+    for sz in sizes:
+        n = _RB_SIZES.get(sz) or int(sz)
+        work = Path(tempfile.mkdtemp(prefix=f"alsadika_rb_{sz}_"))
+        try:
+            t0 = time.perf_counter()
+            truth = rag_bench_corpus(work / "corpus", n, n_queries=n_queries, seed=seed)
+            run = {"size": sz, "docs": n, "gen_s": round(time.perf_counter() - t0, 3), "engines": []}
+            with _rb_redirect(work):
+                if "docs" in engines:
+                    run["engines"].append(_rb_run("docs_tfidf",
+                        lambda: docs_index_build(str(work / "corpus"), [".txt"]),
+                        lambda q, kk: docs_query(q, k=kk), [work / "docs_index.json"], truth, k))
+                if "cpu" in engines:
+                    if globals().get("_np") is None:
+                        run["engines"].append({"engine": "cpu_hash", "ok": False, "msg": "numpy manquant"})
+                    else:
+                        run["engines"].append(_rb_run("cpu_hash",
+                            lambda: cpu_index(str(work / "corpus"), exts=[".txt"]),
+                            lambda q, kk: cpu_query(q, k=kk), [work / "cpu_vectors.npy", work / "cpu_map.json"], truth, k))
+                if "gpu" in engines:
+                    if "GpuRAG" not in globals() or _GPU.get("faiss") is None:
+                        run["engines"].append({"engine": "faiss", "ok": False, "msg": "faiss non installé"})
+                    else:
+                        class _BenchRAG(GpuRAG):
+                            IDX = work / "gpu_index.faiss"; MAP = work / "gpu_map.json"; DOCS = work / "gpu_docs"
+                        rag = _BenchRAG(dim=4096)
+                        run["engines"].append(_rb_run("faiss",
+                            lambda: rag.index_dir(str(work / "corpus"), exts=[".txt"]),
+                            lambda q, kk: rag.query(q, k=kk), [_BenchRAG.IDX, _BenchRAG.MAP], truth, k))
+            report["runs"].append(run)
+        finally:
+            if keep: report.setdefault("kept", []).append(str(work))
+            else: shutil.rmtree(work, ignore_errors=True)
+    return report
+
+# CLI
+try:
+    _rb_prev_build = build_parser
+except NameError:
+    _rb_prev_build = None
+
+def build_parser():
+    p = _rb_prev_build() if _rb_prev_build else argparse.ArgumentParser(prog="alsadika")
+    sp = [a for a in p._subparsers._actions if getattr(a,'dest',None)=='cmd'][0]
+    c1 = sp.add_parser("rag-bench", help="Banc d'essai RAG (corpus synthétiques, latence, rappel@k)")
+    c1.add_argument("--sizes", default="1k,10k,100k", help="ex: 1k,10k ou un nombre de docs")
+    c1.add_argument("--engines", default="docs,cpu,gpu")
+    c1.add_argument("--k", type=int, default=5)
+    c1.add_argument("--queries", type=int, default=50)
+    c1.add_argument("--seed", type=int, default=1337)
+    c1.add_argument("--keep", action="store_true", help="Conserver les corpus générés")
+    c1.set_defaults(_fn=cmd_rag_bench)
+    return p
+
+def cmd_rag_bench(args):
+    res = rag_bench(sizes=[s.strip() for s in args.sizes.split(",") if s.strip()], k=max(1, args.k),
+                    n_queries=max(1, args.queries), seed=args.seed,
+                    engines=[e.strip() for e in args.engines.split(",") if e.strip()], keep=args.keep)
+    print(json.dumps(res, ensure_ascii=False, indent=2)); return 0
+# ===============================
+# FIN PATCH RAG-BENCH
+# ===============================
+# ===============================
+# PATCH "FACT-STORE-SQLITE" — mémoire clé/val en SQLite WAL (append-only)
+# ===============================
+import argparse, json, time, sqlite3, threading, datetime
+from pathlib import Path
+
+FACTS_DB = (ALSADIKA_DIR if "ALSADIKA_DIR" in globals() else Path(".alsadika")) / "facts.db"
+_FACTS_TLS = threading.local()
+
+_FACTS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS facts(
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  key TEXT NOT NULL, value TEXT NOT NULL, key_hash TEXT NOT NULL,
+  ts REAL NOT NULL, ts_iso TEXT NOT NULL, domain TEXT NOT NULL DEFAULT '',
+  meta TEXT NOT NULL DEFAULT '{}',
+  UNIQUE(key_hash, value)
+);
+CREATE INDEX IF NOT EXISTS facts_key_hash ON facts(key_hash, ts);
+CREATE INDEX IF NOT EXISTS facts_ts ON facts(ts);
+CREATE INDEX IF NOT EXISTS facts_domain ON facts(domain);
+CREATE TABLE IF NOT EXISTS facts_meta(k TEXT PRIMARY KEY, v TEXT);
+"""
+
+def _iso_epoch(s: str) -> float:
+    try:
+        ts = datetime.datetime.fromisoformat(s or "")
+    except Exception:
+        return 0.0
+    if ts.tzinfo is None: ts = ts.replace(tzinfo=datetime.timezone.utc)
+    return ts.timestamp()
+
+def _facts_conn() -> sqlite3.Connection:
+    """Une connexion par thread (WAL: lecteurs concurrents + un écrivain)."""
+    c = getattr(_FACTS_TLS, "conn", None)
+    if c is not None and getattr(_FACTS_TLS, "path", None) == str(FACTS_DB):
+        return c
+    FACTS_DB.parent.mkdir(parents=True, exist_ok=True)
+    c = sqlite3.connect(str(FACTS_DB), timeout=30)
+    c.execute("PRAGMA journal_mode=WAL"); c.execute("PRAGMA synchronous=NORMAL")
+    c.executescript(_FACTS_SCHEMA)
+    _FACTS_TLS.conn = c; _FACTS_TLS.path = str(FACTS_DB)
+    facts_import_json()
+    return c
+
+def _fact_row(key: str, value: str, meta: dict, ts_iso: str = None):
+    key = (key or "").strip(); value = (value or "").strip(); meta = meta or {}
+    ts_iso = ts_iso or _now_iso()
+    return (key, value, _sha1(key.lower()), _iso_epoch(ts_iso), ts_iso,
+            str(meta.get("domain", "") or ""), json.dumps(meta, ensure_ascii=False))
+
+def facts_add_many(rows) -> int:
+    """Insertion en lot (une transaction). rows: [(key, value, meta)] ou [(key, value, meta, ts_iso)].
+    Les doublons (key_hash, value) sont ignorés. Retourne le nb de faits ajoutés."""
+    c = _facts_conn()
+    recs = [_fact_row(*r) for r in rows]
+    if not recs: return 0
+    before = c.total_changes
+    with c:
+        c.executemany("INSERT OR IGNORE INTO facts(key,value,key_hash,ts,ts_iso,domain,meta) VALUES(?,?,?,?,?,?,?)", recs)
+    return c.total_changes - before
+
+def facts_import_json(path=None, force: bool = False) -> dict:
+    """Import unique depuis memory.json (marqueur en base pour ne pas réimporter)."""
+    c = _facts_conn()
+    p = Path(path) if path else MEM_FILE
+    done = c.execute("SELECT v FROM facts_meta WHERE k='imported_json'").fetchone()
+    if done and not force:
+        return {"ok": True, "imported": 0, "msg": "déjà importé", "at": done[0]}
+    items = (_read_json(p, {"items": []}) or {}).get("items") or [] if p.exists() else []
+    rows = [(it.get("key", ""), it.get("value", ""), it.get("meta") or {}, it.get("ts") or _now_iso())
+            for it in items if isinstance(it, dict) and (it.get("key") or it.get("value"))]
+    n = facts_add_many(rows) if rows else 0
+    with c:
+        c.execute("INSERT OR REPLACE INTO facts_meta(k,v) VALUES('imported_json',?)", (_now_iso(),))
+    return {"ok": True, "imported": n, "seen": len(items)}
+
+def _fact_item(r) -> dict:
+    try: meta = json.loads(r[4] or "{}")
+    except Exception: meta = {}
+    return {"key": r[0], "value": r[1], "key_hash": r[2], "ts": r[3], "meta": meta}
+
+def facts_iter(limit: int = 0):
+    q = "SELECT key,value,key_hash,ts_iso,meta FROM facts ORDER BY id"
+    if limit: q += f" LIMIT {int(limit)}"
+    for r in _facts_conn().execute(q):
+        yield _fact_item(r)
+
+def facts_count() -> int:
+    return _facts_conn().execute("SELECT COUNT(*) FROM facts").fetchone()[0]
+
+# ---------- Remplacements des accès memory.json ----------
+def _mem_load():
+    return {"items": list(facts_iter())}
+
+def _mem_has_recent_key(key_hash: str, days: int) -> bool:
+    cutoff = time.time() - days * 86400
+    r = _facts_conn().execute("SELECT 1 FROM facts WHERE key_hash=? AND ts>=? LIMIT 1", (key_hash, cutoff)).fetchone()
+    return r is not None
+
+def _mem_add(key: str, value: str, meta: dict):
+    n = facts_add_many([(key, value, meta)])
+    return {"ok": True, "added": key.strip()} if n else {"ok": False, "msg": "dup"}
+
+def _mem_all_items():
+    try:
+        items = list(facts_iter())
+        for it in items:
+            it["meta"].setdefault("source",""); it["meta"].setdefault("title",""); it["meta"].setdefault("domain","")
+        return items
+    except Exception:
+        return []
+
+def _state_add(day: str, n: int):
+    """count_today += n pour le jour donné (relu au moment d'écrire, pas au début du scan)."""
+    st = _state_load()
+    if st.get("day") != day:
+        st["day"] = day; st["count_today"] = 0
+    st["count_today"] += n
+    _state_save(st)
+    return st
+
+def auto_retain_once(batch_pages: int = 10):
+    scope = _read_json(SCOPE_FILE, {})
+    allowed = set(scope.get("allowed_domains") or [])
+    st = _state_load()
+    today = _day_str()
+    if st.get("day") != today:
+        st["day"] = today; st["count_today"]=0
+
+    if not AUTO_RETAIN_ON:
+        return {"ok": False, "msg": "AUTO_RETAIN_OFF", "count_today": st["count_today"]}
+
+    pages = []
+    if WEB_DIR.exists():
+        for metap in WEB_DIR.glob("*.meta.json"):
+            txtp = WEB_DIR / (metap.stem + ".txt")
+            try:
+                mtime = (txtp.stat().st_mtime if txtp.exists() else metap.stat().st_mtime)
+            except Exception:
+                mtime = 0
+            pages.append((mtime, txtp, metap))
+        pages.sort(reverse=True)
+
+    # collecte puis insertion par lots (dédup temporelle via index key_hash)
+    pending, batch_keys, seen = [], set(), 0
+    for _, txtp, metap in pages[:max(1,batch_pages)]:
+        seen += 1
+        for key, val, meta in _extract_candidates(txtp, metap):
+            dom = meta.get("domain","")
+            if allowed and dom and dom not in allowed:
+                continue
+            kh = _sha1(key.strip().lower())
+            if kh in batch_keys or _mem_has_recent_key(kh, ALLOW_DUP_NEAR_DAYS):
+                continue
+            batch_keys.add(kh); pending.append((key, val, meta))
+    # quota compté sur les lignes réellement insérées (INSERT OR IGNORE écarte les doublons exacts)
+    added, i = 0, 0
+    budget = max(0, MAX_AUTO_PER_DAY - st["count_today"])
+    while i < len(pending) and added < budget:
+        n = budget - added
+        added += facts_add_many(pending[i:i + n]); i += n
+    st = _state_add(today, added)
+    res = {"ok": True, "seen": seen, "added": added, "count_today": st["count_today"]}
+    if i < len(pending): res["quota_hit"] = True
+    return res
+
+# CLI
+try:
+    _facts_prev_build = build_parser
+except NameError:
+    _facts_prev_build = None
+
+def build_parser():
+    p = _facts_prev_build() if _facts_prev_build else argparse.ArgumentParser(prog="alsadika")
+    sp = [a for a in p._subparsers._actions if getattr(a,'dest',None)=='cmd'][0]
+    c1 = sp.add_parser("facts-import", help="Importer memory.json dans la base SQLite des faits")
+    c1.add_argument("--path", default=None); c1.add_argument("--force", action="store_true")
+    c1.set_defaults(_fn=cmd_facts_import)
+    c2 = sp.add_parser("facts-stats", help="Statistiques de la base des faits")
+    c2.set_defaults(_fn=cmd_facts_stats)
+    return p
+
+def cmd_facts_import(args):
+    print(json.dumps(facts_import_json(args.path, force=args.force), ensure_ascii=False, indent=2)); return 0
+
+def cmd_facts_stats(args):
+    c = _facts_conn()
+    doms = c.execute("SELECT domain, COUNT(*) FROM facts GROUP BY domain ORDER BY 2 DESC LIMIT 10").fetchall()
+    print(json.dumps({"ok": True, "db": str(FACTS_DB), "count": facts_count(),
+                      "domains": {d or "(aucun)": n for d, n in doms}}, ensure_ascii=False, indent=2)); return 0
+# ===============================
+# FIN PATCH FACT-STORE-SQLITE
+# ===============================
+# ===============================
+# PATCH "FACT-INDEX-BM25" — index inversé + classement BM25 (append-only)
+# ===============================
+import json, re, math, heapq
+
+BM25_K1, BM25_B = 1.2, 0.75
+TITLE_WEIGHT = 0.5          # poids d'une occurrence dans le titre
+_FIDX_STOP = set(_stop) if "_stop" in globals() else set()
+
+_FIDX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS fact_terms(term TEXT NOT NULL, fid INTEGER NOT NULL, tf REAL NOT NULL,
+  PRIMARY KEY(term, fid)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS fact_doclen(fid INTEGER PRIMARY KEY, dl REAL NOT NULL, boost REAL NOT NULL DEFAULT 0);
+"""
+
+def _tok_list(s: str):
+    s = (s or "").lower()
+    s = re.sub(r"[^a-z0-9àâäçéèêëîïôöùûüÿ\- ]"," ", s)
+    return [t for t in re.split(r"\s+", s) if t and len(t)>=3 and t not in _FIDX_STOP]
+
+def _fidx_meta_get(c, k, dflt=0.0):
+    r = c.execute("SELECT v FROM facts_meta WHERE k=?", (k,)).fetchone()
+    try: return float(r[0]) if r else dflt
+    except Exception: return dflt
+
+def facts_index_sync(batch: int = 5000) -> int:
+    """Indexe les faits dont l'id dépasse le filigrane 'indexed_upto' (incrémental, reprise sûre)."""
+    c = _facts_conn()
+    if not getattr(_FACTS_TLS, "fidx_ready", False):
+        c.executescript(_FIDX_SCHEMA); _FACTS_TLS.fidx_ready = True
+    done = 0
+    while True:
+        upto = int(_fidx_meta_get(c, "indexed_upto"))
+        rows = c.execute("SELECT id,key,value,meta FROM facts WHERE id>? ORDER BY id LIMIT ?", (upto, batch)).fetchall()
+        if not rows: return done
+        terms, lens, sum_dl = [], [], 0.0
+        for fid, key, value, meta in rows:
+            try: m = json.loads(meta or "{}")
+            except Exception: m = {}
+            tf = {}
+            for t in _tok_list(f"{key} {value}"): tf[t] = tf.get(t, 0.0) + 1.0
+            for t in _tok_list(m.get("title") or ""): tf[t] = tf.get(t, 0.0) + TITLE_WEIGHT
+            dl = sum(tf.values())
+            try: boost = float(m.get("score", 0)) * 0.2
+            except Exception: boost = 0.0
+            terms += [(t, fid, w) for t, w in tf.items()]
+            lens.append((fid, dl, boost)); sum_dl += dl
+        with c:
+            c.executemany("INSERT OR REPLACE INTO fact_terms(term,fid,tf) VALUES(?,?,?)", terms)
+            c.executemany("INSERT OR REPLACE INTO fact_doclen(fid,dl,boost) VALUES(?,?,?)", lens)
+            c.execute("INSERT OR REPLACE INTO facts_meta(k,v) VALUES('sum_dl',?)", (str(_fidx_meta_get(c, "sum_dl") + sum_dl),))
+            c.execute("INSERT OR REPLACE INTO facts_meta(k,v) VALUES('indexed_upto',?)", (str(rows[-1][0]),))
+        done += len(rows)
+
+# l'index suit chaque insertion
+_FIDX_prev_add_many = facts_add_many
+def facts_add_many(rows) -> int:
+    n = _FIDX_prev_add_many(rows)
+    if n:
+        try: facts_index_sync()
+        except Exception: pass
+    return n
+
+def facts_search(query: str, k: int = 8):
+    """Top-k BM25 (+ bonus score d'extraction) via l'index inversé. Retourne [(score, item)]."""
+    terms = set(_tok_list(query))
+    if not terms: return []
+    facts_index_sync()
+    c = _facts_conn()
+    N = max(1, c.execute("SELECT COUNT(*) FROM fact_doclen").fetchone()[0])
+    avgdl = max(1e-9, _fidx_meta_get(c, "sum_dl") / N)
+    dfs = sorted((c.execute("SELECT COUNT(*) FROM fact_terms WHERE term=?", (t,)).fetchone()[0], t) for t in terms)
+    dfs = [(df, t) for df, t in dfs if df]
+    # termes quasi universels (idf ~ 0) ignorés dès qu'un terme plus rare existe
+    if dfs and dfs[0][0] <= N // 2:
+        dfs = [(df, t) for df, t in dfs if df <= N // 2]
+    acc, boosts = {}, {}
+    for df, t in dfs:
+        post = c.execute("SELECT t.fid, t.tf, d.dl, d.boost FROM fact_terms t JOIN fact_doclen d ON d.fid=t.fid "
+                         "WHERE t.term=?", (t,)).fetchall()
+        idf = math.log(1.0 + (N - df + 0.5) / (df + 0.5))
+        for fid, tf, dl, boost in post:
+            acc[fid] = acc.get(fid, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * dl / avgdl))
+            boosts[fid] = boost
+    top = heapq.nlargest(max(1, k), ((sc + boosts[fid], fid) for fid, sc in acc.items()))
+    if not top: return []
+    ids = [fid for _, fid in top]
+    rows = {r[0]: r[1:] for r in c.execute(
+        f"SELECT id,key,value,key_hash,ts_iso,meta FROM facts WHERE id IN ({','.join('?'*len(ids))})", ids)}
+    out = []
+    for sc, fid in top:
+        if fid in rows:
+            it = _fact_item(rows[fid])
+            for f in ("source", "title", "domain"): it["meta"].setdefault(f, "")
+            out.append((round(sc, 4), it))
+    return out
+
+def _mem_recent_items(k: int):
+    rows = _facts_conn().execute("SELECT key,value,key_hash,ts_iso,meta FROM facts ORDER BY id DESC LIMIT ?", (int(k),)).fetchall()
+    items = [_fact_item(r) for r in reversed(rows)]
+    for it in items:
+        for f in ("source", "title", "domain"): it["meta"].setdefault(f, "")
+    return items
+
+def kernel_summarize(query: str, k: int = 8) -> str:
+    """
+    Résume les k faits les plus pertinents (BM25 sur l'index inversé) pour `query`.
+    Retour: texte en français avec points clés + sources.
+    """
+    if facts_count() == 0:
+        return "Mémoire locale vide — rien à résumer."
+
+    q = (query or "").strip()
+    m = re.search(r"\|\s*k\s*=\s*(\d+)", q)
+    if m:
+        try: k = max(1, int(m.group(1)))
+        except: pass
+    q = re.sub(r"\|\s*k\s*=\s*\d+\s*$", "", q).strip(" ,")
+    ranked = [it for _, it in facts_search(q, k)] if _tok_list(q) else _mem_recent_items(k)
+
+    if not ranked:
+        return f"Aucun item en mémoire ne correspond à: {q or '(vide)'}."
+
+    buckets = {"patience":[],"vérité":[],"sincérité":[],"autres":[]}
+    for it in ranked:
+        text = (it.get("value") or it.get("key") or "").lower()
+        if "patience" in text:
+            buckets["patience"].append(it)
+        elif "vérité" in text:
+            buckets["vérité"].append(it)
+        elif "sincérit" in text:
+            buckets["sincérité"].append(it)
+        else:
+            buckets["autres"].append(it)
+
+    lines = []
+    title = "Synthèse locale — points clés appris"
+    lines.append(title)
+    lines.append("-"*len(title))
+
+    def add_bucket(label, arr):
+        if not arr: return
+        lines.append(f"\n{label.capitalize()} :")
+        for it in arr:
+            val = re.sub(r"\s+", " ", it.get("value") or it.get("key") or "").strip()
+            if len(val) > 240:
+                val = val[:237] + "…"
+            lines.append(f"• {val} — [source: {_format_source(it.get('meta',{}))}]")
+
+    for label in ("patience", "vérité", "sincérité", "autres"):
+        add_bucket(label, buckets[label])
+
+    seen = []
+    for it in ranked:
+        s = _format_source(it.get("meta",{}))
+        if s not in seen:
+            seen.append(s)
+    if seen:
+        lines.append("\nSources (mémoire locale) :")
+        for s in seen[:12]:
+            lines.append(f"- {s}")
+
+    return "\n".join(lines)
+# ===============================
+# FIN PATCH FACT-INDEX-BM25
+# ===============================
+# ===============================
+# PATCH "LOG-STORE" — persistance journalisée + compaction (append-only)
+# ===============================
+import argparse, json, os, threading
+from pathlib import Path
+from typing import Any, Dict, List
+
+LSS_COMPACT_OPS   = 500          # compaction après au moins N opérations journalisées…
+LSS_COMPACT_RATIO = 2.0          # …et un journal plus gros que RATIO × l'instantané (coût amorti)
+LSS_FSYNC         = False        # fsync à chaque opération (durabilité vs débit)
+
+class LogStore:
+    """État JSON matérialisé en mémoire + journal d'opérations append-only.
+    - instantané = le fichier JSON historique (format inchangé pour les lecteurs)
+    - journal    = <fichier>.oplog (JSONL), une ligne par mutation
+    Toutes les opérations sont absolues (set/del/ext@position) : rejouer le journal
+    sur un instantané plus récent donne le même état (reprise après crash sûre)."""
+
+    def __init__(self, path: Path, default: Any = None):
+        self.path = Path(path); self.log = Path(str(path) + ".oplog")
+        self.default = {} if default is None else default
+        self.lock = threading.RLock()
+        self.state: Any = None; self.ops = 0; self._off = 0; self._snap_sig = None
+        self._load()
+
+    # ---- chargement / reprise ----
+    def _sig(self, p: Path):
+        try: st = p.stat(); return (st.st_mtime_ns, st.st_size)
+        except Exception: return None
+
+    def _load(self):
+        with self.lock:
+            try:
+                self.state = json.loads(self.path.read_text(encoding="utf-8")) if self.path.exists() else None
+            except Exception:
+                self.state = None
+            if self.state is None: self.state = json.loads(json.dumps(self.default))
+            self._snap_sig = self._sig(self.path); self._off = 0; self.ops = 0
+            self._replay()
+
+    def _replay(self):
+        if not self.log.exists(): return
+        with open(self.log, "rb") as f:
+            f.seek(self._off)
+            for raw in f:
+                if not raw.endswith(b"\n"): break          # ligne partielle (crash) → ignorée
+                try: op = json.loads(raw)
+                except Exception: break
+                self._apply(op); self.ops += 1; self._off += len(raw)
+
+    def refresh(self):
+        """Suit les écritures d'autres processus (journal qui grandit / instantané remplacé)."""
+        with self.lock:
+            if self._sig(self.path) != self._snap_sig:
+                return self._load()
+            try: size = self.log.stat().st_size
+            except Exception: size = 0
+            if size < self._off: self._load()
+            elif size > self._off: self._replay()
+
+    # ---- opérations ----
+    def _parent(self, p: List[Any], create: bool = True):
+        node = self.state
+        for k in p[:-1]:
+            if isinstance(node, list):
+                node = node[int(k)]
+            else:
+                if create and not isinstance(node.get(k), (dict, list)): node[k] = {}
+                node = node[k]
+        return node
+
+    def _apply(self, op: Dict[str, Any]):
+        kind, p = op.get("op"), op.get("p") or []
+        try:
+            if not p:
+                if kind == "set": self.state = op.get("v")
+                return
+            parent, last = self._parent(p), p[-1]
+            if kind == "set":
+                if isinstance(parent, list):
+                    i = int(last)
+                    if i < len(parent): parent[i] = op.get("v")
+                    else: parent.append(op.get("v"))
+                else: parent[last] = op.get("v")
+            elif kind == "del":
+                if isinstance(parent, list):
+                    if int(last) < len(parent): parent.pop(int(last))
+                else: parent.pop(last, None)
+            elif kind == "ext":
+                cur = parent.get(last) if isinstance(parent, dict) else parent[int(last)]
+                if not isinstance(cur, list):
+                    cur = []
+                    if isinstance(parent, dict): parent[last] = cur
+                    else: parent[int(last)] = cur
+                cur[int(op.get("at", len(cur))):] = op.get("v") or []
+        except Exception:
+            pass
+
+    def commit(self, ops: List[Dict[str, Any]]):
+        """Applique puis journalise un lot d'opérations (une écriture append)."""
+        if not ops: return
+        with self.lock:
+            lines = [json.dumps(op, ensure_ascii=False) for op in ops]
+            for ln in lines: self._apply(json.loads(ln))     # copies : pas d'alias avec l'appelant
+            data = "".join(ln + "\n" for ln in lines).encode("utf-8")
+            self.log.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.log, "ab") as f:
+                f.write(data)
+                if LSS_FSYNC:
+                    try: f.flush(); os.fsync(f.fileno())
+                    except Exception: pass
+            self._off += len(data); self.ops += len(ops)
+            snap = (self._snap_sig or (0, 0))[1]
+            if self.ops >= LSS_COMPACT_OPS and self._off > LSS_COMPACT_RATIO * snap:
+                self.compact()
+
+    def set(self, p: List[Any], v: Any): self.commit([{"op": "set", "p": list(p), "v": v}])
+    def delete(self, p: List[Any]): self.commit([{"op": "del", "p": list(p)}])
+    def extend(self, p: List[Any], at: int, v: List[Any]): self.commit([{"op": "ext", "p": list(p), "at": at, "v": v}])
+
+    def compact(self):
+        """Instantané atomique (tmp + replace) puis troncature du journal."""
+        with self.lock:
+            tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(json.dumps(self.state, ensure_ascii=False, indent=2))
+                try: f.flush(); os.fsync(f.fileno())
+                except Exception: pass
+            os.replace(tmp, self.path)
+            with open(self.log, "wb"): pass
+            self._snap_sig = self._sig(self.path); self._off = 0; self.ops = 0
+
+    # ---- diff état → opérations (pour les helpers load/save existants) ----
+    @staticmethod
+    def diff(old: Any, new: Any, p: List[Any] = None, out: List[Dict[str, Any]] = None):
+        p = p or []; out = [] if out is None else out
+        if isinstance(old, dict) and isinstance(new, dict):
+            for k, v in new.items():
+                if k not in old: out.append({"op": "set", "p": p + [k], "v": v})
+                elif old[k] != v: LogStore.diff(old[k], v, p + [k], out)
+            for k in old:
+                if k not in new: out.append({"op": "del", "p": p + [k]})
+        elif isinstance(old, list) and isinstance(new, list) and p:
+            n = len(old)
+            if len(new) >= n and new[:n] == old:
+                if len(new) > n: out.append({"op": "ext", "p": p, "at": n, "v": new[n:]})
+            elif len(new) == n and sum(1 for a, b in zip(old, new) if a != b) <= 8:
+                for i, (a, b) in enumerate(zip(old, new)):
+                    if a != b: LogStore.diff(a, b, p + [i], out)
+            else:
+                out.append({"op": "ext", "p": p, "at": 0, "v": new})
+        elif old != new or type(old) is not type(new):
+            out.append({"op": "set", "p": p, "v": new})
+        return out
+
+    def snapshot_copy(self):
+        with self.lock:
+            self.refresh()
+            return json.loads(json.dumps(self.state))
+
+    def save_state(self, data: Any):
+        with self.lock:
+            self.refresh()
+            self.commit(LogStore.diff(self.state, data))
+
+# ---- Registre des fichiers journalisés ----
+_LSS: Dict[str, LogStore] = {}
+_LSS_LOCK = threading.Lock()
+LSS_FILES = [globals()[n] for n in ("FRACTAL_FILE", "IDEAS_FILE", "LOGOS_FILE", "ARENA_FILE", "KG_FILE", "RG_FILE")
+             if n in globals()]
+
+def _lss_key(p) -> str:
+    try: return str(Path(p).resolve())
+    except Exception: return str(p)
+
+_LSS_KEYS = {_lss_key(p) for p in LSS_FILES}
+
+def log_store(p, default: Any = None) -> LogStore:
+    k = _lss_key(p)
+    with _LSS_LOCK:
+        st = _LSS.get(k)
+        if st is None:
+            st = _LSS[k] = LogStore(Path(p), default)
+        return st
+
+def _lss_wrap_load(prev):
+    def _load(p, default=None, *a, **kw):
+        if _lss_key(p) in _LSS_KEYS:
+            st = log_store(p, default)
+            return st.snapshot_copy() if st.path.exists() or st.ops else default
+        return prev(p, default, *a, **kw)
+    return _load
+
+def _lss_wrap_save(prev):
+    def _save(p, data, *a, **kw):
+        if _lss_key(p) in _LSS_KEYS:
+            return log_store(p).save_state(data)
+        return prev(p, data, *a, **kw)
+    return _save
+
+for _ln, _sn in (("_load_json", "_save_json"), ("_hload", "_hsave"), ("_gload", "_gsave"), ("_pload", "_psave")):
+    if _ln in globals(): globals()[_ln] = _lss_wrap_load(globals()[_ln])
+    if _sn in globals(): globals()[_sn] = _lss_wrap_save(globals()[_sn])
+if "_wload" in globals(): _wload = _lss_wrap_load(_wload)
+
+def _lss_flush_all():
+    for st in list(_LSS.values()):
+        try:
+            if st.ops: st.compact()
+        except Exception:
+            pass
+
+# CLI
+try:
+    _lss_prev_build = build_parser
+except NameError:
+    _lss_prev_build = None
+
+def build_parser():
+    p = _lss_prev_build() if _lss_prev_build else argparse.ArgumentParser(prog="alsadika")
+    sp = [a for a in p._subparsers._actions if getattr(a,'dest',None)=='cmd'][0]
+    c1 = sp.add_parser("lss-compact", help="Compacter les journaux d'état (instantané + troncature)")
+    c1.set_defaults(_fn=cmd_lss_compact)
+    c2 = sp.add_parser("lss-stats", help="Taille des journaux d'état")
+    c2.set_defaults(_fn=cmd_lss_stats)
+    return p
+
+def cmd_lss_compact(args):
+    for p in LSS_FILES: log_store(p)
+    _lss_flush_all()
+    print(json.dumps({"ok": True, "compacted": [str(p) for p in LSS_FILES]}, ensure_ascii=False, indent=2)); return 0
+
+def cmd_lss_stats(args):
+    out = {}
+    for p in LSS_FILES:
+        st = log_store(p)
+        out[str(p)] = {"pending_ops": st.ops, "log_bytes": st._off, "snapshot_bytes": (st._snap_sig or (0, 0))[1]}
+    print(json.dumps(out, ensure_ascii=False, indent=2)); return 0
+# ===============================
+# FIN PATCH LOG-STORE
+# ===============================
+# ===============================
+# PATCH "HOLO-INDEX" — index inversé jeton → offset pour l'hologramme (append-only)
+# ===============================
+import json, re, threading
+from pathlib import Path
+from typing import Dict, List
+
+HOLO_IDX_FILE = SUPRA_DIR / "hologram.idx.jsonl"
+_HOLO_TOK = re.compile(r"[A-Za-zÀ-ÿ0-9]{3,}")
+
+def _holo_toks(rec: dict) -> set:
+    return set(_HOLO_TOK.findall((rec.get("raw","") + " " + rec.get("summary","")).lower()))
+
+class _HoloIndex:
+    """Postings jeton → [offset octet] dans HOLO_FILE, persistés en JSONL append-only.
+    `end` = offset du premier octet non indexé (rattrapage incrémental si d'autres écrivains)."""
+    def __init__(self, data: Path, idx: Path):
+        self.data, self.idx = data, idx
+        self.lock = threading.RLock()
+        self.post: Dict[str, List[int]] = {}
+        self.end = 0; self.idx_off = 0; self.count = 0
+
+    def _add(self, o: int, n: int, toks):
+        if o < self.end: return
+        for t in toks: self.post.setdefault(t, []).append(o)
+        self.end = o + n; self.count += 1
+
+    def _reset(self):
+        self.post = {}; self.end = 0; self.idx_off = 0; self.count = 0
+        try: self.idx.unlink()
+        except Exception: pass
+
+    def _append_idx(self, lines: List[str]):
+        if not lines: return
+        self.idx.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.idx, "a", encoding="utf-8") as f: f.write("".join(lines))
+
+    def sync(self):
+        with self.lock:
+            try: dsize = self.data.stat().st_size
+            except Exception: dsize = 0
+            if dsize < self.end: self._reset()            # fichier tronqué / remplacé → reconstruction
+            # 1) lignes d'index écrites par d'autres processus
+            if self.idx.exists():
+                with open(self.idx, "rb") as f:
+                    f.seek(self.idx_off)
+                    for raw in f:
+                        if not raw.endswith(b"\n"): break
+                        self.idx_off += len(raw)
+                        try: e = json.loads(raw)
+                        except Exception: continue
+                        self._add(e["o"], e["n"], e["t"])
+            # 2) enregistrements non indexés (écrits avant ce patch ou sans index)
+            if dsize > self.end and self.data.exists():
+                out = []
+                with open(self.data, "rb") as f:
+                    f.seek(self.end); o = self.end
+                    for raw in f:
+                        if not raw.endswith(b"\n"): break
+                        try: toks = sorted(_holo_toks(json.loads(raw)))
+                        except Exception: toks = []
+                        out.append(json.dumps({"o": o, "n": len(raw), "t": toks}, ensure_ascii=False) + "\n")
+                        self._add(o, len(raw), toks); o += len(raw)
+                self._append_idx(out)
+                try: self.idx_off = self.idx.stat().st_size
+                except Exception: pass
+
+    def record(self, o: int, n: int, rec: dict):
+        with self.lock:
+            if o != self.end: return self.sync()          # trou: on rattrape depuis le fichier
+            toks = sorted(_holo_toks(rec))
+            self._append_idx([json.dumps({"o": o, "n": n, "t": toks}, ensure_ascii=False) + "\n"])
+            self._add(o, n, toks)
+            try: self.idx_off = self.idx.stat().st_size
+            except Exception: pass
+
+    def read_at(self, offs: List[int]) -> Dict[int, dict]:
+        out = {}
+        with open(self.data, "rb") as f:
+            for o in sorted(offs):
+                f.seek(o)
+                try: out[o] = json.loads(f.readline())
+                except Exception: pass
+        return out
+
+# Pas d'instance globale: HOLO-SEGMENTS tient un _HoloSegIndex par segment (l'ancien
+# hologram.idx.jsonl y est repris comme index du segment 1 lors de la migration).
+# ===============================
+# FIN PATCH HOLO-INDEX
+# ===============================
+# ===============================
+# PATCH "HOLO-SEGMENTS" — hologramme segmenté, rétention, segments froids compressés (append-only)
+# ===============================
+import json, os, re, gzip, time, heapq, threading, contextlib
+from pathlib import Path
+from typing import Dict, List, Tuple
+try:
+    import zstandard as _zstd
+except Exception:
+    _zstd = None
+
+HOLO_SEG_DIR        = SUPRA_DIR / "hologram"
+HOLO_SEG_MAX_BYTES  = 4 << 20        # rotation au-delà de 4 Mo…
+HOLO_SEG_MAX_AGE    = 86400          # …ou d'un jour
+HOLO_HOT_SEGMENTS   = 2              # segments gardés non compressés (actif + précédent)
+HOLO_RETAIN_SEGMENTS = 64            # rétention: nb max de segments
+HOLO_RETAIN_DAYS    = 90             # rétention: âge max (jours, 0 = illimité)
+HOLO_COMPRESS       = "zstd" if _zstd is not None else "gzip"
+_HOLO_SEG_RE = re.compile(r"^seg-(\d{6})\.jsonl(\.gz|\.zst)?$")
+
+class _HoloSegIndex(_HoloIndex):
+    """Index d'un segment; une fois froid (compressé), seul le fichier d'index est relu.
+    `offs` = offsets de toutes les fiches (ordre d'écriture); `sealed` = segment clos déjà synchronisé."""
+    cold = False
+    sealed = False
+    def __init__(self, data: Path, idx: Path):
+        super().__init__(data, idx); self.offs: List[int] = []
+
+    def _add(self, o: int, n: int, toks):
+        if o < self.end: return
+        self.offs.append(o); super()._add(o, n, toks)
+
+    def _reset(self):
+        super()._reset(); self.offs = []; self.sealed = False
+
+    def sync(self):
+        if not self.cold: return super().sync()
+        with self.lock:
+            if not self.idx.exists(): return
+            with open(self.idx, "rb") as f:
+                f.seek(self.idx_off)
+                for raw in f:
+                    if not raw.endswith(b"\n"): break
+                    self.idx_off += len(raw)
+                    try: e = json.loads(raw)
+                    except Exception: continue
+                    self._add(e["o"], e["n"], e["t"])
+
+class HoloSegments:
+    def __init__(self, root: Path = HOLO_SEG_DIR):
+        self.root = root; self.root.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.RLock()
+        self.idx: Dict[int, _HoloSegIndex] = {}
+        self._cold_cache: Dict[int, bytes] = {}
+        self._migrate_legacy()
+
+    # ---- chemins ----
+    def hot(self, sid: int) -> Path: return self.root / f"seg-{sid:06d}.jsonl"
+    def idx_path(self, sid: int) -> Path: return self.root / f"seg-{sid:06d}.idx.jsonl"
+    def cold(self, sid: int) -> Path:
+        for suf in (".zst", ".gz"):
+            p = self.root / f"seg-{sid:06d}.jsonl{suf}"
+            if p.exists(): return p
+        return None
+
+    def segments(self) -> List[int]:
+        ids = set()
+        for name in os.listdir(self.root):
+            m = _HOLO_SEG_RE.match(name)
+            if m: ids.add(int(m.group(1)))
+        return sorted(ids) or [1]
+
+    def active(self) -> int: return self.segments()[-1]
+
+    def _migrate_legacy(self):
+        legacy = SUPRA_DIR / "hologram.jsonl"
+        if legacy.exists() and not any(_HOLO_SEG_RE.match(n) for n in os.listdir(self.root)):
+            os.replace(legacy, self.hot(1))
+            if HOLO_IDX_FILE.exists(): os.replace(HOLO_IDX_FILE, self.idx_path(1))
+
+    def index(self, sid: int) -> _HoloSegIndex:
+        ix = self.idx.get(sid)
+        if ix is None:
+            ix = self.idx[sid] = _HoloSegIndex(self.hot(sid), self.idx_path(sid))
+        ix.cold = not self.hot(sid).exists() and self.cold(sid) is not None
+        return ix
+
+    # ---- écriture + rotation ----
+    def _seg_start(self, sid: int) -> float:
+        try:
+            with open(self.hot(sid), "rb") as f: return float(json.loads(f.readline()).get("ts", 0))
+        except Exception:
+            return 0.0
+
+    def _maybe_rotate(self, sid: int) -> int:
+        p = self.hot(sid)
+        try: size = p.stat().st_size
+        except Exception: return sid
+        start = self._seg_start(sid) if size else 0.0
+        if size >= HOLO_SEG_MAX_BYTES or (start and time.time() - start >= HOLO_SEG_MAX_AGE):
+            sid += 1; self.hot(sid).touch()
+            self._compress_cold(); self._retain()
+        return sid
+
+    def write(self, obj: dict):
+        line = (json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8")
+        with self.lock, (file_lock(self.root / "active") if "file_lock" in globals() else contextlib.nullcontext()):
+            sid = self._maybe_rotate(self.active())
+            with open(self.hot(sid), "ab") as f:
+                f.seek(0, os.SEEK_END); o = f.tell(); f.write(line)
+            try: self.index(sid).record(o, len(line), obj)
+            except Exception: pass
+        globals()["HOLO_FILE"] = self.hot(sid)
+
+    def _compress_cold(self):
+        ids = self.segments()
+        for sid in ids[:-max(1, HOLO_HOT_SEGMENTS)]:
+            src = self.hot(sid)
+            if not src.exists(): continue
+            self.index(sid).sync()                         # index complet avant de geler
+            raw = src.read_bytes()
+            if HOLO_COMPRESS == "zstd" and _zstd is not None:
+                dst, data = Path(str(src) + ".zst"), _zstd.ZstdCompressor(level=10).compress(raw)
+            else:
+                dst, data = Path(str(src) + ".gz"), gzip.compress(raw, compresslevel=6)
+            tmp = Path(str(dst) + ".tmp"); tmp.write_bytes(data); os.replace(tmp, dst)
+            src.unlink(missing_ok=True)
+            self.index(sid)
+
+    def _retain(self):
+        ids = self.segments(); act = ids[-1]; now = time.time()
+        drop = set(ids[:-HOLO_RETAIN_SEGMENTS]) if HOLO_RETAIN_SEGMENTS and len(ids) > HOLO_RETAIN_SEGMENTS else set()
+        if HOLO_RETAIN_DAYS:
+            for sid in ids:
+                p = self.hot(sid) if self.hot(sid).exists() else self.cold(sid)
+                try:
+                    if p and now - p.stat().st_mtime > HOLO_RETAIN_DAYS * 86400: drop.add(sid)
+                except Exception: pass
+        drop.discard(act)
+        for sid in drop:
+            for p in (self.hot(sid), self.cold(sid), self.idx_path(sid)):
+                if p is not None: p.unlink(missing_ok=True)
+            self.idx.pop(sid, None); self._cold_cache.pop(sid, None)
+
+    # ---- lecture ----
+    def _cold_bytes(self, sid: int) -> bytes:
+        b = self._cold_cache.get(sid)
+        if b is None:
+            p = self.cold(sid)
+            if p is None: return b""
+            raw = p.read_bytes()
+            b = _zstd.ZstdDecompressor().decompress(raw) if p.suffix == ".zst" else gzip.decompress(raw)
+            if len(self._cold_cache) >= 2: self._cold_cache.pop(next(iter(self._cold_cache)))
+            self._cold_cache[sid] = b
+        return b
+
+    def read_at(self, sid: int, offs: List[int]) -> Dict[int, dict]:
+        if self.hot(sid).exists(): return self.index(sid).read_at(offs)
+        b, out = self._cold_bytes(sid), {}
+        for o in offs:
+            e = b.find(b"\n", o)
+            try: out[o] = json.loads(b[o:(e + 1 if e >= 0 else len(b))])
+            except Exception: pass
+        return out
+
+    def _read_seg(self, sid: int) -> List[bytes]:
+        if self.hot(sid).exists(): return self.hot(sid).read_bytes().splitlines()
+        return self._cold_bytes(sid).splitlines()
+
+    def tail(self, n: int = 8) -> List[dict]:
+        """n dernières fiches: lecture par blocs depuis la fin du segment actif (et du précédent si besoin)."""
+        out: List[dict] = []
+        for sid in reversed(self.segments()):
+            if len(out) >= n: break
+            p = self.hot(sid)
+            if not p.exists():
+                recs = [json.loads(x) for x in self._read_seg(sid) if x.strip()]
+                out = recs[-(n - len(out)):] + out; continue
+            with open(p, "rb") as f:
+                f.seek(0, os.SEEK_END); pos = f.tell(); buf = b""
+                while pos > 0 and buf.count(b"\n") <= (n - len(out)):
+                    step = min(65536, pos); pos -= step; f.seek(pos); buf = f.read(step) + buf
+            lines = [x for x in buf.splitlines() if x.strip()]
+            if pos > 0: lines = lines[1:]                  # première ligne possiblement tronquée
+            recs = []
+            for x in lines[-(n - len(out)):]:
+                try: recs.append(json.loads(x))
+                except Exception: pass
+            out = recs + out
+        return out[-n:] if n else []
+
+    def recall(self, query: str, k: int = 3) -> List[dict]:
+        qs = set(_HOLO_TOK.findall(query.lower())); k = max(0, int(k))
+        if not k: return []
+        hits: Dict[Tuple[int, int], int] = {}
+        ids = self.segments(); act = ids[-1]
+        for sid in ids:
+            ix = self.index(sid)
+            if not ix.sealed:                             # segments clos: plus d'écriture, une synchro suffit
+                ix.sync(); ix.sealed = sid != act
+            for t in qs:
+                for o in ix.post.get(t, ()): hits[(sid, o)] = hits.get((sid, o), 0) + 1
+        keys = [key for _, key in heapq.nsmallest(k, ((-c, key) for key, c in hits.items()))]
+        for sid in ids:                                   # compléter (score 0) par les plus anciennes fiches, via l'index
+            if len(keys) >= k: break
+            for o in self.index(sid).offs:
+                if len(keys) >= k: break
+                if (sid, o) not in hits: keys.append((sid, o))
+        by_seg: Dict[int, List[int]] = {}
+        for sid, o in keys: by_seg.setdefault(sid, []).append(o)
+        recs = {(sid, o): r for sid, offs in by_seg.items() for o, r in self.read_at(sid, offs).items()}
+        return [recs[key] for key in keys if key in recs]
+
+    def lines(self) -> List[dict]:
+        out = []
+        for sid in self.segments():
+            for x in self._read_seg(sid):
+                if x.strip():
+                    try: out.append(json.loads(x))
+                    except Exception: pass
+        return out
+
+    def stats(self) -> Dict[str, object]:
+        segs = []
+        for sid in self.segments():
+            p = self.hot(sid) if self.hot(sid).exists() else self.cold(sid)
+            segs.append({"id": sid, "file": p.name if p else None, "bytes": p.stat().st_size if p and p.exists() else 0})
+        return {"dir": str(self.root), "compress": HOLO_COMPRESS, "segments": segs,
+                "total_bytes": sum(s["bytes"] for s in segs)}
+
+HOLO_SEGS = HoloSegments()
+HOLO_FILE = HOLO_SEGS.hot(HOLO_SEGS.active())
+
+def _holo_write(obj: dict):
+    HOLO_SEGS.write(obj)
+
+def _holo_lines():
+    return HOLO_SEGS.lines()
+
+def holo_tail(n: int = 8):
+    return HOLO_SEGS.tail(n)
+
+def holo_recall(query: str, k=3):
+    return HOLO_SEGS.recall(query, k)
+
+def dreams_tick():
+    src = holo_tail(8)
+    if not src: return {"ok": False, "msg": "rien à rêver"}
+    a = random.choice(src); b = random.choice(src)
+    blend = f"Rêve: {a.get('summary','')} ↔ {b.get('metaphor','')}"
+    rec = {"ts": int(time.time()), "dream": blend, "a": a.get("hid"), "b": b.get("hid")}
+    if "_dreams_append" in globals(): _dreams_append(rec)
+    else:
+        with DREAMS_FILE.open("a", encoding="utf-8") as f: f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+    return {"ok": True, "dream": blend}
+# ===============================
+# FIN PATCH HOLO-SEGMENTS
+# ===============================
+# ===============================
+# PATCH "IDEAS-GARDEN" — idées indexées par radical, déclin paresseux (append-only)
+# ===============================
+import json, time, heapq, atexit, threading, contextlib
+from typing import Any, Dict, List
+
+IDEAS_FLUSH_OPS = 64        # persistance par lots: N opérations…
+IDEAS_FLUSH_S   = 5.0       # …ou toutes les S secondes
+
+class IdeaGarden:
+    """Idées résidentes {radical: fiche}. Le déclin est une horloge globale D (cumul des
+    `_ideas_decay`) : vitalité effective = vitalité stockée - (D - d0). Aucun parcours au déclin ;
+    les morts sont retirées paresseusement via un tas min sur le « potentiel » (vitalité + d0), et leur
+    suppression journalisée au flush suivant; le déclin lui-même n'est persisté que comme D += d.
+    Les mutations sont appliquées localement (fiches modifiées: `dirty`) et mémorisées comme opérations
+    logiques (touch, decay…). Au flush, si personne n'a écrit depuis notre dernière lecture, seules les
+    fiches modifiées sont journalisées (O(modifications)); sinon les opérations sont rejouées sur l'état
+    frais (LogStore.update) puis l'état rechargé: pas de mise à jour perdue entre workers."""
+
+    def __init__(self, path=IDEAS_FILE):
+        self.store = log_store(path, {"ideas": {}})
+        self.lock = threading.RLock()
+        self.pending: List[tuple] = []; self.t_flush = time.time()
+        self.dirty: set = set(); self._full = False
+        self._load()
+
+    @staticmethod
+    def _norm(st):
+        st = st if isinstance(st, dict) else {}
+        raw = st.get("ideas")
+        if isinstance(raw, list):                         # ancien format (liste) → dict
+            raw = {i["stem"]: dict(i, d0=0) for i in raw if isinstance(i, dict) and i.get("stem")}
+        return int(st.get("D", 0)), (raw if isinstance(raw, dict) else {})
+
+    def _load(self):
+        """Rechargement complet (démarrage, écritures concurrentes); appelé sans opérations en attente."""
+        with self.lock, self.store.lock:
+            self.D, self.ideas = self._norm(self.store.snapshot_copy())
+            self._pos = (self.store._snap_sig, self.store._off)
+            self.dirty, self._full = set(), False
+            self._rebuild(); self._prune()
+
+    def _sync(self):
+        """Rattrape les écritures des autres workers avant une lecture: fiches relues d'après la fin
+        du journal si possible, sinon rechargement (nos opérations en attente sont d'abord rejouées)."""
+        with self.lock, self.store.lock:
+            self.store.refresh()
+            pos = (self.store._snap_sig, self.store._off)
+            if pos == self._pos: return
+            if self.pending: self.flush(); return
+            if pos[0] != self._pos[0] or not self._catch_up(self._pos[1]): self._load()
+
+    def _catch_up(self, off: int) -> bool:
+        """Relit le journal depuis `off` et ne reprend que les fiches qu'il touche. False → rechargement."""
+        st = self.store.state
+        if not isinstance(st, dict) or not isinstance(st.get("ideas"), dict) or self.store._off < off: return False
+        stems = set()
+        try:
+            with open(self.store.log, "rb") as f:
+                f.seek(off); raw = f.read(self.store._off - off)
+            for ln in raw.splitlines():
+                p = json.loads(ln).get("p") or []
+                if p == ["D"]: continue
+                if len(p) < 2 or p[0] != "ideas": return False
+                stems.add(p[1])
+        except Exception:
+            return False
+        self.D = int(st.get("D", 0))
+        for s in stems:
+            i = st["ideas"].get(s)
+            if i is None: self.ideas.pop(s, None)
+            else: self.ideas[s] = dict(i); self._push(s, self.ideas[s])
+        self._pos = (self.store._snap_sig, self.store._off)
+        self._prune()
+        return True
+
+    # ---- opérations logiques (rejeu sur n'importe quel état) ----
+    @classmethod
+    def _apply(cls, ideas: Dict[str, Any], D: int, op: tuple) -> int:
+        kind = op[0]
+        if kind == "touch":
+            _, seeds, now = op
+            for s in seeds:
+                i = ideas.get(s); v = max(0, cls._pot(i) - D) if i is not None else 0
+                ideas[s] = (dict(i, use=i["use"] + 1, vitality=min(100, v + 3), last=now, d0=D) if v > 0 else
+                            {"stem": s, "use": 1, "vitality": 10, "born": now, "last": now, "tags": [], "d0": D})
+        elif kind == "decay":
+            D += op[1]                                    # fiches mortes laissées en place (invisibles)
+        elif kind == "mutate":
+            pop = heapq.nsmallest(2, (i for i in ideas.values() if cls._pot(i) > D),
+                                  key=lambda i: (-cls._pot(i), -i["use"], i["stem"]))
+            if len(pop) >= 2:
+                child = cls._child(pop[0]["stem"], pop[1]["stem"])
+                if child not in ideas:
+                    ideas[child] = {"stem": child, "use": 0, "vitality": 7, "born": op[1], "last": op[1],
+                                    "tags": ["mut"], "d0": D}
+        elif kind == "replace":
+            ideas.clear(); ideas.update({i["stem"]: dict(i, d0=D) for i in op[1]})
+        return D
+
+    @staticmethod
+    def _child(a: str, b: str) -> str:
+        return (a[: max(2,len(a)//2)] + b[-max(2,len(b)//2):]).lower()
+
+    def _replay(self, ops):
+        def fn(st):
+            D, ideas = self._norm(st)
+            for op in ops: D = self._apply(ideas, D, op)
+            out = dict(st) if isinstance(st, dict) else {}
+            out["ideas"], out["D"] = ideas, D
+            return out
+        return fn
+
+    # ---- tas ----
+    @staticmethod
+    def _pot(i) -> int: return int(i["vitality"]) + int(i.get("d0", 0))
+    def _rebuild(self):
+        self.top = [(-self._pot(i), -i["use"], s) for s, i in self.ideas.items()]; heapq.heapify(self.top)
+        self.low = [(self._pot(i), s) for s, i in self.ideas.items()]; heapq.heapify(self.low)
+    def _push(self, s: str, i):
+        heapq.heappush(self.top, (-self._pot(i), -i["use"], s)); heapq.heappush(self.low, (self._pot(i), s))
+        if len(self.top) > 4 * len(self.ideas) + 64: self._rebuild()
+
+    def _prune(self):
+        while self.low and self.low[0][0] <= self.D:
+            pot, s = heapq.heappop(self.low)
+            i = self.ideas.get(s)
+            if i is not None and self._pot(i) == pot: del self.ideas[s]; self.dirty.add(s)
+
+    def vitality(self, i) -> int: return max(0, self._pot(i) - self.D)
+
+    # ---- persistance par lots ----
+    def _op(self, op: tuple):
+        self.pending.append(op)
+        if len(self.pending) >= IDEAS_FLUSH_OPS or time.time() - self.t_flush >= IDEAS_FLUSH_S: self.flush()
+    def flush(self):
+        st = self.store
+        with self.lock, st.lock, (_lss_flock(st) if "_lss_flock" in globals() else contextlib.nullcontext()):
+            ops, self.pending = self.pending, []
+            self.t_flush = time.time()
+            if not ops: return
+            st.refresh()
+            if (st._snap_sig, st._off) == self._pos:      # personne n'a écrit: l'état résident est à jour
+                st.commit(self._resident_ops())
+                self._pos = (st._snap_sig, st._off); self.dirty, self._full = set(), False
+            else:
+                st.update(self._replay(ops))
+                self._load()                              # état fusionné (autres workers + nos opérations)
+
+    def _resident_ops(self) -> List[Dict[str, Any]]:
+        cur = self.store.state.get("ideas") if isinstance(self.store.state, dict) else None
+        if self._full or not isinstance(cur, dict):
+            ops = [{"op": "set", "p": ["ideas"], "v": self.ideas}]
+        else:
+            ops = [{"op": "set", "p": ["ideas", s], "v": self.ideas[s]} if s in self.ideas else
+                   {"op": "del", "p": ["ideas", s]} for s in sorted(self.dirty)]
+        ops.append({"op": "set", "p": ["D"], "v": self.D})
+        return ops
+
+    def _put(self, s: str, i):
+        self.ideas[s] = i; self._push(s, i); self.dirty.add(s)
+
+    # ---- API ----
+    def touch(self, seeds: List[str], now: int = None):
+        now = now or int(time.time())
+        with self.lock:
+            for s in seeds:
+                i = self.ideas.get(s)
+                if i is not None and self.vitality(i) > 0:
+                    i = dict(i, use=i["use"] + 1, vitality=min(100, self.vitality(i) + 3), last=now, d0=self.D)
+                else:
+                    i = {"stem": s, "use": 1, "vitality": 10, "born": now, "last": now, "tags": [], "d0": self.D}
+                self._put(s, i)
+            self._op(("touch", list(seeds), now))
+
+    def decay(self, d: int = 1):
+        with self.lock:
+            self.D += int(d); self._prune()
+            self._op(("decay", int(d)))
+
+    def peek(self, k: int = 10) -> List[Dict[str, Any]]:
+        with self.lock:
+            self._sync()
+            out, keep = [], []
+            while self.top and len(out) < k:
+                e = heapq.heappop(self.top); npot, nuse, s = e
+                i = self.ideas.get(s)
+                if i is None or self._pot(i) != -npot or i["use"] != -nuse or self.vitality(i) <= 0: continue
+                keep.append(e); out.append(dict(i, vitality=self.vitality(i)))
+            for e in keep: heapq.heappush(self.top, e)
+            for o in out: o.pop("d0", None)
+            return out
+
+    def mutate(self, now: int = None):
+        now = now or int(time.time())
+        with self.lock:
+            pop = self.peek(2)
+            if len(pop) >= 2:
+                child = self._child(pop[0]["stem"], pop[1]["stem"])
+                if child not in self.ideas:
+                    self._put(child, {"stem": child, "use": 0, "vitality": 7, "born": now, "last": now,
+                                      "tags": ["mut"], "d0": self.D})
+            self._op(("mutate", now))
+
+    def count(self) -> int:
+        with self.lock:
+            self._sync()
+            return sum(1 for i in self.ideas.values() if self.vitality(i) > 0)
+
+    def as_list(self) -> List[Dict[str, Any]]:
+        with self.lock:
+            self._sync()
+            return [{k: v for k, v in dict(i, vitality=self.vitality(i)).items() if k != "d0"}
+                    for i in self.ideas.values() if self.vitality(i) > 0]
+
+IDEAS = IdeaGarden()
+atexit.register(IDEAS.flush)
+
+def _ideas_db() -> Dict[str, Any]:
+    return {"ideas": IDEAS.as_list()}
+
+def _ideas_save(db):
+    items = [{k: v for k, v in i.items() if k != "d0"} for i in (db or {}).get("ideas", []) if i.get("stem")]
+    with IDEAS.lock:
+        IDEAS.ideas = {i["stem"]: dict(i, d0=IDEAS.D) for i in items}; IDEAS._rebuild(); IDEAS._full = True
+        IDEAS.pending.append(("replace", items)); IDEAS.flush()
+
+def ideas_touch(text: str) -> None:
+    IDEAS.touch(_extract_ideas(text))
+
+def _ideas_decay(decay: int = 1) -> None:
+    IDEAS.decay(decay)
+
+def ideas_mutate() -> None:
+    IDEAS.mutate()
+
+def ideas_peek(k: int = 10) -> List[Dict[str, Any]]:
+    return IDEAS.peek(k)
+
+def cmd_ideas_garden(args):
+    _ideas_decay(decay=2); ideas_mutate(); IDEAS.flush()
+    print(json.dumps({"ok": True, "count": IDEAS.count()}, ensure_ascii=False, indent=2)); return 0
+# ===============================
+# FIN PATCH IDEAS-GARDEN
+# ===============================
+# ===============================
+# PATCH "LOGOS-RESIDENT" — vocabulaire résident + persistance append-only (append-only)
+# ===============================
+import argparse, json, re, os, threading, contextlib
+from pathlib import Path
+from typing import Any, Dict, List
+
+LOGOS_VOCAB_FILE = ROOT_P / "logos.vocab"       # un mot par ligne; index = n° de ligne (1-based)
+_LOGOS_TOK = re.compile(r"[A-Za-zÀ-ÿ0-9']{2,}")
+
+class LogosVocab:
+    """mot → index (dict) et index → mot (liste). Les nouveaux mots sont ajoutés en fin
+    de fichier sous verrou, après rattrapage des ajouts d'autres processus."""
+
+    def __init__(self, path: Path = LOGOS_VOCAB_FILE):
+        self.path = path; self.lock = threading.RLock()
+        self.ids: Dict[str, int] = {}; self.words: List[str] = [""]   # index 0 réservé
+        self.off = 0
+        if not self.path.exists(): self._import_legacy()
+        self._sync()
+
+    def _import_legacy(self):
+        try: db = json.loads(LOGOS_FILE.read_text(encoding="utf-8")) if LOGOS_FILE.exists() else {}
+        except Exception: db = {}
+        inv = db.get("inv") or {}
+        words = [inv[k] for k in sorted(inv, key=lambda x: int(x)) if str(inv[k]).strip()]
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text("".join(w + "\n" for w in words), encoding="utf-8"); os.replace(tmp, self.path)
+
+    def _sync(self):
+        if not self.path.exists(): return
+        with open(self.path, "rb") as f:
+            f.seek(self.off)
+            for raw in f:
+                if not raw.endswith(b"\n"): break
+                self.off += len(raw)
+                w = raw[:-1].decode("utf-8")
+                self.words.append(w); self.ids.setdefault(w, len(self.words) - 1)
+
+    def _add(self, new: List[str]):
+        with self.lock, (file_lock(self.path) if "file_lock" in globals() else contextlib.nullcontext()):
+            self._sync()
+            new = [w for w in dict.fromkeys(new) if w not in self.ids]
+            if not new: return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "ab") as f: f.write("".join(w + "\n" for w in new).encode("utf-8"))
+            self._sync()
+
+    def encode_batch(self, texts: List[str]) -> List[List[int]]:
+        toks = [[t.lower() for t in _LOGOS_TOK.findall(x or "")] for x in texts]
+        with self.lock:
+            missing = [t for ts in toks for t in ts if t not in self.ids]
+            if missing: self._add(missing)
+            return [[self.ids[t] for t in ts] for ts in toks]
+
+    def encode(self, text: str) -> List[int]:
+        return self.encode_batch([text])[0]
+
+    def decode(self, seq: List[int]) -> List[str]:
+        with self.lock:
+            if seq and max(seq) >= len(self.words): self._sync()
+            return [self.words[i] if 0 < i < len(self.words) else "<unk>" for i in seq]
+
+    def __len__(self): return len(self.words) - 1
+
+LOGOS = LogosVocab()
+
+def logos_encode(text: str) -> List[int]:
+    return LOGOS.encode(text)
+
+def logos_encode_batch(texts: List[str]) -> List[List[int]]:
+    return LOGOS.encode_batch(texts)
+
+def logos_decode(seq: List[int]) -> str:
+    return " ".join(LOGOS.decode(seq))
+
+def logos_vocab() -> Dict[str, Any]:
+    # vue compatible (vocab/inv en chaînes) — O(taille), réservée aux lecteurs historiques
+    return {"vocab": {w: str(i) for w, i in LOGOS.ids.items()},
+            "inv": {str(i): w for i, w in enumerate(LOGOS.words) if i}}
+
+def logos_stats() -> Dict[str, Any]:
+    LOGOS._sync()
+    return {"size": len(LOGOS), "top": [(w, str(i)) for i, w in enumerate(LOGOS.words[1:11], start=1)]}
+
+try:
+    _logos_prev_build = build_parser
+except NameError:
+    _logos_prev_build = None
+
+def build_parser():
+    p = _logos_prev_build() if _logos_prev_build else argparse.ArgumentParser(prog="alsadika")
+    sp = [a for a in p._subparsers._actions if getattr(a,'dest',None)=='cmd'][0]
+    c1 = sp.add_parser("logos-decode", help="Décoder une séquence logos (ex: 1,2,3)")
+    c1.add_argument("--seq", required=True); c1.set_defaults(_fn=cmd_logos_dec)
+    return p
+
+def cmd_logos_dec(args):
+    seq = [int(x) for x in re.split(r"[,\s]+", args.seq.strip()) if x]
+    print(json.dumps({"text": logos_decode(seq)}, ensure_ascii=False, indent=2)); return 0
+# ===============================
+# FIN PATCH LOGOS-RESIDENT
+# ===============================
+# ===============================
+# PATCH "FRACTAL-SHARDS" — mémoire fractale partitionnée par clé de tête (append-only)
+# ===============================
+import json, os, re, hashlib, threading
+from pathlib import Path
+from typing import Any, Dict, List
+
+def _fr_keys(path: str) -> List[str]:
+    return [k for k in re.split(r"[\\/]+", (path or "").strip()) if k]
+
+def _fr_copy(v):
+    return json.loads(json.dumps(v)) if isinstance(v, (dict, list)) else v
+
+class FractalMemory:
+    """Arbre partitionné: un LogStore (instantané + journal) par clé de tête dans <fichier>.d/,
+    plus un manifeste des clés. Les sous-arbres ne sont chargés qu'au premier accès."""
+    _lock = threading.RLock()
+
+    def __init__(self, path: Path = FRACTAL_FILE):
+        self.path = Path(path)
+        self.dir = self.path.parent / (self.path.stem + ".d")
+        self.manifest = log_store(self.dir / "index.json", {"keys": {}})
+        self._migrate_legacy()
+
+    def _migrate_legacy(self):
+        if not self.path.exists() or self.manifest.state.get("keys"): return
+        with FractalMemory._lock:
+            try: root = json.loads(self.path.read_text(encoding="utf-8")).get("root") or {}
+            except Exception: root = {}
+            for k, v in root.items(): self._shard(k, create=True).commit([{"op": "set", "p": [], "v": v}])
+            for st in [self.manifest] + [self._shard(k) for k in root]: st.compact()
+            os.replace(self.path, self.path.with_suffix(self.path.suffix + ".migrated"))
+
+    def _shard_file(self, key: str) -> Path:
+        slug = re.sub(r"[^A-Za-z0-9_-]", "_", key)[:40]
+        return self.dir / f"{slug}-{hashlib.sha1(key.encode('utf-8')).hexdigest()[:10]}.json"
+
+    def _shard(self, key: str, create: bool = False):
+        self.manifest.refresh()
+        name = self.manifest.state.get("keys", {}).get(key)
+        if name is None:
+            if not create: return None
+            name = self._shard_file(key).name
+            self.manifest.set(["keys", key], name)
+        return log_store(self.dir / name, {})
+
+    def top_keys(self) -> List[str]:
+        self.manifest.refresh()
+        return list(self.manifest.state.get("keys", {}).keys())
+
+    # ---- API historique ----
+    def set(self, path: str, value: Any) -> None:
+        keys = _fr_keys(path)
+        if not keys: return
+        with FractalMemory._lock:
+            st = self._shard(keys[0], create=True); st.refresh()
+            ops = []
+            if len(keys) > 1 and not isinstance(st.state, dict): ops.append({"op": "set", "p": [], "v": {}})
+            ops.append({"op": "set", "p": keys[1:], "v": value})
+            st.commit(ops)
+
+    def get(self, path: str, default=None) -> Any:
+        keys = _fr_keys(path)
+        if not keys: return self.tree()
+        st = self._shard(keys[0])
+        if st is None: return default
+        st.refresh(); node = st.state
+        for k in keys[1:]:
+            if not isinstance(node, dict) or k not in node: return default
+            node = node[k]
+        return _fr_copy(node)
+
+    def delete(self, path: str) -> bool:
+        keys = _fr_keys(path)
+        if not keys: return False
+        with FractalMemory._lock:
+            st = self._shard(keys[0])
+            if st is None: return False
+            st.refresh()
+            if len(keys) > 1:
+                chain, node = [st.state], st.state
+                for k in keys[1:]:
+                    if not isinstance(node, dict) or k not in node: return False
+                    node = node[k]; chain.append(node)
+                ops = [{"op": "del", "p": keys[1:]}]
+                # nettoyage des branches vides (remontée)
+                for d in range(len(keys) - 2, 0, -1):
+                    parent = chain[d]
+                    if isinstance(parent, dict) and set(parent.keys()) <= {keys[d + 1]}:
+                        ops.append({"op": "del", "p": keys[1:d + 1]})
+                    else:
+                        break
+                st.commit(ops)
+                if not (isinstance(st.state, dict) and not st.state): return True
+            name = self.manifest.state["keys"].get(keys[0])
+            self.manifest.delete(["keys", keys[0]])
+            for p in (self.dir / name, Path(str(self.dir / name) + ".oplog")):
+                try: p.unlink()
+                except Exception: pass
+            globals()["_LSS"].pop(_lss_key(self.dir / name), None)
+            return True
+
+    def tree(self, path: str = "") -> Dict[str, Any]:
+        if not path:
+            return {k: self.get(k) for k in self.top_keys()}
+        node = self.get(path, default=None)
+        return node if isinstance(node, dict) else {}
+
+    def keys(self, path: str = "") -> List[str]:
+        if not _fr_keys(path): return self.top_keys()
+        node = self.get(path, default=None)
+        return list(node.keys()) if isinstance(node, dict) else []
+
+    @property
+    def data(self) -> Dict[str, Any]:
+        return {"root": self.tree()}
+
+# lecteurs historiques du fichier (phyl-bind/check « fractal ») → vue reconstituée
+_LSS_KEYS.discard(_lss_key(FRACTAL_FILE))
+def _fr_wrap_load(prev):
+    def _load(p, default=None, *a, **kw):
+        if _lss_key(p) == _lss_key(FRACTAL_FILE): return FractalMemory().data
+        return prev(p, default, *a, **kw)
+    return _load
+for _ln in ("_gload", "_pload", "_wload"):
+    if _ln in globals(): globals()[_ln] = _fr_wrap_load(globals()[_ln])
+
+# anamnèse: seules les clés de tête sont utiles → manifeste, sans charger les sous-arbres
+def anamnesis(prompt: str, k=3):
+    ctx = []
+    try:
+        if 'holo_recall' in globals():
+            for r in (holo_recall(prompt, k=k) or []):
+                ctx.append(f"[HOLO] {r.get('summary','')}")
+    except Exception: pass
+    try:
+        for kk in FractalMemory().top_keys()[:5]:
+            ctx.append(f"[FRACTAL:{kk}] …")
+    except Exception: pass
+    try:
+        if 'cpu_query' in globals():
+            for h in (cpu_query(prompt, k=k) or []):
+                ctx.append(f"[RAG] {h['snippet']}")
+    except Exception: pass
+    return "\n".join(ctx)[:1800]
+# ===============================
+# FIN PATCH FRACTAL-SHARDS
+# ===============================
+# ===============================
+# PATCH "KG-INDEX" — graphe de connaissances indexé + requêtes multi-sauts (append-only)
+# ===============================
+import argparse, json, time, heapq, threading
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+class _KGIndex:
+    """Index résident d'un kg.json: ensemble des nœuds, arêtes sortantes/entrantes par nœud
+    puis par relation (indices d'arêtes). Persistance incrémentale via LogStore (ext positionnel)."""
+    def __init__(self, path: Path):
+        self.store = log_store(path, {"nodes": [], "edges": []})
+        self.lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self.nodes: set = set(); self.n_nodes = 0; self.n_edges = 0
+        self.out: Dict[str, Dict[str, List[int]]] = {}
+        self.inc: Dict[str, Dict[str, List[int]]] = {}
+
+    def sync(self):
+        with self.lock:
+            self.store.refresh()
+            st = self.store.state
+            nodes, edges = st.setdefault("nodes", []), st.setdefault("edges", [])
+            if len(nodes) < self.n_nodes or len(edges) < self.n_edges: self._reset()
+            for n in nodes[self.n_nodes:]: self.nodes.add(n)
+            for i in range(self.n_edges, len(edges)):
+                e = edges[i]
+                self.out.setdefault(e["s"], {}).setdefault(e["r"], []).append(i)
+                self.inc.setdefault(e["d"], {}).setdefault(e["r"], []).append(i)
+            self.n_nodes, self.n_edges = len(nodes), len(edges)
+
+    def add(self, src: str, rel: str, dst: str):
+        with self.lock:
+            self.sync()
+            new = [n for n in dict.fromkeys((src, dst)) if n not in self.nodes]
+            ops = []
+            if new: ops.append({"op": "ext", "p": ["nodes"], "at": self.n_nodes, "v": new})
+            ops.append({"op": "ext", "p": ["edges"], "at": self.n_edges,
+                        "v": [{"s": src, "r": rel, "d": dst, "ts": int(time.time())}]})
+            self.store.commit(ops)
+            self.sync()
+
+    def edges(self, node: str, direction: str = "out", rel: Optional[str] = None):
+        """Arêtes du nœud dans l'ordre d'insertion (fusion des listes par relation, déjà triées)."""
+        m = (self.out if direction == "out" else self.inc).get(node, {})
+        E = self.store.state["edges"]
+        for i in (m.get(rel, []) if rel else heapq.merge(*m.values())): yield E[i]
+
+_KG_IDX: Dict[str, _KGIndex] = {}
+
+@dataclass
+class KnowledgeGraph:
+    path: Path = KG_FILE
+
+    @property
+    def ix(self) -> _KGIndex:
+        k = _lss_key(self.path)
+        if k not in _KG_IDX: _KG_IDX[k] = _KGIndex(self.path)
+        _KG_IDX[k].sync(); return _KG_IDX[k]
+
+    @property
+    def data(self) -> Dict[str, Any]:
+        return self.ix.store.state
+
+    def _load(self): return self
+    def _save(self): pass
+
+    def add(self, src: str, rel: str, dst: str) -> None:
+        self.ix.add(src, rel, dst)
+
+    def neighbors(self, term: str, rel: Optional[str] = None, direction: str = "both") -> Dict[str, List[str]]:
+        ix = self.ix
+        out: Dict[str, List[str]] = {}
+        if direction in ("out", "both"): out["out"] = [f"{term} -{e['r']}→ {e['d']}" for e in ix.edges(term, "out", rel)]
+        if direction in ("in", "both"): out["in"] = [f"{e['s']} -{e['r']}→ {term}" for e in ix.edges(term, "in", rel)]
+        return out
+
+    def _steps(self, ix, node, direction, rel):
+        dirs = ("out", "in") if direction == "both" else (direction,)
+        for d in dirs:
+            for e in ix.edges(node, d, rel):
+                yield (e["d"] if d == "out" else e["s"]), e
+
+    def khop(self, term: str, depth: int = 2, direction: str = "out", rel: Optional[str] = None,
+             limit: int = 1000) -> Dict[str, Any]:
+        """BFS jusqu'à `depth` sauts; renvoie au plus `limit` nœuds au total, tous niveaux confondus
+        (chaque nœud une seule fois, niveaux les plus proches d'abord).
+        `truncated` seulement si un nœud atteignable a été écarté."""
+        ix = self.ix
+        seen, frontier, levels = {term}, [term], []
+        found, truncated = 0, False
+        for _ in range(max(1, depth)):
+            nxt = []
+            for n in frontier:
+                for m, _e in self._steps(ix, n, direction, rel):
+                    if m in seen: continue
+                    if found >= limit: truncated = True; break
+                    seen.add(m); nxt.append(m); found += 1
+                if truncated: break
+            if nxt: levels.append(nxt)
+            if truncated or not nxt: break
+            frontier = nxt
+        return {"term": term, "depth": depth, "levels": levels, "count": found, "truncated": truncated}
+
+    def path_between(self, src: str, dst: str, max_depth: int = 6, direction: str = "out",
+                     rel: Optional[str] = None) -> Dict[str, Any]:
+        """Plus court chemin (BFS) limité à `max_depth` sauts."""
+        ix = self.ix
+        if src == dst: return {"ok": True, "path": [src], "steps": []}
+        parent: Dict[str, Any] = {src: None}
+        q = deque([(src, 0)])
+        while q:
+            n, d = q.popleft()
+            if d >= max_depth: continue
+            for m, e in self._steps(ix, n, direction, rel):
+                if m in parent: continue
+                parent[m] = (n, e)
+                if m == dst:
+                    steps, cur = [], m
+                    while parent[cur] is not None:
+                        p, pe = parent[cur]; steps.append(f"{pe['s']} -{pe['r']}→ {pe['d']}"); cur = p
+                    steps.reverse()
+                    return {"ok": True, "hops": len(steps), "steps": steps}
+                q.append((m, d + 1))
+        return {"ok": False, "msg": f"aucun chemin en ≤ {max_depth} sauts"}
+
+# CLI: kg-query enrichi (--depth, --to, --rel, --dir, --limit)
+try:
+    _kg_prev_build = build_parser
+except NameError:
+    _kg_prev_build = None
+
+def build_parser():
+    p = _kg_prev_build() if _kg_prev_build else argparse.ArgumentParser(prog="alsadika")
+    sp = [a for a in p._subparsers._actions if getattr(a,'dest',None)=='cmd'][0]
+    k2 = sp.choices.get("kg-query")
+    if k2 is None:
+        k2 = sp.add_parser("kg-query", help="Voisins d’un terme"); k2.add_argument("--term", required=True)
+    k2.add_argument("--depth", type=int, default=None, help="k sauts (BFS); avec --to: longueur max du chemin (6 par défaut)")
+    k2.add_argument("--to", default=None, help="Chercher un chemin vers ce nœud")
+    k2.add_argument("--rel", default=None)
+    k2.add_argument("--dir", choices=["out","in","both"], default=None,
+                    help="Sens des arêtes (défaut: out; voisins directs: both)")
+    k2.add_argument("--limit", type=int, default=1000, help="Nœuds renvoyés au plus (total, avec --depth)")
+    k2.set_defaults(_fn=cmd_kg_query)
+    return p
+
+def cmd_kg_query(args):
+    kg = KnowledgeGraph()
+    depth = getattr(args, "depth", None)
+    direction = getattr(args, "dir", None); rel = getattr(args, "rel", None)
+    if getattr(args, "to", None):
+        out = kg.path_between(args.term, args.to, max_depth=max(1, depth or 6), direction=direction or "out", rel=rel)
+    elif depth and depth > 1:
+        out = kg.khop(args.term, depth=depth, direction=direction or "out", rel=rel,
+                      limit=max(1, getattr(args, "limit", 1000)))
+    else:
+        out = kg.neighbors(args.term, rel=rel, direction=direction or "both")
+    print(json.dumps(out, ensure_ascii=False, indent=2)); return 0
+# ===============================
+# FIN PATCH KG-INDEX
+# ===============================
+# ===============================
+# PATCH "HAKIM-INDEX" — règles indexées + fermeture avant mémoïsée (append-only)
+# ===============================
+import json, re, threading
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+_RG_RULE_RE = re.compile(r"^[A-Za-z0-9_ ]+(?:\s*&\s*[A-Za-z0-9_ ]+)*\s*->\s*[A-Za-z0-9_ ]+$")
+
+class _RGIndex:
+    """Index résident d'un rg.json: règles parsées une fois, indexées par conséquent et par
+    prémisse; fermeture avant (comptage des prémisses, semi-naïve) mise en cache par version."""
+    def __init__(self, path: Path):
+        self.store = log_store(path, {"facts": [], "rules": []})
+        self.lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self.n_facts = 0; self.n_rules = 0
+        self.facts: set = set()
+        self.rules: List[Tuple[Tuple[str, ...], str, str]] = []      # (prémisses, conséquent, texte)
+        self.seen_rules: set = set()
+        self.by_cons: Dict[str, List[int]] = {}
+        self.by_prem: Dict[str, List[int]] = {}
+        self._closure = None
+
+    @staticmethod
+    def parse(rule: str) -> Tuple[Tuple[str, ...], str]:
+        left, right = [s.strip() for s in rule.split("->", 1)]
+        return tuple(s.strip() for s in re.split(r"\s*&\s*", left) if s.strip()), right
+
+    def sync(self):
+        with self.lock:
+            self.store.refresh()
+            st = self.store.state
+            F, R = st.setdefault("facts", []), st.setdefault("rules", [])
+            if len(F) < self.n_facts or len(R) < self.n_rules: self._reset()
+            if len(F) == self.n_facts and len(R) == self.n_rules: return
+            self.facts.update(F[self.n_facts:])
+            for r in R[self.n_rules:]:
+                self.seen_rules.add(r)
+                pre, cons = self.parse(r); i = len(self.rules)
+                self.rules.append((pre, cons, r))
+                self.by_cons.setdefault(cons, []).append(i)
+                for p in set(pre): self.by_prem.setdefault(p, []).append(i)
+            self.n_facts, self.n_rules = len(F), len(R)
+            self._closure = None                           # invalidation
+
+    def closure(self) -> Dict[str, Optional[int]]:
+        """fait → indice de la règle qui l'a dérivé (None = fait de base)."""
+        with self.lock:
+            self.sync()
+            if self._closure is not None: return self._closure
+            just: Dict[str, Optional[int]] = {f: None for f in self.facts}
+            need = [len(set(pre)) for pre, _, _ in self.rules]
+            delta = deque(just.keys())
+            for i, (pre, cons, _) in enumerate(self.rules):    # règles sans prémisse
+                if not need[i] and cons not in just: just[cons] = i; delta.append(cons)
+            while delta:                                     # chaque fait nouveau ne touche que ses règles
+                f = delta.popleft()
+                for i in self.by_prem.get(f, ()):
+                    need[i] -= 1
+                    if need[i] == 0:
+                        cons = self.rules[i][1]
+                        if cons not in just: just[cons] = i; delta.append(cons)
+            self._closure = just
+            return just
+
+    def commit(self, key: str, value: str):
+        with self.lock:
+            self.sync()
+            self.store.commit([{"op": "ext", "p": [key], "at": self.n_facts if key == "facts" else self.n_rules,
+                                "v": [value]}])
+            self.sync()
+
+_RG_IDX: Dict[str, _RGIndex] = {}
+
+@dataclass
+class ReasoningGraph:
+    path: Path = RG_FILE
+
+    @property
+    def ix(self) -> _RGIndex:
+        k = _lss_key(self.path)
+        if k not in _RG_IDX: _RG_IDX[k] = _RGIndex(self.path)
+        _RG_IDX[k].sync(); return _RG_IDX[k]
+
+    @property
+    def data(self) -> Dict[str, Any]:
+        return self.ix.store.state
+
+    def _load(self): return self
+    def _save(self): pass
+    def _parse_rule(self, rule: str) -> Tuple[List[str], str]:
+        pre, cons = _RGIndex.parse(rule); return list(pre), cons
+
+    def add_fact(self, fact: str):
+        fact = fact.strip(); ix = self.ix
+        if fact and fact not in ix.facts: ix.commit("facts", fact)
+
+    def add_rule(self, rule: str):
+        rule = re.sub(r"\s+", " ", rule.strip())
+        if not _RG_RULE_RE.match(rule):
+            raise ValueError("Règle invalide. Ex: 'A & B -> C'")
+        ix = self.ix
+        if rule not in ix.seen_rules: ix.commit("rules", rule)
+
+    def derived(self) -> List[str]:
+        return sorted(self.ix.closure().keys())
+
+    def plan(self, goal: str, limit: Optional[int] = None) -> Dict[str, Any]:
+        """Preuve via la fermeture avant (mémoïsée); sinon exploration arrière (deque) des impasses.
+        `limit` (optionnel) borne le nombre de sous-buts explorés; par défaut aucune troncature."""
+        ix = self.ix; goal = goal.strip()
+        just = ix.closure()
+        steps: List[str] = []
+        if goal in just:
+            seen, order, q = set(), [], deque([goal])
+            while q:
+                f = q.popleft()
+                if f in seen: continue
+                seen.add(f); order.append(f)
+                r = just[f]
+                if r is not None: q.extend(ix.rules[r][0])
+            for f in reversed(order):
+                r = just[f]
+                if r is None: steps.append(f"OK: {f} (fait)")
+                else:
+                    pre, cons, _ = ix.rules[r]; steps.append(f"Règle: {' & '.join(pre)} -> {cons}")
+            ok = True
+        else:
+            visited, q = set(), deque([goal])
+            while q and (limit is None or len(visited) < limit):
+                sub = q.popleft()
+                if sub in visited or sub in just: continue
+                visited.add(sub)
+                rids = ix.by_cons.get(sub, [])
+                if not rids:
+                    steps.append(f"IMPASSE: {sub} (aucune règle, pas dans les faits)"); continue
+                for i in rids:
+                    pre, cons, _ = ix.rules[i]
+                    missing = [p for p in pre if p not in just]
+                    steps.append(f"Règle: {' & '.join(pre)} -> {cons}" + (f" (manque: {', '.join(missing)})" if missing else ""))
+                    q.extend(missing)
+            ok = False
+        return {"ok": ok, "goal": goal, "steps": steps, "facts": sorted(ix.facts),
+                "rules": list(self.data["rules"]), "derived": len(just)}
+# ===============================
+# FIN PATCH HAKIM-INDEX
+# ===============================
+# ===============================
+# PATCH "SOLVER-COMPILED" — contraintes compilées (AST) + MRV + forward checking + AC-3 (append-only)
+# ===============================
+import ast, operator, functools
+from collections import deque
+from typing import Callable, Dict, List, Tuple
+
+_CS_BIN = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul, ast.Div: operator.truediv,
+           ast.FloorDiv: operator.floordiv, ast.Mod: operator.mod, ast.Pow: operator.pow}
+_CS_CMP = {ast.Lt: operator.lt, ast.LtE: operator.le, ast.Gt: operator.gt, ast.GtE: operator.ge,
+           ast.Eq: operator.eq, ast.NotEq: operator.ne}
+_CS_UN = {ast.USub: operator.neg, ast.UAdd: operator.pos, ast.Not: operator.not_}
+
+def _cs_build(node, names: set) -> Callable[[Dict[str, int]], object]:
+    """AST → fermeture Python (aucun eval à la résolution). Nœuds hors liste blanche refusés."""
+    if isinstance(node, ast.Expression): return _cs_build(node.body, names)
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+        v = node.value; return lambda a: v
+    if isinstance(node, ast.Name):
+        n = node.id; names.add(n); return lambda a: a[n]
+    if isinstance(node, ast.BinOp) and type(node.op) in _CS_BIN:
+        f, l, r = _CS_BIN[type(node.op)], _cs_build(node.left, names), _cs_build(node.right, names)
+        return lambda a: f(l(a), r(a))
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _CS_UN:
+        f, x = _CS_UN[type(node.op)], _cs_build(node.operand, names)
+        return lambda a: f(x(a))
+    if isinstance(node, ast.Compare) and all(type(o) in _CS_CMP for o in node.ops):
+        first = _cs_build(node.left, names)
+        chain = [(_CS_CMP[type(o)], _cs_build(c, names)) for o, c in zip(node.ops, node.comparators)]
+        def cmp(a):
+            x = first(a)
+            for f, g in chain:
+                y = g(a)
+                if not f(x, y): return False
+                x = y
+            return True
+        return cmp
+    if isinstance(node, ast.BoolOp):
+        parts = [_cs_build(v, names) for v in node.values]
+        if isinstance(node.op, ast.And): return lambda a: all(p(a) for p in parts)
+        return lambda a: any(p(a) for p in parts)
+    raise ValueError(f"Élément non autorisé: {type(node).__name__}")
+
+@functools.lru_cache(maxsize=1024)
+def _compile_constraint(expr: str) -> Tuple[Tuple[str, ...], Callable[[Dict[str, int]], bool]]:
+    names: set = set()
+    fn = _cs_build(ast.parse(expr.strip(), mode="eval"), names)
+    def check(a):
+        try: return bool(fn(a))
+        except Exception: return False                 # division par zéro, etc. → contrainte fausse
+    return tuple(sorted(names)), check
+
+def _sat_solve(doms: Dict[str, List[int]], constraints: List[str], limit: int = 10000) -> List[Dict[str, int]]:
+    vars_ = list(doms.keys())
+    comp = []
+    for c in constraints:
+        vs, fn = _compile_constraint(c)
+        unknown = [v for v in vs if v not in doms]
+        if unknown: raise ValueError(f"Variable inconnue: {', '.join(unknown)} dans « {c} »")
+        comp.append((vs, fn))
+    D = {v: list(dict.fromkeys(doms[v])) for v in vars_}
+    # constantes / unaires : consistance de nœud
+    for vs, fn in comp:
+        if not vs and not fn({}): return []
+        if len(vs) == 1:
+            v = vs[0]; D[v] = [x for x in D[v] if fn({v: x})]
+            if not D[v]: return []
+    by_var: Dict[str, List[int]] = {v: [] for v in vars_}
+    for i, (vs, _) in enumerate(comp):
+        for v in vs: by_var[v].append(i)
+    # AC-3 sur les contraintes binaires
+    binary = [(vs, fn) for vs, fn in comp if len(vs) == 2]
+    arcs = deque([(x, y, fn) for (a, b), fn in binary for x, y in ((a, b), (b, a))])
+    neigh: Dict[str, List[Tuple[str, str, Callable]]] = {v: [] for v in vars_}
+    for (a, b), fn in binary:
+        neigh[a].append((b, a, fn)); neigh[b].append((a, b, fn))
+    while arcs:
+        x, y, fn = arcs.popleft()
+        keep = [vx for vx in D[x] if any(fn({x: vx, y: vy}) for vy in D[y])]
+        if len(keep) < len(D[x]):
+            D[x] = keep
+            if not keep: return []
+            arcs.extend(arc for arc in neigh[x] if arc[0] != y)
+    sols: List[Dict[str, int]] = []
+    assign: Dict[str, int] = {}
+
+    def consistent_and_prune(v: str, dom: Dict[str, List[int]]):
+        """Vérifie les contraintes complètes; forward checking sur celles à une seule variable libre."""
+        pruned = {}
+        for i in by_var[v]:
+            vs, fn = comp[i]
+            free = [u for u in vs if u not in assign]
+            if not free:
+                if not fn(assign): return None
+            elif len(free) == 1:
+                u = free[0]; cur = pruned.get(u, dom[u])
+                keep = []
+                for x in cur:
+                    assign[u] = x
+                    if fn(assign): keep.append(x)
+                del assign[u]
+                if not keep: return None
+                pruned[u] = keep
+        return pruned
+
+    def backtrack(dom: Dict[str, List[int]]):
+        if len(sols) >= limit: return
+        if len(assign) == len(vars_):
+            sols.append({v: assign[v] for v in vars_}); return
+        # MRV (puis degré) pour choisir la variable
+        v = min((u for u in vars_ if u not in assign), key=lambda u: (len(dom[u]), -len(by_var[u])))
+        for x in dom[v]:
+            assign[v] = x
+            pruned = consistent_and_prune(v, dom)
+            if pruned is not None:
+                nd = dict(dom); nd.update(pruned); nd[v] = [x]
+                backtrack(nd)
+            del assign[v]
+            if len(sols) >= limit: return
+
+    backtrack(D)
+    return sols
+# ===============================
+# FIN PATCH SOLVER-COMPILED
+# ===============================
+# ===============================
+# PATCH "LEDGER-TAIL" — pointeur de queue + points de contrôle signés (append-only)
+# ===============================
+import argparse, json, os, hmac, hashlib, secrets, time, contextlib
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+LEDGER_TAIL      = LEDGER.with_suffix(".tail.json")     # {"hash","offset","count"}
+LEDGER_CKPT      = LEDGER.with_suffix(".ckpt.jsonl")    # {"count","offset","start","hash","sig"}
+LEDGER_KEY_FILE  = ROOT3 / "safe" / "ledger.key"
+LEDGER_CKPT_EVERY = 1000
+
+def _ledger_key() -> bytes:
+    k = os.getenv("ALSADIKA_LEDGER_KEY")
+    if k: return k.encode("utf-8")
+    if not LEDGER_KEY_FILE.exists():
+        LEDGER_KEY_FILE.parent.mkdir(parents=True, exist_ok=True)
+        LEDGER_KEY_FILE.write_text(secrets.token_hex(32), encoding="utf-8")
+        try: os.chmod(LEDGER_KEY_FILE, 0o600)
+        except Exception: pass
+    return LEDGER_KEY_FILE.read_text(encoding="utf-8").strip().encode("utf-8")
+
+def _ckpt_sig(c: Dict[str, Any]) -> str:
+    msg = f"{c['count']}:{c['offset']}:{c['start']}:{c['hash']}".encode("utf-8")
+    return hmac.new(_ledger_key(), msg, hashlib.sha256).hexdigest()
+
+def _ledger_rec_hash(rec: Dict[str, Any]) -> str:
+    rec2 = dict(rec); rec2.pop("hash", None)
+    return hashlib.sha256(json.dumps(rec2, sort_keys=True).encode("utf-8")).hexdigest()
+
+def _ledger_lock():
+    return file_lock(LEDGER) if "file_lock" in globals() else contextlib.nullcontext()
+
+def _ledger_checkpoints():
+    out = []
+    if LEDGER_CKPT.exists():
+        for ln in LEDGER_CKPT.read_text(encoding="utf-8").splitlines():
+            try:
+                c = json.loads(ln)
+                if hmac.compare_digest(c.get("sig", ""), _ckpt_sig(c)): out.append(c)
+            except Exception:
+                continue
+    return out
+
+def _ledger_add_ckpt(count: int, offset: int, start: int, h: str):
+    c = {"count": count, "offset": offset, "start": start, "hash": h, "ts": int(time.time())}
+    c["sig"] = _ckpt_sig(c)
+    with LEDGER_CKPT.open("a", encoding="utf-8") as f: f.write(json.dumps(c) + "\n")
+
+def _ledger_scan(offset: int = 0, prev: str = "GENESIS", count: int = 0, ckpt_from: Optional[int] = None) -> Dict[str, Any]:
+    """Vérifie en flux depuis `offset` (mémoire bornée). Pose des points de contrôle au passage.
+    Une ligne partielle finale est ignorée mais signalée (`torn_tail`): à l'appelant de trancher."""
+    start = offset; last_ck = ckpt_from if ckpt_from is not None else count; torn = False
+    with open(LEDGER, "rb") as f:
+        f.seek(offset)
+        for raw in f:
+            if not raw.endswith(b"\n"): torn = True; break   # ligne partielle finale
+            try:
+                rec = json.loads(raw); h = rec.get("hash")
+                if not (h and rec.get("prev") == prev and _ledger_rec_hash(rec) == h): return {"ok": False, "at": count}
+            except Exception:
+                return {"ok": False, "at": count}
+            start = offset; offset += len(raw); prev = h; count += 1
+            if count % LEDGER_CKPT_EVERY == 0 and count > last_ck:
+                _ledger_add_ckpt(count, offset, start, h); last_ck = count
+    return {"ok": True, "count": count, "hash": prev, "offset": offset, "torn_tail": torn}
+
+def _ledger_tail() -> Dict[str, Any]:
+    """Queue de chaîne: sidecar si cohérent avec la taille du fichier, sinon reprise depuis le dernier point sûr."""
+    size = LEDGER.stat().st_size if LEDGER.exists() else 0
+    try: t = json.loads(LEDGER_TAIL.read_text(encoding="utf-8"))
+    except Exception: t = None
+    if t and t.get("offset") == size: return t
+    base = {"hash": "GENESIS", "offset": 0, "count": 0}
+    if t and t.get("offset", 0) < size: base = t
+    else:
+        for c in reversed(_ledger_checkpoints()):
+            if c["offset"] <= size: base = c; break
+    if size == 0: return {"hash": "GENESIS", "offset": 0, "count": 0}
+    r = _ledger_scan(base["offset"], base["hash"], base["count"])
+    if not r.get("ok"):                                   # chaîne rompue: on chaîne sur la dernière ligne lisible
+        r = {"hash": "GENESIS", "offset": size, "count": r.get("at", 0)}
+        with open(LEDGER, "rb") as f:
+            f.seek(max(0, size - 65536)); lines = f.read().splitlines()
+        for ln in reversed(lines):
+            try: r["hash"] = json.loads(ln)["hash"]; break
+            except Exception: continue
+    return {"hash": r["hash"], "offset": r["offset"], "count": r["count"]}
+
+def _ledger_tail_save(t: Dict[str, Any]):
+    tmp = LEDGER_TAIL.with_suffix(".tmp")
+    tmp.write_text(json.dumps(t), encoding="utf-8"); os.replace(tmp, LEDGER_TAIL)
+
+def ledger_log(event: str) -> str:
+    LEDGER.parent.mkdir(parents=True, exist_ok=True)
+    with _ledger_lock():
+        t = _ledger_tail()
+        rec = {"ts": int(time.time()), "event": event, "prev": t["hash"]}
+        raw = json.dumps(rec, sort_keys=True)
+        rec["hash"] = hashlib.sha256(raw.encode("utf-8")).hexdigest()
+        line = (json.dumps(rec, ensure_ascii=False) + "\n").encode("utf-8")
+        with open(LEDGER, "ab") as f: f.write(line)
+        start, count = t["offset"], t["count"] + 1
+        t = {"hash": rec["hash"], "offset": start + len(line), "count": count}
+        if count % LEDGER_CKPT_EVERY == 0: _ledger_add_ckpt(count, t["offset"], start, rec["hash"])
+        _ledger_tail_save(t)
+    return rec["hash"]
+
+def ledger_verify(full: bool = False) -> Dict[str, Any]:
+    """Vérifie depuis le dernier point de contrôle signé encore valide (ou depuis GENESIS si full)."""
+    if not LEDGER.exists(): return {"ok": True, "count": 0}
+    size = LEDGER.stat().st_size
+    base, ck = {"hash": "GENESIS", "offset": 0, "count": 0}, None
+    cks = _ledger_checkpoints()
+    if not full:
+        with open(LEDGER, "rb") as f:
+            for c in reversed(cks):
+                if c["offset"] > size: continue
+                f.seek(c["start"]); raw = f.read(c["offset"] - c["start"])
+                try:
+                    rec = json.loads(raw)
+                    if rec.get("hash") == c["hash"] and _ledger_rec_hash(rec) == c["hash"]:
+                        base, ck = c, c["count"]; break
+                except Exception:
+                    continue
+    r = _ledger_scan(base["offset"], base["hash"], base["count"], ckpt_from=max([c["count"] for c in cks] or [0]))
+    if not r.get("ok"): return r
+    if r["torn_tail"]:                                    # écriture interrompue: registre tronqué
+        return {"ok": False, "at": r["count"], "torn_tail": True, "offset": r["offset"]}
+    out = {"ok": True, "count": r["count"]}
+    if ck is not None: out["from_checkpoint"] = ck
+    return out
+
+try:
+    _ledger_prev_build = build_parser
+except NameError:
+    _ledger_prev_build = None
+
+def build_parser():
+    p = _ledger_prev_build() if _ledger_prev_build else argparse.ArgumentParser(prog="alsadika")
+    sp = [a for a in p._subparsers._actions if getattr(a,'dest',None)=='cmd'][0]
+    c = sp.choices.get("ledger-verify")
+    if c is not None:
+        c.add_argument("--full", action="store_true", help="Revérifier depuis GENESIS")
+        c.set_defaults(_fn=cmd_ledger_verify)
+    return p
+
+def cmd_ledger_verify(args):
+    print(json.dumps(ledger_verify(full=getattr(args, "full", False)), ensure_ascii=False, indent=2)); return 0
+# ===============================
+# FIN PATCH LEDGER-TAIL
+# ===============================
+# ===============================
+# PATCH "ASYNC-LOG" — écrivain JSONL en tâche de fond, par lots (append-only)
+# ===============================
+import io, os, json, time, queue, atexit, threading
+from pathlib import Path
+from typing import Dict, List
+
+ALOG_FLUSH_BYTES  = 256 * 1024      # vidage dès 256 Ko en attente…
+ALOG_FLUSH_S      = 0.5             # …ou toutes les 0,5 s
+ALOG_ROTATE_BYTES = 16 << 20        # rotation au-delà de 16 Mo (fichier.1, .2, …)
+ALOG_KEEP         = 3
+
+class _AsyncLog:
+    """File en mémoire (SimpleQueue) + un fil d'écriture qui regroupe les lignes par fichier.
+    `pending` garde le texte en file par chemin jusqu'à son écriture: les lectures le joignent au fichier."""
+    def __init__(self):
+        self.q = queue.SimpleQueue(); self.pid = None; self.th = None
+        self.lock = threading.Lock()
+        self.pending: Dict[str, List[str]] = {}
+        self.plock = threading.Lock()       # pending (producteurs)
+        self.wlock = threading.Lock()       # écriture + retrait de pending (vue cohérente pour les lecteurs)
+
+    def _ensure(self):
+        if self.pid == os.getpid() and self.th is not None and self.th.is_alive(): return
+        with self.lock:
+            if self.pid == os.getpid() and self.th is not None and self.th.is_alive(): return
+            if self.pid != os.getpid(): self.q = queue.SimpleQueue(); self.pending = {}   # après fork: file neuve
+            self.pid = os.getpid()
+            self.th = threading.Thread(target=self._run, name="alsadika-alog", daemon=True); self.th.start()
+
+    def put(self, path, text: str):
+        self._ensure(); key = str(path)
+        with self.plock:
+            self.pending.setdefault(key, []).append(text); self.q.put((key, text))
+
+    def read(self, path) -> str:
+        """Contenu du fichier + texte encore en file, sans attendre le fil d'écriture."""
+        key = str(path)
+        with self.wlock:
+            try:
+                with open(key, "rb") as f: data = f.read().decode("utf-8")
+            except FileNotFoundError:
+                data = None
+            with self.plock: tail = "".join(self.pending.get(key, ()))
+        if data is None and not tail: raise FileNotFoundError(2, "No such file or directory", key)
+        return (data or "") + tail
+
+    def has_pending(self, path) -> bool:
+        with self.plock: return bool(self.pending.get(str(path)))
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        if self.th is None or self.pid != os.getpid(): return True
+        ev = threading.Event(); self.q.put((None, ev))
+        return ev.wait(timeout)
+
+    @staticmethod
+    def _rotate(p: Path, incoming: int):
+        try: size = p.stat().st_size
+        except Exception: return
+        if size + incoming <= ALOG_ROTATE_BYTES: return
+        for i in range(ALOG_KEEP - 1, 0, -1):
+            src = Path(f"{p}.{i}")
+            if src.exists(): os.replace(src, Path(f"{p}.{i + 1}"))
+        os.replace(p, Path(f"{p}.1"))
+
+    def _write(self, bufs):
+        for path, parts in bufs.items():
+            data = "".join(parts).encode("utf-8")
+            with self.wlock:
+                try:
+                    p = Path(path); p.parent.mkdir(parents=True, exist_ok=True)
+                    self._rotate(p, len(data))
+                    with open(p, "ab") as f: f.write(data)
+                except Exception:
+                    pass
+                with self.plock:
+                    left = self.pending.get(path, [])
+                    del left[:len(parts)]
+                    if not left: self.pending.pop(path, None)
+        bufs.clear()
+
+    def _run(self):
+        bufs, size, last = {}, 0, time.monotonic()
+        while True:
+            try: path, item = self.q.get(timeout=ALOG_FLUSH_S)
+            except queue.Empty: path, item = "", None
+            waiter = None
+            if path is None: waiter = item
+            elif item is not None:
+                bufs.setdefault(path, []).append(item); size += len(item)
+            if waiter is not None or size >= ALOG_FLUSH_BYTES or time.monotonic() - last >= ALOG_FLUSH_S:
+                if bufs: self._write(bufs)
+                size, last = 0, time.monotonic()
+                if waiter is not None: waiter.set()
+
+_ALOG = _AsyncLog()
+atexit.register(_ALOG.flush)
+
+def alog_write(path, text: str):
+    _ALOG.put(path, text)
+
+def alog_append(path, rec: dict):
+    _ALOG.put(path, json.dumps(rec, ensure_ascii=False) + "\n")
+
+def alog_flush(timeout: float = 5.0) -> bool:
+    return _ALOG.flush(timeout)
+
+class _QueuedFile:
+    def __init__(self, path): self.path = path
+    def write(self, s: str): alog_write(self.path, s); return len(s)
+    def flush(self): pass
+    def close(self): pass
+    def __enter__(self): return self
+    def __exit__(self, *exc): return False
+
+class _QueuedPath(type(Path())):
+    """Chemin dont l'ouverture en ajout texte passe par la file; les lectures joignent fichier et texte
+    en file (sans vider la file); seules les autres ouvertures (écriture, r+) la vident d'abord."""
+    def open(self, mode="r", buffering=-1, encoding=None, errors=None, newline=None):
+        if "a" in mode and "b" not in mode and "+" not in mode: return _QueuedFile(self)
+        if mode in ("r", "rt"): return io.StringIO(self.read_text(), newline=newline)
+        if mode == "rb": return io.BytesIO(self.read_bytes())
+        alog_flush(); return super().open(mode, buffering, encoding, errors, newline)
+    def read_text(self, *a, **kw): return _ALOG.read(self)
+    def read_bytes(self): return _ALOG.read(self).encode("utf-8")
+    def exists(self, *a, **kw): return _ALOG.has_pending(self) or super().exists(*a, **kw)
+
+for _n in ("MIRROR_LOG", "HAKIM_LEDGER", "KP_LEDGER", "TRACE_LOG", "DA_LOG", "META_LEDGER", "OPEN_LEDGER", "LOG_FILE"):
+    if _n in globals(): globals()[_n] = _QueuedPath(str(globals()[_n]))
+
+def log(msg: str) -> None:
+    alog_write(LOG_FILE, f"{now()} | {msg}\n")
+
+# empreinte du noyau: relue seulement si le fichier source change (évite de relire le module à chaque log)
+_KP_FP_CACHE = {}
+def _kp_fingerprint():
+    try:
+        p = Path(__file__); st = p.stat(); key = (st.st_mtime_ns, st.st_size)
+        if _KP_FP_CACHE.get("key") != key:
+            _KP_FP_CACHE.update(key=key, fp=hashlib.sha256(p.read_bytes()).hexdigest()[:16])
+        return _KP_FP_CACHE["fp"]
+    except Exception:
+        return "unknown"
+# ===============================
+# FIN PATCH ASYNC-LOG
+# ===============================
+# ===============================
+# PATCH "KERNEL-STREAM" — kernel_run par étapes (générateur/callback) (append-only)
+# ===============================
+import time
+from typing import Iterator, Callable, Optional
+
+def kernel_stream(user_prompt: str, use_dream: bool = True, rag_k: int = 3) -> Iterator[dict]:
+    """Pipeline kernel_run émis au fil de l'eau: {"stage","text"}; la concaténation des textes = kernel_run."""
+    ok, msg = _kp_energy_spend("kernel-run", cost=13)
+    if not ok:
+        yield {"stage": "energy", "text": msg}; return
+
+    _kp_chronos("micro")
+    _kp_ideas_touch(user_prompt)
+
+    ctx = _kp_rag_context(user_prompt, k=rag_k)
+    yield {"stage": "context", "text": "", "hits": bool(ctx)}
+    ctx_block = f"\n\n[Contexte]\n{ctx}\n" if ctx else ""
+    composed = f"{user_prompt.strip()}{ctx_block}".strip()
+
+    if use_dream and "DreamArena" in globals():
+        try:
+            da = DreamArena(n=5, council=3, seed=int(time.time())%1009)
+            res = da.run("dream: " + composed)
+            answer = res["answer"] if res.get("ok") else res.get("msg","(DreamArena indisponible)")
+        except Exception:
+            answer = composed
+    else:
+        try:
+            skills = SkillRegistry(); lang = LanguageEngine(skills)
+            answer = lang.summarize(composed, max_chars=600) if len(composed)>150 else composed
+        except Exception:
+            answer = composed
+
+    cautions = _kp_truth_guard(answer)
+    prud = ("\n\n[Prudence] " + " | ".join(cautions[:4])) if cautions else ""
+    if prud:
+        yield {"stage": "draft", "text": answer}
+        yield {"stage": "cautions", "text": prud.rstrip()}
+    else:
+        yield {"stage": "draft", "text": answer.rstrip()}
+    full = answer + prud
+
+    _kp_ideas_touch(full)
+    _kp_chronos("meso")
+    _kp_log({"event":"kernel.run","len":len(full),"ctx":bool(ctx)})
+    yield {"stage": "footer", "text": " " + _kp_mirror_tag(user_prompt, full) + _kp_provenance_footer(full)}
+
+def kernel_run(user_prompt: str, use_dream: bool = True, rag_k: int = 3,
+               on_chunk: Optional[Callable[[dict], None]] = None) -> str:
+    parts = []
+    for ch in kernel_stream(user_prompt, use_dream=use_dream, rag_k=rag_k):
+        if on_chunk is not None:
+            try: on_chunk(ch)
+            except Exception: pass
+        parts.append(ch["text"])
+    return "".join(parts)
+# ===============================
+# FIN PATCH KERNEL-STREAM
+# ===============================
+# ===============================
+# PATCH "KCACHE" — cache de réponses noyau (LRU + disque optionnel) (append-only)
+# ===============================
+import os, re, json, hashlib, threading
+from collections import OrderedDict
+from pathlib import Path
+
+def _env_on(name: str, default: str = "0") -> bool:
+    return os.environ.get(name, default).strip().lower() in ("1", "true", "yes", "on")
+
+KCACHE_ENABLED = _env_on("ALSADIKA_KCACHE")                 # opt-in
+KCACHE_SIZE    = int(os.environ.get("ALSADIKA_KCACHE_SIZE", "512"))
+KCACHE_DISK    = _env_on("ALSADIKA_KCACHE_DISK")            # second niveau sur disque
+KCACHE_SPEND   = _env_on("ALSADIKA_KCACHE_SPEND", "1")       # débiter l'énergie même sur un hit
+KCACHE_REPLAY  = _env_on("ALSADIKA_KCACHE_REPLAY", "1")      # rejouer idées/chronos/journal sur un hit
+KCACHE_DIR     = ROOT / "kcache"
+
+# fichiers dont la version invalide le cache: mémoire approuvée, variantes, index RAG
+KCACHE_STATE_FILES = ("MEM_FILE", "VARIANTS_FILE", "DOCS_INDEX", "CPU_RAG_VEC", "CPU_RAG_MAP")
+# réponses d'état (refus, quotas) jamais mises en cache
+_KC_NOCACHE = re.compile(r"^\s*(Énergie insuffisante|Limite de débit|Rejet:|Je suis épuisée)")
+# pieds de page propres à la requête (énergie, empreinte du code, journal miroir): hors cache,
+# recalculés sur un hit (kcache_footers); le cache ne garde que le corps et la liste des pieds.
+# Tags en fin de ligne d'abord: les pieds « ligne entière » les engloberaient.
+_KC_FOOTERS = (("mirror", re.compile(r" \[Mirror[^\]\n]*\]$")), ("kp", re.compile(r" \[KP:?[^\]\n]*\]$")),
+               ("prov", re.compile(r"\n\[Prov\] [^\n]*$")), ("kprimus", re.compile(r"\n\[KernelPrimus\] [^\n]*$")))
+
+def kernel_state_stamp() -> str:
+    parts = []
+    for name in KCACHE_STATE_FILES:
+        p = globals().get(name)
+        try:
+            st = Path(p).stat(); parts.append(f"{name}:{st.st_mtime_ns}:{st.st_size}")
+        except Exception:
+            parts.append(f"{name}:-")
+    try:   # faits approuvés (SQLite WAL: le mtime du .db ne suit pas chaque écriture)
+        parts.append("facts:%s" % (_facts_conn().execute("SELECT max(id) FROM facts").fetchone()[0],))
+    except Exception:
+        parts.append("facts:-")
+    return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()[:16]
+
+def kernel_cache_key(prompt: str, **params) -> str:
+    # le seed HARDEN-4 dérive du prompt (ou de son préfixe "seed: N |"): couvert par le prompt lui-même
+    blob = json.dumps({"p": prompt, "kw": params, "v": kernel_state_stamp()}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+def kcache_split(out: str):
+    """-> (corps, [pieds de page dans l'ordre d'ajout])"""
+    kinds = []
+    while True:
+        for name, rx in _KC_FOOTERS:
+            m = rx.search(out)
+            if m:
+                out = out[:m.start()]; kinds.insert(0, name)
+                break
+        else:
+            return out, kinds
+
+def _kc_prov_footer(prompt: str, out: str, mode: str) -> str:
+    # [Prov] du patch provenance: énergie et empreinte du moment, enregistré comme dernière provenance
+    try: energy = EnergyBank().get().get("energy")
+    except Exception: energy = None
+    info = {"ts": int(time.time()), "fingerprint": _code_fingerprint(), "mode": mode,
+            "energy_before": None, "energy_after": energy, "agents_winner": None, "context_docs": [], "open_eids": [],
+            "hash_in": hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:12],
+            "hash_out": hashlib.sha256(out.encode("utf-8")).hexdigest()[:12], "cached": True}
+    _wsave(PROV_FILE, info)
+    return f"\n[Prov] f={info['fingerprint']} in={info['hash_in']} out={info['hash_out']} e={info['energy_after']}"
+
+def _kc_mirror_footer(prompt: str, out: str) -> str:
+    # tag du patch miroir, avec son enregistrement dans MIRROR_LOG
+    m = _mirror(prompt, out); mm = _meta_mirror(m)
+    with MIRROR_LOG.open("a", encoding="utf-8") as f:
+        f.write(json.dumps({"ts": int(time.time()), "notes": m["notes"], "mm": mm, "len": m["len"]}, ensure_ascii=False) + "\n")
+    if mm: return f" [Mirror⚖️:{len(m['notes'])} | Meta:{len(mm)}]"
+    return f" [Mirror:{len(m['notes'])}]" if m["notes"] else ""
+
+def kcache_footers(prompt: str, body: str, kinds, mode: str = "public") -> str:
+    """Pieds de page recalculés pour un hit, dans l'ordre d'origine (effets de bord compris)."""
+    out = body
+    for kind in kinds:
+        try:
+            if kind == "prov": out = out.rstrip() + _kc_prov_footer(prompt, out.rstrip(), mode)
+            elif kind == "mirror": out = out.rstrip() + _kc_mirror_footer(prompt, out.rstrip())
+            elif kind == "kp": out = out + " " + _kp_mirror_tag(prompt, out)
+            elif kind == "kprimus": out = out + _kp_provenance_footer(out)
+        except Exception:
+            pass
+    return out[len(body):]
+
+class KernelCache:
+    """LRU (+ disque) d'entrées {"body": corps de réponse, "tail": pieds de page à recalculer}."""
+    def __init__(self, size: int = KCACHE_SIZE, disk: bool = KCACHE_DISK, folder: Path = KCACHE_DIR):
+        self.size = size; self.disk = disk; self.folder = Path(folder)
+        self.mem: "OrderedDict[str, str]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = self.misses = self.disk_hits = 0
+
+    def _file(self, key: str) -> Path:
+        return self.folder / key[:2] / f"{key}.json"
+
+    def get(self, key: str):
+        with self.lock:
+            out = self.mem.get(key)
+            if out is not None:
+                self.mem.move_to_end(key); self.hits += 1
+                return out
+        if self.disk:
+            try:
+                d = json.loads(self._file(key).read_text(encoding="utf-8"))
+                out = {"body": d["body"], "tail": list(d["tail"])}     # ancien format {"out"} → absent
+                self._remember(key, out)
+                with self.lock: self.hits += 1; self.disk_hits += 1
+                return out
+            except Exception:
+                pass
+        with self.lock: self.misses += 1
+        return None
+
+    def _remember(self, key: str, out: dict):
+        with self.lock:
+            self.mem[key] = out; self.mem.move_to_end(key)
+            while len(self.mem) > self.size: self.mem.popitem(last=False)
+
+    def put(self, key: str, out: str) -> bool:
+        """Met en cache la réponse complète `out`, sans ses pieds de page propres à la requête."""
+        if not out or _KC_NOCACHE.match(out): return False
+        body, tail = kcache_split(out)
+        ent = {"body": body, "tail": tail}
+        self._remember(key, ent)
+        if self.disk:
+            try:
+                f = self._file(key); f.parent.mkdir(parents=True, exist_ok=True)
+                tmp = f.with_suffix(".tmp"); tmp.write_text(json.dumps(ent, ensure_ascii=False), encoding="utf-8")
+                os.replace(tmp, f)
+            except Exception:
+                pass
+        return True
+
+    def clear(self):
+        with self.lock: self.mem.clear()
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"enabled": KCACHE_ENABLED, "size": len(self.mem), "max": self.size, "disk": self.disk,
+                    "hits": self.hits, "misses": self.misses, "disk_hits": self.disk_hits}
+
+KCACHE = KernelCache()
+
+def kcache_charge(prompt: str, kind: str = "chat"):
+    """Effets de bord rejoués sur un hit (énergie). Renvoie le message de refus, ou None."""
+    if not KCACHE_SPEND: return None
+    try:
+        if kind == "kernel-run":
+            ok, msg = _kp_energy_spend("kernel-run", cost=13)
+            return None if ok else msg
+        eb = EnergyBank()
+        if not eb.spend(classify_intent(prompt)):
+            st = eb.get()
+            return f"Énergie insuffisante ({st['energy']}/{eb.capacity}). Patiente la régénération ou recharge manuelle."
+    except Exception:
+        pass
+    return None
+
+def kcache_replay(prompt: str, out: str):
+    """Effets de bord de kernel_stream hors énergie (idées, chronos, journal KP), rejoués sur un hit."""
+    if not KCACHE_REPLAY: return
+    _kp_chronos("micro"); _kp_ideas_touch(prompt)
+    _kp_ideas_touch(out); _kp_chronos("meso")
+    _kp_log({"event": "kernel.run", "len": len(out), "cached": True})
+
+def kernel_stream_cached(user_prompt: str, use_dream: bool = True, rag_k: int = 3):
+    """kernel_stream avec cache: sur un hit, le corps en un fragment {"stage":"cached","hit":True}
+    puis les pieds de page recalculés {"stage":"footer"}.
+    Jamais de cache avec use_dream: DreamArena est semée par l'horloge, la réponse n'est pas reproductible."""
+    if not KCACHE_ENABLED or use_dream:
+        yield from kernel_stream(user_prompt, use_dream=use_dream, rag_k=rag_k); return
+    key = kernel_cache_key(user_prompt, fn="kernel_run", use_dream=bool(use_dream), rag_k=int(rag_k))
+    ent = KCACHE.get(key)
+    if ent is not None:
+        refused = kcache_charge(user_prompt, kind="kernel-run")
+        if refused:
+            yield {"stage": "energy", "text": refused}; return
+        footer = kcache_footers(user_prompt, ent["body"], ent["tail"])
+        kcache_replay(user_prompt, ent["body"] + footer)
+        yield {"stage": "cached", "text": ent["body"], "hit": True}
+        if footer: yield {"stage": "footer", "text": footer}
+        return
+    parts, refused = [], False
+    for ch in kernel_stream(user_prompt, use_dream=use_dream, rag_k=rag_k):
+        refused = refused or ch["stage"] == "energy"
+        parts.append(ch["text"]); yield ch
+    if not refused:
+        KCACHE.put(key, "".join(parts))
+
+def kernel_run_cached(user_prompt: str, use_dream: bool = True, rag_k: int = 3):
+    """-> (réponse, hit)"""
+    hit, parts = False, []
+    for ch in kernel_stream_cached(user_prompt, use_dream=use_dream, rag_k=rag_k):
+        hit = hit or bool(ch.get("hit")); parts.append(ch["text"])
+    return "".join(parts), hit
+# ===============================
+# FIN PATCH KCACHE
+# ===============================
+# ===============================
+# PATCH "KERNEL-BATCH" — lots de prompts sur un pool de processus (append-only)
+# ===============================
+import os, json, time, argparse, atexit, signal, threading
+import multiprocessing as _mp
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as _FutTimeout
+from typing import Dict, Iterable, Iterator, Optional
+
+KB_WINDOW_PER_WORKER = 4      # prompts en vol par worker (mémoire bornée sur de gros lots)
+KB_MAX_WORKERS = max(1, int(os.environ.get("ALSADIKA_KB_WORKERS", "0") or 0) or os.cpu_count() or 1)
+KB_MAX_BATCHES = max(1, int(os.environ.get("ALSADIKA_KB_MAX_BATCHES", "2")))   # lots simultanés
+# pas de fork depuis un serveur multi-thread: forkserver si dispo, sinon spawn
+KB_MP_CONTEXT = os.environ.get("ALSADIKA_KB_MP_CONTEXT", "").strip() or \
+    ("forkserver" if "forkserver" in _mp.get_all_start_methods() else "spawn")
+
+_KB_POOLS: Dict[bool, ProcessPoolExecutor] = {}
+_KB_POOL_LOCK = threading.Lock()
+_KB_SLOTS = threading.BoundedSemaphore(KB_MAX_BATCHES)
+_KB_ALARM = hasattr(signal, "setitimer")   # délai appliqué dans le worker (POSIX); sinon simple borne d'attente
+
+class _KBTimeout(BaseException):
+    """Délai du prompt écoulé (BaseException: pas avalée par les `except Exception` du noyau)."""
+
+def _kb_alarm(signum, frame):
+    raise _KBTimeout()
+
+def _kb_init(charge_energy: bool = True):
+    # worker chaud: connexions/états hérités du parent remis à zéro, noyau amorcé une fois
+    try: _FACTS_TLS.__dict__.clear()
+    except Exception: pass
+    if not charge_energy:
+        globals()["_kp_energy_spend"] = lambda tag, cost=13: (True, "")
+    # les workers multiprocessing sortent sans atexit: vider les journaux en file à la fin du worker
+    import multiprocessing.util as _mpu
+    _mpu.Finalize(None, alog_flush, exitpriority=10)
+    try: _kp_fingerprint()
+    except Exception: pass
+
+def _kb_one(i: int, prompt: str, use_dream: bool, rag_k: int, timeout: Optional[float] = None) -> dict:
+    t0 = time.perf_counter()
+    armed = bool(timeout) and _KB_ALARM
+    if armed:   # les tâches tournent dans le thread principal du worker: SIGALRM interrompt le prompt
+        signal.signal(signal.SIGALRM, _kb_alarm)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        out = kernel_run(prompt, use_dream=use_dream, rag_k=rag_k)
+        return {"i": i, "ok": True, "out": out, "ms": round((time.perf_counter() - t0) * 1000, 2)}
+    except _KBTimeout:
+        return {"i": i, "ok": False, "error": "timeout", "ms": round((time.perf_counter() - t0) * 1000, 2)}
+    except Exception as e:
+        return {"i": i, "ok": False, "error": f"{type(e).__name__}: {e}", "ms": round((time.perf_counter() - t0) * 1000, 2)}
+    finally:
+        if armed: signal.setitimer(signal.ITIMER_REAL, 0)
+
+def kb_pool(charge_energy: bool = True) -> ProcessPoolExecutor:
+    """Pool partagé entre lots et requêtes (workers chauds), un par politique d'énergie; recréé s'il est cassé."""
+    with _KB_POOL_LOCK:
+        ex = _KB_POOLS.get(charge_energy)
+        if ex is None or getattr(ex, "_broken", False) or getattr(ex, "_shutdown_thread", False):
+            ex = _KB_POOLS[charge_energy] = ProcessPoolExecutor(
+                max_workers=KB_MAX_WORKERS, mp_context=_mp.get_context(KB_MP_CONTEXT),
+                initializer=_kb_init, initargs=(charge_energy,))
+        return ex
+
+def kb_shutdown():
+    with _KB_POOL_LOCK:
+        for ex in _KB_POOLS.values(): ex.shutdown(wait=False, cancel_futures=True)
+        _KB_POOLS.clear()
+
+atexit.register(kb_shutdown)
+
+class KBSlot:
+    """Place réservée parmi KB_MAX_BATCHES lots simultanés; libération idempotente (aussi au GC)."""
+    def __init__(self): self._held = True
+    def release(self):
+        with _KB_POOL_LOCK:
+            held, self._held = self._held, False
+        if held: _KB_SLOTS.release()
+    __del__ = release
+
+def kb_slot(timeout: Optional[float] = None) -> Optional[KBSlot]:
+    """Réserve une place de lot; None si aucune ne se libère avant `timeout` (0 = sans attendre)."""
+    ok = _KB_SLOTS.acquire() if timeout is None else _KB_SLOTS.acquire(timeout=timeout)
+    return KBSlot() if ok else None
+
+def _kb_item(raw):
+    if isinstance(raw, dict):
+        return raw.get("id"), str(raw.get("prompt", ""))
+    return None, str(raw)
+
+def kernel_batch(prompts: Iterable, workers: Optional[int] = None, use_dream: bool = False, rag_k: int = 0,
+                 charge_energy: bool = True, timeout: Optional[float] = None,
+                 slot: Optional[KBSlot] = None) -> Iterator[dict]:
+    """
+    Exécute kernel_run sur le pool partagé (kb_pool); résultats émis dans l'ordre de soumission.
+    prompts: str ou {"id", "prompt"}. Chaque résultat: {i, id?, ok, out|error, ms}.
+    workers: prompts de ce lot en parallèle (≤ KB_MAX_WORKERS). slot: place déjà réservée (kb_slot),
+    sinon on attend la sienne; libérée à la fin du lot.
+    timeout: durée max d'exécution d'un prompt, appliquée dans le worker (le worker est libéré);
+    sans SIGALRM (Windows) ce n'est qu'une borne d'attente du résultat, comptée depuis son tour.
+    """
+    slot = slot or kb_slot()
+    workers = max(1, min(int(workers or KB_MAX_WORKERS), KB_MAX_WORKERS))
+    window = workers * KB_WINDOW_PER_WORKER
+    ex = kb_pool(charge_energy)
+    pending = deque()
+    try:
+
+        def _result(i, rid, fut):
+            try:
+                res = fut.result(timeout=None if _KB_ALARM else timeout)
+            except (_FutTimeout, _KBTimeout):
+                res = {"i": i, "ok": False, "error": "timeout", "ms": None}
+            except Exception as e:
+                res = {"i": i, "ok": False, "error": f"{type(e).__name__}: {e}", "ms": None}
+            if rid is not None: res["id"] = rid
+            return res
+
+        for i, raw in enumerate(prompts):
+            rid, prompt = _kb_item(raw)
+            pending.append((i, rid, ex.submit(_kb_one, i, prompt, use_dream, rag_k, timeout)))
+            if len(pending) >= window:
+                yield _result(*pending.popleft())
+        while pending:
+            yield _result(*pending.popleft())
+    finally:
+        for _, _, fut in pending: fut.cancel()     # lot abandonné (client parti): libérer le pool partagé
+        slot.release()
+
+def _kb_read_jsonl(path: str) -> Iterator:
+    fh = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        for line in fh:
+            line = line.strip()
+            if not line: continue
+            try: yield json.loads(line)
+            except Exception: yield line      # ligne brute = prompt
+    finally:
+        if fh is not sys.stdin: fh.close()
+
+# CLI
+try:
+    _kb_prev_build = build_parser
+except NameError:
+    _kb_prev_build = None
+
+def build_parser():
+    p = _kb_prev_build() if _kb_prev_build else argparse.ArgumentParser(prog="alsadika")
+    sp = [a for a in p._subparsers._actions if getattr(a,'dest',None)=='cmd'][0]
+    c1 = sp.add_parser("kernel-batch", help="Lot de prompts (JSONL) sur un pool de processus -> NDJSON ordonné")
+    c1.add_argument("--input", required=True, help='prompts.jsonl ({"id","prompt"} ou chaîne), "-" = stdin')
+    c1.add_argument("--output", default="-", help='NDJSON de sortie, "-" = stdout')
+    c1.add_argument("--workers", type=int, default=0, help="0 = nombre de cœurs")
+    c1.add_argument("--dream", action="store_true", help="Activer DreamArena (plus lent)")
+    c1.add_argument("--rag-k", type=int, default=0)
+    c1.add_argument("--timeout", type=float, default=0, help="Durée max d'exécution par prompt (s), appliquée dans le worker; 0 = aucun")
+    c1.add_argument("--no-energy", action="store_true", help="Ne pas débiter l'énergie (traitements hors ligne)")
+    c1.set_defaults(_fn=cmd_kernel_batch)
+    return p
+
+def cmd_kernel_batch(args):
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    n = ok = 0; t0 = time.perf_counter()
+    try:
+        for res in kernel_batch(_kb_read_jsonl(args.input), workers=args.workers or None, use_dream=args.dream,
+                                rag_k=max(0, args.rag_k), charge_energy=not args.no_energy, timeout=args.timeout or None):
+            out.write(json.dumps(res, ensure_ascii=False) + "\n"); out.flush()
+            n += 1; ok += bool(res.get("ok"))
+    finally:
+        if out is not sys.stdout: out.close()
+    print(json.dumps({"ok": True, "items": n, "succeeded": ok, "s": round(time.perf_counter() - t0, 3)}), file=sys.stderr)
+    return 0
+# ===============================
+# FIN PATCH KERNEL-BATCH
+# ===============================
+# ===============================
+# PATCH "KSTATS" — compteurs opérationnels du noyau (RAG, portes, E/S du store) (append-only)
+# ===============================
+import os, sys, time, bisect, threading, functools, contextvars
+
+KSTATS_IO = os.environ.get("ALSADIKA_KSTATS_IO", "1").strip().lower() not in ("0", "false", "no", "off")
+KS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+class _KHist:
+    __slots__ = ("counts", "sum", "n")
+    def __init__(self): self.counts = [0] * (len(KS_BUCKETS) + 1); self.sum = 0.0; self.n = 0
+    def observe(self, v: float):
+        self.counts[bisect.bisect_left(KS_BUCKETS, v)] += 1; self.sum += v; self.n += 1
+
+_KS_LOCK = threading.Lock()
+KSTATS = {"rag": {}, "gates": {"energy": 0, "fatigue": 0}, "store": {"read": 0, "write": 0}}
+
+def _ks_observe(engine: str, dt: float):
+    with _KS_LOCK:
+        h = KSTATS["rag"].get(engine)
+        if h is None: h = KSTATS["rag"][engine] = _KHist()
+        h.observe(dt)
+
+def _ks_gate(gate: str):
+    with _KS_LOCK: KSTATS["gates"][gate] += 1
+
+def _ks_timed(engine: str, fn):
+    @functools.wraps(fn)
+    def wrapper(*a, **kw):
+        t0 = time.perf_counter()
+        try: return fn(*a, **kw)
+        finally: _ks_observe(engine, time.perf_counter() - t0)
+    return wrapper
+
+# 1) Latence des requêtes RAG, par moteur
+for _n, _eng in (("docs_query", "docs"), ("cpu_query", "cpu"), ("facts_search", "facts"), ("holo_recall", "holo")):
+    if _n in globals(): globals()[_n] = _ks_timed(_eng, globals()[_n])
+if "GpuRAG" in globals():
+    GpuRAG.query = _ks_timed("gpu", GpuRAG.query)
+
+# 2) Refus des portes énergie / fatigue (_kp_energy_spend et KCACHE passent par EnergyBank.spend)
+if "EnergyBank" in globals():
+    _ks_prev_spend = EnergyBank.spend
+    def _ks_spend(self, action: str) -> bool:
+        ok = _ks_prev_spend(self, action)
+        if not ok: _ks_gate("energy")
+        return ok
+    EnergyBank.spend = _ks_spend
+
+_ks_prev_fatigue = fatigue_spend
+def fatigue_spend(skill: str, cost=8, limit=90):
+    ok, info = _ks_prev_fatigue(skill, cost=cost, limit=limit)
+    if not ok: _ks_gate("fatigue")
+    return ok, info
+
+# 3) Lectures/écritures du store .alsadika, comptées aux helpers load/save (STATE-BACKEND, LogStore):
+#    total du processus + compteurs de la requête en cours (kstats_io_iter)
+_KS_IO: contextvars.ContextVar = contextvars.ContextVar("ks_io", default=None)
+
+def _ks_io(op: str, n: int = 1):
+    if not KSTATS_IO: return
+    with _KS_LOCK: KSTATS["store"][op] += n
+    c = _KS_IO.get()
+    if c is not None: c[op] = c.get(op, 0) + n
+
+def kstats_io_iter(it, counts: dict):
+    """Itère `it` en imputant ses E/S store à `counts` ({"read","write"}); chaque pas peut changer de thread."""
+    it = iter(it)
+    try:
+        while True:
+            tok = _KS_IO.set(counts)
+            try: x = next(it)
+            except StopIteration: return
+            finally: _KS_IO.reset(tok)
+            yield x
+    finally:
+        close = getattr(it, "close", None)
+        if close is not None: close()
+
+def kstats_snapshot() -> dict:
+    """Copie des compteurs: rag = {moteur: {buckets, counts, sum, count}}."""
+    with _KS_LOCK:
+        rag = {e: {"buckets": list(KS_BUCKETS), "counts": list(h.counts), "sum": h.sum, "count": h.n}
+               for e, h in KSTATS["rag"].items()}
+        return {"rag": rag, "gates": dict(KSTATS["gates"]), "store": dict(KSTATS["store"]),
+                "kcache": KCACHE.stats() if "KCACHE" in globals() else None}
+# ===============================
+# FIN PATCH KSTATS
+# ===============================
+
+# ===============================
+# PATCH "STATE-BACKEND" — état partagé multi-workers (SQLite WAL par défaut) (append-only)
+# ===============================
+# Plusieurs workers (uvicorn --workers, kernel-batch) partagent .alsadika: les helpers
+# load/save JSON font du lire-modifier-écrire sans verrou → mises à jour perdues.
+# Ici: une table clé/valeur SQLite (WAL) derrière les mêmes helpers, et state_txn() pour
+# les RMW transactionnels (BEGIN IMMEDIATE). Le fichier JSON reste recopié en miroir pour
+# les lecteurs directs (read_text), par points de contrôle (au plus une recopie par clé et par
+# intervalle, et à la sortie) plutôt qu'à chaque écriture; il sert d'import initial / de resynchronisation.
+import sqlite3, threading, contextlib, atexit
+
+STATE_BACKEND = os.environ.get("ALSADIKA_STATE_BACKEND", "sqlite").strip().lower()   # sqlite | file
+# miroir JSON: checkpoint (défaut) | sync (à chaque écriture, ancien comportement) | off
+_st_mirror    = os.environ.get("ALSADIKA_STATE_MIRROR", "checkpoint").strip().lower()
+STATE_MIRROR  = {"1": "sync", "true": "sync", "yes": "sync", "on": "sync",
+                 "0": "off", "false": "off", "no": "off"}.get(_st_mirror, _st_mirror)
+STATE_MIRROR_S = float(os.environ.get("ALSADIKA_STATE_MIRROR_S", "2"))   # intervalle entre points de contrôle
+STATE_BUSY_MS = int(os.environ.get("ALSADIKA_STATE_BUSY_MS", "10000"))
+STATE_DB      = ROOT / "state.db"
+
+_STATE_TLS = threading.local()
+_ST_ROOT = Path(ROOT).resolve()
+
+_STATE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS state(
+  key TEXT PRIMARY KEY, value TEXT NOT NULL,
+  ver INTEGER NOT NULL DEFAULT 1, ts REAL NOT NULL, fsig TEXT
+);
+"""
+
+def _st_key(p) -> Optional[str]:
+    """Clé = chemin relatif à ROOT; None hors de ROOT (non géré par le backend)."""
+    try: return Path(p).resolve().relative_to(_ST_ROOT).as_posix()
+    except Exception: return None
+
+# archives écrites une fois (pages web): restent de simples fichiers
+_ST_SKIP = tuple(k + "/" for k in (_st_key(globals()[n]) for n in ("WEB_PAGES",) if n in globals()) if k)
+
+def _st_routed(p) -> bool:
+    k = _st_key(p)
+    return bool(k) and k.endswith(".json") and not k.startswith(_ST_SKIP) \
+        and _lss_key(p) not in _LSS_KEYS and _lss_key(p) != _lss_key(FRACTAL_FILE)
+
+def _st_fsig(p) -> Optional[str]:
+    try: st = Path(p).stat(); return f"{st.st_mtime_ns}:{st.st_size}"
+    except Exception: return None
+
+def _st_read_file(p, default):
+    try: return json.loads(Path(p).read_text(encoding="utf-8"))
+    except Exception: return default
+
+def _st_write_file(p, data):
+    # tmp propre au processus: pas de collision entre workers, os.replace atomique
+    p = Path(p); p.parent.mkdir(parents=True, exist_ok=True)
+    tmp = p.with_name(f"{p.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp, p)
+
+def _st_default(default):
+    return default() if callable(default) else default
+
+class StateTxn:
+    """Boîte transactionnelle: modifier .data (ou la réassigner); discard() = ne rien écrire."""
+    __slots__ = ("data", "dirty")
+    def __init__(self, data): self.data = data; self.dirty = True
+    def discard(self): self.dirty = False
+
+class FileStateBackend:
+    """Comportement historique: fichiers JSON, RMW sérialisé par file_lock (sentinelle)."""
+    name = "file"
+
+    def get(self, p, default=None):
+        return _st_read_file(p, default) if Path(p).exists() else default
+
+    def put(self, p, data):
+        with file_lock(Path(p), timeout=STATE_BUSY_MS / 1000): _st_write_file(p, data)
+
+    def version(self, p): return _st_fsig(p) or "-"
+
+    @contextlib.contextmanager
+    def txn(self, p, default=None):
+        with file_lock(Path(p), timeout=STATE_BUSY_MS / 1000):
+            t = StateTxn(self.get(p, _st_default(default)))
+            yield t
+            if t.dirty: _st_write_file(p, t.data)
+
+    def stats(self) -> dict: return {"backend": self.name}
+
+class SqliteStateBackend:
+    """Table clé/valeur WAL: lecteurs concurrents, un écrivain; ver incrémenté à chaque écriture.
+    fsig = signature du fichier miroir à la dernière recopie (NULL: base plus récente que le fichier)."""
+    name = "sqlite"
+
+    def __init__(self, path: Path, mirror: str = "checkpoint"):
+        if mirror not in ("checkpoint", "sync", "off"): raise ValueError(f"ALSADIKA_STATE_MIRROR inconnu: {mirror}")
+        self.path = Path(path); self.mirror = mirror
+        self._dirty: Dict[str, Path] = {}            # clés écrites depuis le dernier point de contrôle
+        self._dlock = threading.Lock(); self._t_ckpt = time.time()
+
+    def _conn(self) -> sqlite3.Connection:
+        # une connexion par thread, rouverte après fork (workers kernel-batch)
+        c = getattr(_STATE_TLS, "conn", None)
+        if c is not None and getattr(_STATE_TLS, "key", None) == (str(self.path), os.getpid()):
+            return c
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        c = sqlite3.connect(str(self.path), timeout=STATE_BUSY_MS / 1000, isolation_level=None)
+        c.execute("PRAGMA journal_mode=WAL"); c.execute("PRAGMA synchronous=NORMAL")
+        c.execute(f"PRAGMA busy_timeout={int(STATE_BUSY_MS)}")
+        c.executescript(_STATE_SCHEMA)
+        _STATE_TLS.conn = c; _STATE_TLS.key = (str(self.path), os.getpid())
+        return c
+
+    def _upsert(self, c, key: str, data, fsig):
+        c.execute("INSERT INTO state(key, value, ver, ts, fsig) VALUES(?,?,1,?,?) "
+                  "ON CONFLICT(key) DO UPDATE SET value=excluded.value, ver=state.ver+1, "
+                  "ts=excluded.ts, fsig=excluded.fsig",
+                  (key, json.dumps(data, ensure_ascii=False), time.time(), fsig))
+
+    def _read(self, c, p, default):
+        key = _st_key(p)
+        row = c.execute("SELECT value, fsig FROM state WHERE key=?", (key,)).fetchone()
+        fs = _st_fsig(p) if (self.mirror != "off" or row is None) else None
+        if row is not None and (fs is None or row[1] is None or fs == row[1]):
+            return json.loads(row[0])
+        # absent en base, ou fichier réécrit hors backend (écrivain direct) → (ré)import
+        data = _st_read_file(p, None) if fs is not None else None
+        if data is None:
+            return json.loads(row[0]) if row is not None else default
+        self._upsert(c, key, data, fs)
+        return data
+
+    def _store(self, c, p, data):
+        fs = None
+        if self.mirror == "sync":
+            try: _st_write_file(p, data); fs = _st_fsig(p)
+            except Exception: pass
+        elif self.mirror == "checkpoint":
+            with self._dlock: self._dirty[_st_key(p)] = Path(p)
+        self._upsert(c, _st_key(p), data, fs)
+
+    def checkpoint(self) -> int:
+        """Recopie JSON des clés écrites par ce processus depuis le dernier point de contrôle
+        (valeur courante en base, écrivains concurrents compris). Renvoie le nombre de fichiers écrits."""
+        with self._dlock:
+            dirty, self._dirty = self._dirty, {}
+            self._t_ckpt = time.time()
+        c, n = self._conn(), 0
+        for key, p in dirty.items():
+            with self._begin(c):
+                row = c.execute("SELECT value FROM state WHERE key=?", (key,)).fetchone()
+                if row is None: continue
+                try: _st_write_file(p, json.loads(row[0]))
+                except Exception: continue
+                c.execute("UPDATE state SET fsig=? WHERE key=?", (_st_fsig(p), key)); n += 1
+        return n
+
+    def _maybe_checkpoint(self, c):
+        if self._dirty and not c.in_transaction and time.time() - self._t_ckpt >= STATE_MIRROR_S:
+            self.checkpoint()
+
+    def get(self, p, default=None):
+        return self._read(self._conn(), p, default)
+
+    def put(self, p, data):
+        c = self._conn()
+        with self._begin(c): self._store(c, p, data)
+        self._maybe_checkpoint(c)
+
+    def version(self, p):
+        # ver seul: la recopie miroir (fsig) ne change pas la valeur
+        row = self._conn().execute("SELECT ver FROM state WHERE key=?", (_st_key(p),)).fetchone()
+        return str(row[0]) if row else (_st_fsig(p) or "-")
+
+    @contextlib.contextmanager
+    def _begin(self, c):
+        if c.in_transaction:          # txn imbriquée (même thread): portée par la transaction externe
+            yield; return
+        c.execute("BEGIN IMMEDIATE")  # verrou écrivain pris dès le début: pas de RMW concurrent
+        try:
+            yield
+        except BaseException:
+            c.execute("ROLLBACK"); raise
+        c.execute("COMMIT")
+
+    @contextlib.contextmanager
+    def txn(self, p, default=None):
+        c = self._conn()
+        with self._begin(c):
+            t = StateTxn(self._read(c, p, _st_default(default)))
+            yield t
+            if t.dirty: self._store(c, p, t.data)
+        self._maybe_checkpoint(c)
+
+    def stats(self) -> dict:
+        c = self._conn()
+        n, writes = c.execute("SELECT COUNT(*), COALESCE(SUM(ver), 0) FROM state").fetchone()
+        return {"backend": self.name, "db": str(self.path), "keys": n, "writes": writes, "mirror": self.mirror,
+                "mirror_pending": len(self._dirty)}
+
+def make_state_backend(kind: str = None):
+    kind = (kind or STATE_BACKEND)
+    if kind == "file": return FileStateBackend()
+    if kind != "sqlite": raise ValueError(f"ALSADIKA_STATE_BACKEND inconnu: {kind}")
+    return SqliteStateBackend(STATE_DB, mirror=STATE_MIRROR)
+
+STATE_STORE = make_state_backend()
+if hasattr(STATE_STORE, "checkpoint"): atexit.register(STATE_STORE.checkpoint)
+
+def state_get(p, default=None): return STATE_STORE.get(p, default)
+def state_put(p, data): return STATE_STORE.put(p, data)
+def state_txn(p, default=None): return STATE_STORE.txn(p, default)
+
+def state_update(p, fn: Callable[[Any], Any], default=None):
+    """RMW atomique: fn(data) modifie data en place ou renvoie la nouvelle valeur."""
+    with STATE_STORE.txn(p, default) as t:
+        r = fn(t.data)
+        if r is not None: t.data = r
+        return t.data
+
+# ---- helpers JSON existants → backend (hors fichiers LogStore / fractal) ----
+def _st_wrap_load(prev):
+    def _load(p, default=None, *a, **kw):
+        if _st_routed(p): return STATE_STORE.get(p, default)
+        _ks_io("read"); return prev(p, default, *a, **kw)
+    return _load
+
+def _st_wrap_save(prev):
+    def _save(p, data, *a, **kw):
+        if _st_routed(p): return STATE_STORE.put(p, data)
+        _ks_io("write"); return prev(p, data, *a, **kw)
+    return _save
+
+for _ln, _sn in (("load_json", "save_json"), ("_load_json", "_save_json"), ("_hload", "_hsave"),
+                 ("_gload", "_gsave"), ("_pload", "_psave"), ("_wload", "_wsave")):
+    if _ln in globals(): globals()[_ln] = _st_wrap_load(globals()[_ln])
+    if _sn in globals(): globals()[_sn] = _st_wrap_save(globals()[_sn])
+atomic_write_json = _st_wrap_save(atomic_write_json)
+
+# ---- RMW transactionnels: énergie ----
+def _eb_txn(self):
+    return state_txn(ENERGY_FILE, lambda: {"energy": self.capacity, "ts": self._now()})
+
+def _eb_fresh(self, st):
+    if st["energy"] > self.capacity: st["energy"] = self.capacity
+    return self._tick(st)
+
+def _eb_get(self) -> Dict[str, int]:
+    with _eb_txn(self) as t:
+        t.data = _eb_fresh(self, t.data); return dict(t.data)
+
+def _eb_spend(self, action: str) -> bool:
+    cost = int(self.cost_map.get(action, 3))
+    with _eb_txn(self) as t:
+        st = _eb_fresh(self, t.data)
+        ok = st["energy"] >= cost
+        if ok: st["energy"] -= cost; st["ts"] = self._now()
+        else: t.discard()
+    if not ok: _ks_gate("energy")
+    return ok
+
+def _eb_charge(self, amount: int) -> Dict[str, int]:
+    with _eb_txn(self) as t:
+        st = _eb_fresh(self, t.data)
+        st["energy"] = int(min(self.capacity, st["energy"] + max(0, amount)))
+        st["ts"] = self._now()
+        return dict(st)
+
+EnergyBank.get, EnergyBank.spend, EnergyBank.charge = _eb_get, _eb_spend, _eb_charge
+
+# ---- RMW transactionnels: fatigue ----
+def _fatigue_default():
+    return {"skills": {}, "ts": int(time.time())}
+
+def _fatigue_regen(d, regen_per_min=2):
+    d.setdefault("skills", {})      # fichier tamponné par une migration sans "skills"
+    now = int(time.time()); gain = (max(0, now - d.get("ts", now)) // 60) * regen_per_min
+    if gain:
+        for v in d["skills"].values(): v["fatigue"] = max(0, v.get("fatigue", 0) - gain)
+        d["ts"] = now
+    return d
+
+def _fatigue_load():
+    return state_get(FATIGUE_FILE, None) or _fatigue_default()
+
+def _fatigue_save(d): state_put(FATIGUE_FILE, d)
+
+def fatigue_tick(regen_per_min=2, cap=100):
+    with state_txn(FATIGUE_FILE, _fatigue_default) as t:
+        return _fatigue_regen(t.data, regen_per_min)
+
+def fatigue_spend(skill: str, cost=8, limit=90):
+    with state_txn(FATIGUE_FILE, _fatigue_default) as t:
+        d = _fatigue_regen(t.data); s = d["skills"].setdefault(skill, {"fatigue": 0, "use": 0})
+        ok = s["fatigue"] + cost < limit
+        if ok: s["fatigue"] += cost; s["use"] += 1; info = dict(s)
+        else: info = {"fatigue": s["fatigue"], "limit": limit}
+    if not ok: _ks_gate("fatigue")
+    return ok, info
+
+# ---- RMW transactionnels: débit (ratelimit.json), mémoire approuvée, quotas auto-retain ----
+def rate_count(p: Path, window: int = 60) -> int:
+    def bump(state):
+        now_s = int(time.time())
+        if now_s - state.get("win", 0) >= window:
+            state.clear(); state.update(win=now_s, count=0)
+        state["count"] = state.get("count", 0) + 1
+    return state_update(p, bump, lambda: {"win": 0, "count": 0})["count"]
+
+# handle de base (en-tête) redéfini ici: même corps, compteur de débit atomique au lieu du load/save.
+# Les surcouches l'appellent via le global _original_handle: l'ordre des contrôles est inchangé.
+def _st_base_handle(self, prompt: str) -> str:
+    if rate_count(ROOT/"ratelimit.json") > 30:
+        return "Limite de débit atteinte, réessaye dans une minute."
+
+    ok, _ = self.verrou.ethical_check(prompt)
+    if not ok:
+        return "Rejet: contraire au cadre éthique."
+
+    intent = classify_intent(prompt)
+    if intent == "summarize":
+        text = re.sub(r"^(.*?:\s*)", "", prompt, count=1)
+        draft = self.lang.summarize(text, max_chars=self._max_chars())
+    elif intent == "define":
+        m = re.search(r"(définis|definition|c'est quoi|expliquer)\s+(.+)", prompt, re.I)
+        term = m.group(2) if m else prompt
+        draft = self.lang.define(term)
+    elif intent == "plan":
+        draft = self.lang.plan(prompt)
+    else:
+        draft = textwrap.shorten(prompt.strip(), width=self._max_chars(), placeholder=" …")
+
+    ok2, draft2 = self.logic.check_consistency(prompt, draft)
+    if not ok2:
+        return "Incohérence détectée."
+
+    if self.mode == "public":
+        out = draft2.strip()
+    else:
+        try:
+            fingerprint = hashlib.sha256(Path(__file__).read_bytes()).hexdigest()[:16]
+        except Exception:
+            fingerprint = "unknown"
+        trace = [
+            f"[{APP}] mode=private intent={intent} fingerprint={fingerprint}",
+            f"- Contrainte: {self.memory.get('contrainte', 'local-first; halal; concision')}",
+            "- Verrou: vérité > satisfaction; aucune proposition gratuite."
+        ]
+        out = "\n".join(trace) + "\n\n" + draft2.strip()
+
+    return self.verrou.truth_over_satisfaction(out)
+
+_original_handle = _st_base_handle
+
+def _mem_approve(self, key: str, value: Any) -> None:
+    def put(d): d[key] = value
+    self.data = state_update(MEM_FILE, put, dict)
+
+Memory.approve = _mem_approve
+
+def _state_load():
+    st = state_get(STATE_FILE, None) or {}
+    st.setdefault("last_scan", 0); st.setdefault("day", ""); st.setdefault("count_today", 0)
+    return st
+
+def _state_save(st): state_put(STATE_FILE, st)
+
+def _state_add(day: str, n: int):
+    def bump(st):
+        if st.get("day") != day:
+            st["day"] = day; st["count_today"] = 0
+        st["count_today"] = st.get("count_today", 0) + n
+    return state_update(STATE_FILE, bump, lambda: {"last_scan": 0, "day": day, "count_today": 0})
+
+# ---- LogStore: verrou inter-processus autour de refresh + append ----
+try:
+    import fcntl
+except ImportError:       # Windows: verrou processus seul (RLock existant)
+    fcntl = None
+
+@contextlib.contextmanager
+def _lss_flock(store: "LogStore"):
+    depth = getattr(store, "_fl_depth", 0)
+    if fcntl is None or depth:
+        store._fl_depth = depth + 1
+        try: yield
+        finally: store._fl_depth = depth
+        return
+    store.log.parent.mkdir(parents=True, exist_ok=True)
+    with open(str(store.log) + ".lock", "a") as fh:
+        fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+        store._fl_depth = 1
+        try: yield
+        finally:
+            store._fl_depth = 0
+            fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+_st_prev_commit = LogStore.commit
+def _st_commit(self, ops):
+    if not ops: return
+    with self.lock, _lss_flock(self):
+        self.refresh()                      # rattrape les appends des autres workers avant le nôtre
+        _st_prev_commit(self, ops)
+
+def _lss_at(node, p):
+    for k in p:
+        try: node = node[int(k)] if isinstance(node, list) else node[k]
+        except Exception: return None
+    return node
+
+def _lss_rebase(store, base, ops):
+    """Ajouts en fin de liste recalés sur la longueur courante: les appends concurrents restent."""
+    for op in ops:
+        if op.get("op") != "ext" or not op.get("at"): continue
+        cur, old = _lss_at(store.state, op["p"]), _lss_at(base, op["p"])
+        if isinstance(cur, list) and isinstance(old, list) and op["at"] == len(old) \
+                and len(cur) > len(old) and cur[:len(old)] == old:
+            op["at"] = len(cur)
+    return ops
+
+# copie lue par chaque thread (load) → save_state ne journalise que ce que l'appelant a changé
+_st_prev_snapshot = LogStore.snapshot_copy
+def _st_snapshot_copy(self):
+    with self.lock:
+        data = _st_prev_snapshot(self)
+        if not hasattr(self, "_bases"): self._bases = threading.local()
+        self._bases.v = json.loads(json.dumps(data))
+        return data
+
+def _st_save_state(self, data):
+    with self.lock, _lss_flock(self):
+        self.refresh()
+        bases = getattr(self, "_bases", None); base = getattr(bases, "v", None)
+        if base is None:
+            ops = LogStore.diff(self.state, data)
+        else:   # diff base → data rejoué sur l'état frais: pas de retour en arrière sur les écritures des autres
+            ops = _lss_rebase(self, base, LogStore.diff(base, data))
+        self.commit(ops)
+        if bases is not None: bases.v = json.loads(json.dumps(data))
+
+def _st_update(self, fn: Callable[[Any], Any]):
+    """RMW atomique (tous workers): refresh, fn(copie) modifie en place ou renvoie l'état, diff journalisé."""
+    with self.lock, _lss_flock(self):
+        self.refresh()
+        data = json.loads(json.dumps(self.state))
+        r = fn(data)
+        if r is not None: data = r
+        self.commit(LogStore.diff(self.state, data))
+        return data
+
+LogStore.commit, LogStore.save_state = _st_commit, _st_save_state
+LogStore.snapshot_copy, LogStore.update = _st_snapshot_copy, _st_update
+
+# ---- compteurs E/S (KSTATS) aux points d'accès du store: backends fichier et SQLite, LogStore ----
+def _ks_wrap_get(prev):
+    def get(self, p, default=None):
+        _ks_io("read"); return prev(self, p, default)
+    return get
+
+def _ks_wrap_put(prev):
+    def put(self, p, data):
+        _ks_io("write"); return prev(self, p, data)
+    return put
+
+def _ks_wrap_txn(prev):
+    @contextlib.contextmanager
+    def txn(self, p, default=None):
+        _ks_io("read")
+        with prev(self, p, default) as t:
+            yield t
+            if t.dirty: _ks_io("write")
+    return txn
+
+for _cls in (FileStateBackend, SqliteStateBackend):
+    _cls.get, _cls.put, _cls.txn = _ks_wrap_get(_cls.get), _ks_wrap_put(_cls.put), _ks_wrap_txn(_cls.txn)
+
+_ks_prev_lss_load, _ks_prev_lss_replay, _ks_prev_lss_commit = LogStore._load, LogStore._replay, LogStore.commit
+def _ks_lss_load(self):
+    if self.path.exists(): _ks_io("read")
+    return _ks_prev_lss_load(self)
+def _ks_lss_replay(self):
+    if self.log.exists(): _ks_io("read")
+    return _ks_prev_lss_replay(self)
+def _ks_lss_commit(self, ops):
+    if ops: _ks_io("write")
+    return _ks_prev_lss_commit(self, ops)
+LogStore._load, LogStore._replay, LogStore.commit = _ks_lss_load, _ks_lss_replay, _ks_lss_commit
+
+# ---- cache de réponses: la version en base suit les écritures (miroir ou non) ----
+_st_prev_stamp = kernel_state_stamp
+def kernel_state_stamp() -> str:
+    vers = [f"{n}:{STATE_STORE.version(globals()[n])}" for n in KCACHE_STATE_FILES
+            if n in globals() and _st_routed(globals()[n])]
+    return hashlib.sha1((_st_prev_stamp() + "|" + "|".join(vers)).encode("utf-8")).hexdigest()[:16]
+
+# ---- CLI ----
+def cmd_state_stats(args):
+    print(json.dumps(STATE_STORE.stats(), ensure_ascii=False, indent=2))
+
+def cmd_state_import(args):
+    """Réimporte les fichiers JSON de ROOT dans le backend (après une restauration manuelle)."""
+    n = 0
+    for p in sorted(Path(ROOT).rglob("*.json")):
+        if not _st_routed(p): continue
+        data = _st_read_file(p, None)
+        if data is None: continue
+        STATE_STORE.put(p, data); n += 1
+    print(f"✅ {n} fichier(s) importé(s) → {STATE_STORE.name}")
+
+def cmd_state_checkpoint(args):
+    """Recopie JSON immédiate (miroir par points de contrôle), p. ex. avant une sauvegarde de .alsadika."""
+    n = STATE_STORE.checkpoint() if hasattr(STATE_STORE, "checkpoint") else 0
+    print(json.dumps({"ok": True, "written": n}, ensure_ascii=False, indent=2))
+
+try: _st_prev_build = build_parser
+except NameError: _st_prev_build = None
+def build_parser():
+    p = _st_prev_build() if _st_prev_build else argparse.ArgumentParser(prog="alsadika")
+    sp = [a for a in p._subparsers._actions if getattr(a, 'dest', None) == 'cmd'][0]
+    c1 = sp.add_parser("state-stats", help="Backend d'état partagé: clés, écritures"); c1.set_defaults(_fn=cmd_state_stats)
+    c2 = sp.add_parser("state-import", help="Réimporter les JSON de .alsadika dans le backend"); c2.set_defaults(_fn=cmd_state_import)
+    c3 = sp.add_parser("state-checkpoint", help="Recopier maintenant les écritures en attente vers les JSON miroirs")
+    c3.set_defaults(_fn=cmd_state_checkpoint)
+    return p
+# ===============================
+# FIN PATCH STATE-BACKEND
+# ===============================
+# ===============================
+# PATCH "CLI-ENTRY" — point d'entrée unique, après tous les patchs (append-only)
+# ===============================
+def cmd_mirror_tail(args):
+    k = max(1, int(getattr(args, "k", 5) or 5)); recs = []
+    try: lines = MIRROR_LOG.read_text(encoding="utf-8").splitlines()
+    except Exception: lines = []
+    for ln in lines[-k:]:
+        try: recs.append(json.loads(ln))
+        except Exception: pass
+    print(json.dumps(recs, ensure_ascii=False, indent=2)); return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
+# ===============================
+# FIN PATCH CLI-ENTRY
+# ===============================
@@ -1,4 +1,5 @@
-import os, time, typing
+import os, re, time, hashlib, hmac, typing
+from collections import OrderedDict
 from fastapi import Request
 from jwt import decode as jwt_decode, InvalidTokenError
 
@@ -6,6 +7,16 @@ JWT_SECRET = os.getenv("JWT_SECRET", "dev-secret")
 JWT_AUD = os.getenv("JWT_AUDIENCE", "alsadika-clients")
 JWT_ISS = os.getenv("JWT_ISSUER", "alsadika-backend")
 
+# Cache des jetons déjà vérifiés (clé = empreinte du jeton, borné par son exp)
+JWT_CACHE_SIZE = int(os.getenv("JWT_CACHE_SIZE", "4096"))
+JWT_CACHE_TTL = float(os.getenv("JWT_CACHE_TTL", "300"))   # plafond si le jeton n'a pas d'exp
+
+# /api/metrics (scraping Prometheus, qui ne sait pas émettre de JWT):
+# - METRICS_TOKEN vide  → exempté, comme /api/health (réseau de supervision interne)
+# - METRICS_TOKEN=xyz   → "Authorization: Bearer xyz" exigé (bearer_token du scrape), ou un JWT valide
+METRICS_PATH = "/api/metrics"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
 EXEMPT_PATHS = {
     "/api/health",
     "/openapi.json",
@@ -14,18 +25,70 @@ EXEMPT_PATHS = {
     # flux SSE anonyme si vous voulez tester sans token :
     # "/api/chat/stream",
 }
+if not METRICS_TOKEN:
+    EXEMPT_PATHS.add(METRICS_PATH)
+
+def compile_exempt(paths: typing.Iterable[str]) -> "re.Pattern[str]":
+    """Chemin exact ou sous-chemin ("/docs", "/docs/...") — mais pas "/docsomething"."""
+    alts = sorted({re.escape(p.rstrip("/")) for p in paths if p.rstrip("/")}, key=len, reverse=True)
+    return re.compile(r"^(?:" + "|".join(alts) + r")(?:/.*)?$") if alts else re.compile(r"(?!)")
+
+# À recompiler (compile_exempt) si EXEMPT_PATHS est modifié après l'import
+_EXEMPT_RE = compile_exempt(EXEMPT_PATHS)
+
+_cache: "OrderedDict[bytes, float]" = OrderedDict()
+_stats = {"hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+
+def cache_stats() -> dict:
+    return {**_stats, "size": len(_cache), "max": JWT_CACHE_SIZE}
+
+def cache_clear() -> None:
+    _cache.clear()
+
+def _cache_get(key: bytes, now: float) -> bool:
+    until = _cache.get(key)
+    if until is None:
+        return False
+    if now >= until:
+        del _cache[key]
+        _stats["expired"] += 1
+        return False
+    _cache.move_to_end(key)
+    return True
+
+def _cache_put(key: bytes, payload: dict, now: float) -> None:
+    until = now + JWT_CACHE_TTL
+    exp = payload.get("exp")
+    if isinstance(exp, (int, float)):
+        until = min(until, float(exp))
+    if until <= now:
+        return
+    _cache[key] = until
+    _cache.move_to_end(key)
+    while len(_cache) > JWT_CACHE_SIZE:
+        _cache.popitem(last=False)
+        _stats["evictions"] += 1
 
 async def verify_request(request: Request) -> bool:
     path = request.url.path
-    if any(path == p or path.startswith(p.rstrip("/")) for p in EXEMPT_PATHS):
+    if _EXEMPT_RE.match(path):
         return True
     auth = request.headers.get("Authorization","")
     if not auth.lower().startswith("bearer "):
         return False
     token = auth.split(" ",1)[1].strip()
+    if METRICS_TOKEN and path.rstrip("/") == METRICS_PATH and hmac.compare_digest(token, METRICS_TOKEN):
+        return True
+    key = hashlib.sha256(token.encode("utf-8")).digest()
+    now = time.time()
+    if _cache_get(key, now):
+        _stats["hits"] += 1
+        return True
+    _stats["misses"] += 1
     try:
         payload = jwt_decode(token, JWT_SECRET, algorithms=["HS256"], audience=JWT_AUD, issuer=JWT_ISS)
         # on pourrait vérifier des scopes ici
+        _cache_put(key, payload, now)
         return True
     except InvalidTokenError:
         return False
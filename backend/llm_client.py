@@ -1,11 +1,24 @@
-import os, json, time
-from typing import Iterable, List, Dict, Optional
+import os, json, time, atexit, threading
+from typing import AsyncIterator, Iterable, List, Dict, Optional, Union
 import httpx
 
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 BASE = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
 MODEL = os.getenv("OPENROUTER_MODEL", "google/gemini-2.0-flash-exp:free")
 
+# Pool de connexions partagé (keep-alive): évite un handshake TCP/TLS par tour de chat
+HTTP2 = os.getenv("OPENROUTER_HTTP2", "0").lower() in ("1", "true", "yes")
+MAX_CONNECTIONS = int(os.getenv("OPENROUTER_MAX_CONNECTIONS", "32"))
+MAX_KEEPALIVE = int(os.getenv("OPENROUTER_MAX_KEEPALIVE", "16"))
+KEEPALIVE_EXPIRY = float(os.getenv("OPENROUTER_KEEPALIVE_EXPIRY", "60"))
+TIMEOUT_CONNECT = float(os.getenv("OPENROUTER_TIMEOUT_CONNECT", "10"))
+TIMEOUT_READ = float(os.getenv("OPENROUTER_TIMEOUT_READ", "120"))
+TIMEOUT_POOL = float(os.getenv("OPENROUTER_TIMEOUT_POOL", "10"))
+
+_client: Optional[httpx.Client] = None
+_aclient: Optional[httpx.AsyncClient] = None
+_lock = threading.Lock()
+
 def _headers():
     if not OPENROUTER_API_KEY:
         raise RuntimeError("OPENROUTER_API_KEY manquant dans l'environnement.")
@@ -16,31 +29,110 @@ def _headers():
         "X-Title": "Al Sadika",
     }
 
+def _http2() -> bool:
+    # HTTP/2 nécessite le paquet optionnel "h2" (httpx[http2])
+    if not HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def _client_kwargs() -> dict:
+    return {
+        "http2": _http2(),
+        "limits": httpx.Limits(max_connections=MAX_CONNECTIONS,
+                               max_keepalive_connections=MAX_KEEPALIVE,
+                               keepalive_expiry=KEEPALIVE_EXPIRY),
+        "timeout": httpx.Timeout(TIMEOUT_READ, connect=TIMEOUT_CONNECT, pool=TIMEOUT_POOL),
+    }
+
+def get_client() -> httpx.Client:
+    global _client
+    if _client is None or _client.is_closed:
+        with _lock:
+            if _client is None or _client.is_closed:
+                _client = httpx.Client(**_client_kwargs())
+    return _client
+
+def get_async_client() -> httpx.AsyncClient:
+    global _aclient
+    if _aclient is None or _aclient.is_closed:
+        _aclient = httpx.AsyncClient(**_client_kwargs())
+    return _aclient
+
+def close_client() -> None:
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
+
+async def aclose_client() -> None:
+    """À appeler à l'arrêt de l'application (shutdown FastAPI)."""
+    global _aclient
+    if _aclient is not None:
+        await _aclient.aclose()
+        _aclient = None
+
+atexit.register(close_client)
+
+_DONE = object()
+
+def _parse_line(line: Union[str, bytes]):
+    """Une ligne SSE OpenRouter -> delta texte, "" si rien, _DONE en fin de flux."""
+    if isinstance(line, bytes):
+        line = line.decode("utf-8", "replace")
+    if not line.startswith("data: "):
+        return ""
+    payload = line[6:]
+    if payload.strip() == "[DONE]":
+        return _DONE
+    try:
+        j = json.loads(payload)
+        return j.get("choices",[{}])[0].get("delta",{}).get("content","") or ""
+    except Exception:
+        # on ignore les lignes non parseables
+        return ""
+
+def _body(messages: List[Dict[str,str]], model: Optional[str]) -> dict:
+    return {
+        "model": model or MODEL,
+        "messages": messages,
+        "stream": True,
+    }
+
 def stream_chat(messages: List[Dict[str,str]], model: Optional[str]=None) -> Iterable[str]:
     """
     Renvoie un flux de tokens (strings) depuis OpenRouter.
     """
-    mdl = model or MODEL
     url = f"{BASE}/chat/completions"
-    body = {
-        "model": mdl,
-        "messages": messages,
-        "stream": True,
-    }
-    with httpx.stream("POST", url, headers=_headers(), json=body, timeout=120) as r:
+    with get_client().stream("POST", url, headers=_headers(), json=_body(messages, model)) as r:
         r.raise_for_status()
+        done = False
         for line in r.iter_lines():
-            if not line: 
-                continue
-            if line.startswith(b"data: "):
-                payload = line[6:]
-                if payload == b"[DONE]":
-                    break
-                try:
-                    j = json.loads(payload.decode("utf-8"))
-                    delta = j.get("choices",[{}])[0].get("delta",{}).get("content","")
-                    if delta:
-                        yield delta
-                except Exception:
-                    # on ignore les lignes non parseables
-                    pass
+            if done:
+                continue   # lire jusqu'au bout: une réponse complète rend sa connexion au pool
+            delta = _parse_line(line)
+            if delta is _DONE:
+                done = True
+            elif delta:
+                yield delta
+
+async def astream_chat(messages: List[Dict[str,str]], model: Optional[str]=None) -> AsyncIterator[str]:
+    """
+    Variante asynchrone de stream_chat (pool AsyncClient partagé).
+    Fermer le générateur (aclose / annulation) ferme la réponse amont et rend la connexion au pool.
+    """
+    url = f"{BASE}/chat/completions"
+    async with get_async_client().stream("POST", url, headers=_headers(), json=_body(messages, model)) as r:
+        r.raise_for_status()
+        done = False
+        async for line in r.aiter_lines():
+            if done:
+                continue   # lire jusqu'au bout: une réponse complète rend sa connexion au pool
+            delta = _parse_line(line)
+            if delta is _DONE:
+                done = True
+            elif delta:
+                yield delta
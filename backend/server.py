@@ -1,21 +1,27 @@
-import os, json
-from typing import Optional, List, Dict
+import os, json, time, asyncio
+from contextlib import aclosing, suppress
+from typing import Any, Optional, List, Dict, Union
 from datetime import datetime
 from fastapi import FastAPI, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, Field
 from sse_starlette.sse import EventSourceResponse
 
 try:
-    from .llm_client import stream_chat
+    from .llm_client import astream_chat, aclose_client
+    from . import metrics, singleflight
 except ImportError:
-    from llm_client import stream_chat
+    from llm_client import astream_chat, aclose_client
+    import metrics, singleflight
 
 # Noyau (kernel/Hakim)
-from al_sadika_core_v2 import kernel_run  # présent dans ton repo
+from al_sadika_core_v2 import (kernel_stream_cached, kernel_batch, kstats_snapshot,  # présent dans ton repo
+                               kstats_io_iter, kernel_state_stamp, kcache_charge, kb_slot)
 
 app = FastAPI(title="Al Sadika Backend")
 
-from jwt_guard import verify_request
+from jwt_guard import verify_request, cache_stats as jwt_cache_stats
 @app.middleware("http")
 async def _jwt_guard(request: Request, call_next):
     if await verify_request(request):
@@ -32,6 +38,99 @@ app.add_middleware(
 IDENTITY = os.getenv("ALSADIKA_IDENTITY", "Tu es Al Sâdika, assistante véridique et souveraine. Réponds en français, brièvement, sans branding externe.")
 DISCLAIMER = os.getenv("ALSADIKA_DISCLAIMER", "Al Sâdika est un outil d'assistance, elle ne remplace ni mufti ni décision personnelle.")
 
+# Regroupement des fragments SSE: 0 = chaque fragment part immédiatement
+SSE_COALESCE_CHARS = int(os.getenv("ALSADIKA_SSE_COALESCE_CHARS", "0"))
+SSE_COALESCE_MS = float(os.getenv("ALSADIKA_SSE_COALESCE_MS", "0"))
+
+def _coalesce(chunks):
+    """Regroupe les fragments jusqu'à SSE_COALESCE_CHARS caractères ou SSE_COALESCE_MS ms, sans jamais attendre."""
+    buf, n, t0 = [], 0, time.monotonic()
+    for c in chunks:
+        if not c:
+            continue
+        buf.append(c); n += len(c)
+        if n >= SSE_COALESCE_CHARS or (SSE_COALESCE_MS and (time.monotonic() - t0) * 1000 >= SSE_COALESCE_MS):
+            yield "".join(buf)
+            buf, n, t0 = [], 0, time.monotonic()
+    if buf:
+        yield "".join(buf)
+
+async def _acoalesce(chunks):
+    buf, n, t0 = [], 0, time.monotonic()
+    async for c in chunks:
+        if not c:
+            continue
+        buf.append(c); n += len(c)
+        if n >= SSE_COALESCE_CHARS or (SSE_COALESCE_MS and (time.monotonic() - t0) * 1000 >= SSE_COALESCE_MS):
+            yield "".join(buf)
+            buf, n, t0 = [], 0, time.monotonic()
+    if buf:
+        yield "".join(buf)
+
+# Flux LLM: file bornée entre lecture amont et écriture SSE (contre-pression) + sondage de déconnexion
+SSE_QUEUE_MAX = int(os.getenv("ALSADIKA_SSE_QUEUE_MAX", "32"))
+SSE_DISCONNECT_POLL_S = float(os.getenv("ALSADIKA_SSE_DISCONNECT_POLL_S", "1.0"))
+
+# Single-flight: requêtes identiques concurrentes → une seule exécution, fragments diffusés aux doublons
+KERNEL_FLIGHT = singleflight.SingleFlight("kernel")
+LLM_FLIGHT = singleflight.AsyncSingleFlight("llm")
+
+def _kernel_join(q: str):
+    # doublon servi par le flux partagé: débit énergie rejoué (comme sur un hit du cache)
+    refused = kcache_charge(q, kind="kernel-run")
+    return [{"stage": "energy", "text": refused}] if refused else None
+
+def _kernel_chunks(q: str):
+    key = singleflight.flight_key("kernel_stream", singleflight.normalize(q), False, 0, kernel_state_stamp())
+    return KERNEL_FLIGHT.stream(key, lambda: kernel_stream_cached(q, use_dream=False, rag_k=0),
+                                shareable=lambda ch: ch["stage"] != "energy",
+                                on_join=lambda: _kernel_join(q),
+                                mark=lambda ch: {**ch, "shared": True})
+
+def _llm_chunks(messages, model):
+    key = singleflight.flight_key("llm", model or "", [(m["role"], singleflight.normalize(m["content"])) for m in messages])
+    return LLM_FLIGHT.stream(key, lambda: astream_chat(messages, model=model))
+
+async def _pump_llm(messages, model, queue: asyncio.Queue):
+    t0 = time.perf_counter(); first = True
+    try:
+        async with aclosing(_llm_chunks(messages, model)) as upstream, aclosing(_acoalesce(upstream)) as chunks:
+            async for chunk in chunks:
+                if first:
+                    LLM_TTFT.observe(time.perf_counter() - t0); first = False
+                await queue.put(("content", chunk))   # bloque si le client lit moins vite que l'amont
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        await queue.put(("error", str(e)))
+    await queue.put(None)
+
+# ----- Métriques (/api/metrics, format texte Prometheus) -----
+# accès: sans JWT si METRICS_TOKEN est vide, sinon bearer METRICS_TOKEN (voir jwt_guard)
+REQUESTS = metrics.counter("alsadika_requests_total", "Requêtes chat par fournisseur", ["provider"])
+FIRST_CHUNK = metrics.histogram("alsadika_request_ttfb_seconds", "Délai jusqu'au premier fragment de contenu", ["provider"])
+STREAM_TIME = metrics.histogram("alsadika_sse_stream_seconds", "Durée totale des flux SSE", ["provider"])
+LLM_TTFT = metrics.histogram("alsadika_llm_ttft_seconds", "Délai amont LLM jusqu'au premier token")
+STORE_OPS = metrics.histogram("alsadika_store_ops_per_request", "Lectures/écritures du store .alsadika par requête",
+                              ["provider", "op"], buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200, 500))
+
+@metrics.REGISTRY.collector
+def _kernel_metrics():
+    out = metrics.kstats_lines(kstats_snapshot())
+    jc = jwt_cache_stats()
+    out += metrics.family("alsadika_jwt_cache_requests_total", "counter", "Vérifications JWT servies par le cache",
+                          [({"result": "hit"}, jc["hits"]), ({"result": "miss"}, jc["misses"])])
+    out += metrics.sflight_lines(singleflight.stats())
+    return out
+
+@app.get("/api/metrics")
+def prom_metrics():
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.on_event("shutdown")
+async def _close_llm_client():
+    await aclose_client()
+
 @app.get("/api/health")
 def health():
     return {"status":"ok","ts":datetime.utcnow().isoformat()}
@@ -49,7 +148,8 @@ def _build_messages(q: str) -> List[Dict[str,str]]:
             {"role":"user","content":q}]
 
 @app.get("/api/chat/stream")
-def chat_stream(
+async def chat_stream(
+    request: Request,
     q: str = Query(..., min_length=1),
     provider: str = Query("hybrid"),   # <-- défaut = LLM RÉEL
     model: Optional[str] = Query(None),
@@ -58,30 +158,89 @@ def chat_stream(
     council: Optional[str] = None,
     strict_identity: Optional[str] = None
 ):
+    REQUESTS.inc(provider=provider)
+    t0 = time.perf_counter()
+
     # ----- Mode noyau local (sans LLM) -----
     if provider == "kernel":
         def sse():
             sid = sessionId or "s-"+datetime.utcnow().isoformat()
             yield f"data: {json.dumps({'type':'session','session_id':sid}, ensure_ascii=False)}\n\n"
+            hit = shared = False
+            io = {"read": 0, "write": 0}
+            def texts():
+                nonlocal hit, shared
+                for ch in kstats_io_iter(_kernel_chunks(q), io):
+                    hit = hit or bool(ch.get("hit"))
+                    shared = shared or bool(ch.get("shared"))
+                    yield ch["text"]
             try:
-                out = kernel_run(q, use_dream=False, rag_k=0)
-                yield f"data: {json.dumps({'type':'content','text':out}, ensure_ascii=False)}\n\n"
+                for i, part in enumerate(_coalesce(texts())):
+                    if i == 0:
+                        FIRST_CHUNK.observe(time.perf_counter() - t0, provider=provider)
+                    yield f"data: {json.dumps({'type':'content','text':part}, ensure_ascii=False)}\n\n"
             except Exception as e:
                 yield f"data: {json.dumps({'type':'content','text':'[ERREUR noyau] '+str(e)}, ensure_ascii=False)}\n\n"
-            yield "data: {\"type\":\"complete\"}\n\n"
+            finally:
+                STREAM_TIME.observe(time.perf_counter() - t0, provider=provider)
+                for op, n in io.items():
+                    STORE_OPS.observe(n, provider=provider, op=op)
+            yield f"data: {json.dumps({'type':'complete','cached':hit,'shared':shared})}\n\n"
         return EventSourceResponse(sse(), media_type="text/event-stream")
 
     # ----- Mode LLM réel (hybrid) -----
     messages = _build_messages(q)
 
-    def sse_llm():
+    async def sse_llm():
         sid = sessionId or "s-"+datetime.utcnow().isoformat()
         yield f"data: {json.dumps({'type':'session','session_id':sid}, ensure_ascii=False)}\n\n"
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SSE_QUEUE_MAX)
+        pump = asyncio.create_task(_pump_llm(messages, model, queue))
+        first = True
         try:
-            for chunk in stream_chat(messages, model=model):
-                yield f"data: {json.dumps({'type':'content','text':chunk}, ensure_ascii=False)}\n\n"
-        except Exception as e:
-            yield f"data: {json.dumps({'type':'content','text':'[ERREUR LLM] '+str(e)}, ensure_ascii=False)}\n\n"
-        yield "data: {\"type\":\"complete\"}\n\n"
+            while True:
+                if await request.is_disconnected():
+                    return   # le finally annule la requête amont
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout=SSE_DISCONNECT_POLL_S)
+                except asyncio.TimeoutError:
+                    continue
+                if item is None:
+                    break
+                kind, text = item
+                if kind == "error":
+                    text = '[ERREUR LLM] ' + text
+                if first:
+                    FIRST_CHUNK.observe(time.perf_counter() - t0, provider=provider); first = False
+                yield f"data: {json.dumps({'type':'content','text':text}, ensure_ascii=False)}\n\n"
+            yield "data: {\"type\":\"complete\"}\n\n"
+        finally:
+            STREAM_TIME.observe(time.perf_counter() - t0, provider=provider)
+            pump.cancel()
+            with suppress(asyncio.CancelledError):
+                await pump
 
     return EventSourceResponse(sse_llm(), media_type="text/event-stream")
+
+# ----- Lots noyau (traitements hors ligne) -----
+class KernelBatchBody(BaseModel):
+    prompts: List[Union[str, Dict[str, Any]]] = Field(..., min_length=1)   # "texte" ou {"id","prompt"}
+    workers: Optional[int] = Field(default=None, ge=1, le=64)
+    use_dream: bool = False
+    rag_k: int = Field(default=0, ge=0, le=10)
+    timeout: Optional[float] = Field(default=None, gt=0)
+
+@app.post("/api/kernel/batch")
+def kernel_batch_endpoint(body: KernelBatchBody):
+    """Résultats NDJSON dans l'ordre de soumission: {i, id?, ok, out|error, ms} par ligne.
+    L'énergie est toujours débitée ici; --no-energy reste réservé au CLI hors ligne.
+    Pool de processus partagé entre requêtes; 429 si KB_MAX_BATCHES lots tournent déjà."""
+    slot = kb_slot(timeout=0)
+    if slot is None:
+        from starlette.responses import JSONResponse
+        return JSONResponse({"detail":"Too many concurrent batches"}, status_code=429)
+    def ndjson():
+        for res in kernel_batch(body.prompts, workers=body.workers, use_dream=body.use_dream, rag_k=body.rag_k,
+                                timeout=body.timeout, slot=slot):
+            yield json.dumps(res, ensure_ascii=False) + "\n"
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
@@ -0,0 +1,29 @@
+"""
+Import du noyau pour les tests: ses chemins (.alsadika/...) sont relatifs au répertoire courant,
+on l'importe donc une seule fois depuis un dossier temporaire dédié, qui reste le répertoire courant.
+"""
+import importlib
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+BACKEND = Path(__file__).resolve().parents[1] / "backend"
+_WORKDIR = None
+
+
+def load_core():
+    global _WORKDIR
+    if _WORKDIR is None:
+        _WORKDIR = tempfile.mkdtemp(prefix="alsadika-tests-")
+    os.chdir(_WORKDIR)
+    if str(BACKEND) not in sys.path:
+        sys.path.insert(0, str(BACKEND))
+    return importlib.import_module("al_sadika_core_v2")
+
+
+def scratch(name: str) -> Path:
+    """Dossier vide propre à un test, sous le répertoire de travail du noyau."""
+    load_core()
+    d = Path(tempfile.mkdtemp(prefix=name + "-", dir=_WORKDIR))
+    return d
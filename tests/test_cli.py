@@ -0,0 +1,76 @@
+"""
+CLI du noyau: chaque sous-commande ajoutée par un patch doit être joignable depuis
+`python backend/al_sadika_core_v2.py <commande>` (point d'entrée après tous les patchs).
+Exécution dans un dossier temporaire: .alsadika est relatif au répertoire courant.
+"""
+import json
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+CORE = Path(__file__).resolve().parents[1] / "backend" / "al_sadika_core_v2.py"
+
+
+class CliTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cwd = Path(self.tmp.name)
+        (self.cwd / ".alsadika").mkdir()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def run_cli(self, *args, timeout=120):
+        r = subprocess.run([sys.executable, str(CORE), *args], cwd=self.cwd, capture_output=True,
+                           text=True, timeout=timeout)
+        self.assertEqual(r.returncode, 0, r.stderr)
+        return r.stdout
+
+    def run_json(self, *args, **kw):
+        return json.loads(self.run_cli(*args, **kw))
+
+
+class EntrypointTest(CliTestCase):
+    def test_help_lists_patched_commands(self):
+        out = self.run_cli("--help")
+        for cmd in ("rag-bench", "kg-query", "kernel-batch", "state-stats", "state-import", "state-checkpoint"):
+            self.assertIn(cmd, out)
+
+
+class RagBenchCliTest(CliTestCase):
+    def test_small_run_reports_docs_engine(self):
+        rep = self.run_json("rag-bench", "--sizes", "200", "--queries", "5", "--engines", "docs", "--k", "3")
+        self.assertEqual(rep["k"], 3)
+        run, = rep["runs"]
+        self.assertEqual(run["docs"], 200)
+        eng, = run["engines"]
+        self.assertTrue(eng["ok"], eng)
+        self.assertEqual(eng["queries"], 5)
+        self.assertGreater(eng["index_bytes"], 0)
+        self.assertLessEqual(eng["p50_ms"], eng["p99_ms"])
+        self.assertTrue(0.0 <= eng["recall@3"] <= 1.0)
+
+
+class KgQueryCliTest(CliTestCase):
+    def test_neighbors_honour_dir(self):
+        self.run_cli("kg-add", "--src", "a", "--rel", "cause", "--dst", "b")
+        self.run_cli("kg-add", "--src", "x", "--rel", "voit", "--dst", "a")
+        self.assertEqual(self.run_json("kg-query", "--term", "a"), {"out": ["a -cause→ b"], "in": ["x -voit→ a"]})
+        self.assertEqual(self.run_json("kg-query", "--term", "a", "--dir", "in"), {"in": ["x -voit→ a"]})
+        self.assertEqual(self.run_json("kg-query", "--term", "x", "--depth", "2", "--limit", "1")["levels"], [["a"]])
+
+
+class StateCliTest(CliTestCase):
+    def test_import_checkpoint_and_stats(self):
+        (self.cwd / ".alsadika" / "notes.json").write_text('{"a": 1}', encoding="utf-8")
+        self.assertIn("importé", self.run_cli("state-import"))
+        self.assertEqual(self.run_json("state-checkpoint")["ok"], True)
+        st = self.run_json("state-stats")
+        self.assertEqual((st["backend"], st["mirror"], st["mirror_pending"]), ("sqlite", "checkpoint", 0))
+        self.assertGreaterEqual(st["keys"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+"""
+Pack Docker (server.py): historique de chat en collection dédiée — migration des anciennes sessions
+à messages embarqués, curseur `ts|_id`, pagination à rebours sans doublon ni trou quand des ts sont égaux.
+Base Mongo simulée par mongomock-motor.
+"""
+import importlib.util
+import os
+import sys
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest import mock
+
+from tests.core_env import load_core
+
+load_core()             # noyau complet d'abord: kernel_adapter ne doit pas charger la copie Docker
+DOCKER = Path(__file__).resolve().parents[1] / "LIVRAISON" / "BACKEND_DOCKER_PACK" / "backend"
+sys.path.append(str(DOCKER))
+
+try:
+    from bson import ObjectId
+    from fastapi import HTTPException
+    from mongomock_motor import AsyncMongoMockClient
+    with mock.patch.dict(os.environ, {"MONGO_URL": "mongodb://localhost:27017", "DB_NAME": "test"}):
+        _spec = importlib.util.spec_from_file_location("docker_server", DOCKER / "server.py")
+        server = importlib.util.module_from_spec(_spec)
+        _spec.loader.exec_module(server)
+except ImportError:     # motor / mongomock-motor / emergentintegrations absents: tests ignorés
+    server = None
+
+T0 = datetime(2024, 1, 1, 12, 0, 0)
+
+
+@unittest.skipIf(server is None, "dépendances du pack Docker non installées")
+class ChatHistoryTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.db = AsyncMongoMockClient()["test"]
+        p = mock.patch.object(server, "db", self.db)
+        p.start(); self.addCleanup(p.stop)
+
+    async def _pages(self, sid, limit):
+        out, before = [], None
+        while True:
+            page = await server.chat_history(sid, limit=limit, before=before)
+            self.assertLessEqual(len(page["messages"]), limit)
+            out = page["messages"] + out
+            before = page["next_cursor"]
+            if before is None:
+                return out
+
+    def test_cursor_roundtrip_and_rejects_garbage(self):
+        oid = ObjectId()
+        self.assertEqual(server._decode_cursor(server._encode_cursor({"ts": T0, "_id": oid})), (T0, oid))
+        for bad in ("", "2024-01-01T12:00:00", "2024-01-01T12:00:00|zz", "hier|" + str(oid)):
+            with self.assertRaises(HTTPException) as cm:
+                server._decode_cursor(bad)
+            self.assertEqual(cm.exception.status_code, 400)
+
+    async def test_pages_cover_equal_timestamps_exactly_once(self):
+        # 3 messages au même instant, à cheval sur une limite de page
+        stamps = [T0, T0 + timedelta(seconds=1), T0 + timedelta(seconds=1), T0 + timedelta(seconds=1),
+                  T0 + timedelta(seconds=2), T0 + timedelta(seconds=3), T0 + timedelta(seconds=3)]
+        await self.db[server.MESSAGE_COL].insert_many(
+            [{"session_id": "s", "role": "user", "content": f"m{i}", "ts": ts, "meta": {}} for i, ts in enumerate(stamps)])
+        await self.db[server.MESSAGE_COL].insert_one({"session_id": "autre", "role": "user", "content": "x", "ts": T0})
+        for limit in (1, 2, 3, 7, 50):
+            msgs = await self._pages("s", limit)
+            self.assertEqual([m["content"] for m in msgs], [f"m{i}" for i in range(7)], limit)
+            self.assertNotIn("_id", msgs[0])
+        first = await server.chat_history("s", limit=7)
+        self.assertIsNone(first["next_cursor"])
+
+    async def test_legacy_embedded_messages_are_migrated_once(self):
+        legacy = [{"role": "user", "content": "a", "ts": T0},
+                  {"role": "assistant", "content": "b", "ts": T0 + timedelta(seconds=1), "meta": {"provider": "kernel"}}]
+        await self.db[server.SESSION_COL].insert_one({"session_id": "old", "message_count": 0, "messages": legacy})
+        page = await server.chat_history("old", limit=10)
+        self.assertEqual([(m["role"], m["content"]) for m in page["messages"]], [("user", "a"), ("assistant", "b")])
+        self.assertEqual(page["messages"][1]["meta"], {"provider": "kernel"})
+        sess = await self.db[server.SESSION_COL].find_one({"session_id": "old"})
+        self.assertNotIn("messages", sess)
+        self.assertEqual(sess["message_count"], 2)
+        self.assertEqual(await server.ensure_session("old"), "old")          # déjà migrée: rien à refaire
+        self.assertEqual(await self.db[server.MESSAGE_COL].count_documents({"session_id": "old"}), 2)
+        self.assertEqual((await server.get_history("old"))[-1]["content"], "b")
+
+
+if __name__ == "__main__":
+    unittest.main()
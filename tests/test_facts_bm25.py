@@ -0,0 +1,65 @@
+"""
+FACT-INDEX-BM25: scores BM25 de l'index inversé (conformes au calcul direct), normalisation par
+longueur, poids du titre, termes quasi universels ignorés, indexation incrémentale après insertion.
+"""
+import math
+import unittest
+from unittest import mock
+
+from tests.core_env import load_core, scratch
+
+core = load_core()
+
+
+def _bm25(tf, dl, avgdl, n, df):
+    idf = math.log(1.0 + (n - df + 0.5) / (df + 0.5))
+    return idf * tf * (core.BM25_K1 + 1) / (tf + core.BM25_K1 * (1 - core.BM25_B + core.BM25_B * dl / avgdl))
+
+
+class FactsBm25Test(unittest.TestCase):
+    def setUp(self):
+        p = mock.patch.object(core, "FACTS_DB", scratch("facts") / "facts.db")
+        p.start(); self.addCleanup(p.stop)
+        self.addCleanup(self._reset_conn); self._reset_conn()
+
+    def _reset_conn(self):
+        core._FACTS_TLS.conn = None; core._FACTS_TLS.fidx_ready = False
+
+    def _keys(self, q, k=8):
+        return [it["key"] for _, it in core.facts_search(q, k)]
+
+    def test_scores_match_direct_bm25(self):
+        core.facts_add_many([("patience", "patience patience vertu", {}),
+                             ("sagesse", "patience longue route chemin sagesse profonde", {}),
+                             ("vent", "souffle", {})])
+        # longueurs (clé + valeur, jetons >= 3): 4, 7, 2 → avgdl = 13/3; df(patience) = 2
+        avgdl = 13 / 3
+        got = {it["key"]: sc for sc, it in core.facts_search("patience")}
+        self.assertAlmostEqual(got["patience"], _bm25(3, 4, avgdl, 3, 2), places=3)
+        self.assertAlmostEqual(got["sagesse"], _bm25(1, 7, avgdl, 3, 2), places=3)
+        self.assertEqual(self._keys("patience"), ["patience", "sagesse"])
+
+    def test_shorter_fact_wins_at_equal_tf_and_title_counts_half(self):
+        core.facts_add_many([("a", "lumière", {}),
+                             ("b", "lumière dans une longue phrase sans autre intérêt", {}),
+                             ("c", "rien ici", {"title": "lumière"})])
+        self.assertEqual(self._keys("lumière"), ["a", "b", "c"])
+
+    def test_rare_term_outranks_common_one(self):
+        core.facts_add_many([(f"f{i}", "commun texte", {}) for i in range(6)] + [("rare", "commun exotique", {})])
+        self.assertEqual(self._keys("commun exotique", k=1), ["rare"])
+        # « commun » (df > N/2) est ignoré quand un terme plus rare existe: un seul résultat
+        self.assertEqual(self._keys("commun exotique"), ["rare"])
+
+    def test_new_facts_are_indexed_incrementally(self):
+        core.facts_add_many([("x", "premier fait", {})])
+        self.assertEqual(self._keys("second"), [])
+        core.facts_add_many([("y", "second fait", {}), ("y", "second fait", {})])   # doublon ignoré
+        self.assertEqual(self._keys("second"), ["y"])
+        c = core._facts_conn()
+        self.assertEqual(c.execute("SELECT COUNT(*) FROM fact_doclen").fetchone()[0], 2)
+        self.assertEqual(core._fidx_meta_get(c, "indexed_upto"), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,33 @@
+"""
+HOLO-SEGMENTS: rappel par les index de segments (pas d'index global de l'hologramme),
+y compris après compression d'un segment froid.
+"""
+import unittest
+from unittest import mock
+
+from tests.core_env import load_core, scratch
+
+core = load_core()
+
+
+class HoloSegmentsTest(unittest.TestCase):
+    def setUp(self):
+        self.segs = core.HoloSegments(scratch("holo"))
+
+    def test_recall_ranks_by_overlap_then_age(self):
+        for i, raw in enumerate(["la patience est une vertu", "le vent souffle", "patience et vent"]):
+            self.segs.write({"hid": i, "raw": raw, "summary": ""})
+        self.assertEqual([r["hid"] for r in self.segs.recall("patience vent", k=3)], [2, 0, 1])
+        self.assertEqual([r["hid"] for r in self.segs.recall("absent", k=2)], [0, 1])
+
+    def test_recall_reaches_cold_segments(self):
+        with mock.patch.object(core, "HOLO_SEG_MAX_BYTES", 1), mock.patch.object(core, "HOLO_HOT_SEGMENTS", 1):
+            for i in range(3):
+                self.segs.write({"hid": i, "raw": f"fiche numero{i}", "summary": ""})
+        self.assertIsNotNone(self.segs.cold(1))
+        self.assertEqual([r["hid"] for r in self.segs.recall("numero0", k=1)], [0])
+        self.assertFalse(hasattr(core, "_HOLO_IDX"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+"""
+IdeaGarden: flush qui ne journalise que les fiches modifiées, déclin persisté comme simple
+avancement d'horloge, rattrapage des écritures d'un autre écrivain par la fin du journal.
+"""
+import json
+import unittest
+
+from tests.core_env import load_core, scratch
+
+core = load_core()
+
+
+def _log(store):
+    return [json.loads(ln) for ln in store.log.read_text(encoding="utf-8").splitlines()]
+
+
+class IdeaGardenTest(unittest.TestCase):
+    def setUp(self):
+        self.path = scratch("ideas") / "ideas.json"
+        self.a = core.IdeaGarden(self.path)
+        self.store = self.a.store
+
+    def test_flush_journals_only_touched_ideas(self):
+        self.a.touch(["alpha", "beta"], now=1); self.a.flush()
+        self.a.touch(["beta"], now=2); self.a.flush()
+        last = _log(self.store)[-2:]
+        self.assertEqual(last[0]["p"], ["ideas", "beta"])
+        self.assertEqual(last[0]["v"]["use"], 2)
+        self.assertEqual(last[1], {"op": "set", "p": ["D"], "v": 0})
+
+    def test_decay_is_a_clock_bump_and_dead_ideas_are_deleted(self):
+        self.a.touch(["alpha"], now=1); self.a.flush()
+        n = len(_log(self.store))
+        self.a.decay(4); self.a.flush()
+        self.assertEqual(_log(self.store)[n:], [{"op": "set", "p": ["D"], "v": 4}])
+        self.assertEqual(self.a.peek(1)[0]["vitality"], 6)
+        self.a.decay(6); self.a.flush()
+        self.assertEqual(_log(self.store)[-2:], [{"op": "del", "p": ["ideas", "alpha"]},
+                                                  {"op": "set", "p": ["D"], "v": 10}])
+        self.assertEqual(self.store.state, {"ideas": {}, "D": 10})
+        self.assertEqual(self.a.count(), 0)
+
+    def test_other_writer_is_merged_without_lost_update(self):
+        b = core.IdeaGarden(self.path)
+        self.a.touch(["alpha"], now=1); self.a.flush()
+        b.touch(["alpha", "beta"], now=2); b.flush()               # b en retard: rejeu sur l'état frais
+        self.assertEqual({i["stem"]: i["use"] for i in b.as_list()}, {"alpha": 2, "beta": 1})
+        self.assertEqual({i["stem"]: i["use"] for i in self.a.as_list()}, {"alpha": 2, "beta": 1})
+        self.a.touch(["beta"], now=3); self.a.flush()               # a rattrapé: chemin rapide
+        self.assertEqual(_log(self.store)[-2]["p"], ["ideas", "beta"])
+        self.assertEqual({i["stem"]: (i["use"], i["last"]) for i in b.peek(5)}, {"alpha": (2, 2), "beta": (2, 3)})
+
+    def test_reload_matches_resident_state(self):
+        self.a.touch(["alpha", "beta", "gamma"], now=1); self.a.decay(3)
+        self.a.touch(["gamma"], now=2); self.a.mutate(now=3); self.a.flush()
+        core._LSS.pop(core._lss_key(self.path))                    # relecture depuis le disque
+        fresh = core.IdeaGarden(self.path)
+        by_stem = lambda g: {i["stem"]: i for i in g.as_list()}
+        self.assertEqual(by_stem(fresh), by_stem(self.a))
+        self.assertEqual(fresh.D, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
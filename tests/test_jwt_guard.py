@@ -0,0 +1,109 @@
+"""
+jwt_guard: chemins exemptés (dont /api/metrics selon METRICS_TOKEN), vérification des jetons et
+cache des jetons vérifiés (borné par exp et par JWT_CACHE_TTL, éviction LRU).
+"""
+import importlib
+import os
+import sys
+import time
+import unittest
+from types import SimpleNamespace
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+
+try:
+    import jwt
+    from starlette.requests import Request
+    import jwt_guard
+except ImportError:          # dépendances du backend absentes: tests ignorés
+    jwt_guard = None
+
+
+def _request(path: str, token: str = None) -> "Request":
+    headers = [(b"authorization", f"Bearer {token}".encode())] if token else []
+    return Request({"type": "http", "method": "GET", "scheme": "http", "server": ("test", 80),
+                    "path": path, "query_string": b"", "headers": headers})
+
+
+def _token(**claims) -> str:
+    claims = {"aud": jwt_guard.JWT_AUD, "iss": jwt_guard.JWT_ISS, **claims}
+    return jwt.encode(claims, jwt_guard.JWT_SECRET, algorithm="HS256")
+
+
+SECRET = "s" * 32
+
+
+@unittest.skipIf(jwt_guard is None, "fastapi / PyJWT non installés")
+class MetricsAccessTest(unittest.IsolatedAsyncioTestCase):
+    def _guard(self, metrics_token: str):
+        with mock.patch.dict(os.environ, {"METRICS_TOKEN": metrics_token, "JWT_SECRET": SECRET}):
+            return importlib.reload(jwt_guard)
+
+    def tearDown(self):
+        with mock.patch.dict(os.environ, {"METRICS_TOKEN": "", "JWT_SECRET": SECRET}):
+            importlib.reload(jwt_guard)
+
+    async def test_public_without_metrics_token(self):
+        g = self._guard("")
+        self.assertTrue(await g.verify_request(_request("/api/metrics")))
+        self.assertFalse(await g.verify_request(_request("/api/metricsx")))
+        self.assertFalse(await g.verify_request(_request("/api/chat")))
+
+    async def test_scrape_token_required_when_set(self):
+        g = self._guard("scrape-secret")
+        self.assertFalse(await g.verify_request(_request("/api/metrics")))
+        self.assertFalse(await g.verify_request(_request("/api/metrics", "autre")))
+        self.assertTrue(await g.verify_request(_request("/api/metrics", "scrape-secret")))
+        self.assertTrue(await g.verify_request(_request("/api/metrics", _token())))
+        self.assertFalse(await g.verify_request(_request("/api/chat", "scrape-secret")))
+
+
+@unittest.skipIf(jwt_guard is None, "fastapi / PyJWT non installés")
+class JwtCacheTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.now = time.time()
+        for p in (mock.patch.object(jwt_guard, "JWT_SECRET", SECRET),
+                  mock.patch.object(jwt_guard, "time", SimpleNamespace(time=lambda: self.now))):
+            p.start(); self.addCleanup(p.stop)
+        jwt_guard.cache_clear(); self.addCleanup(jwt_guard.cache_clear)
+        for k in jwt_guard._stats: jwt_guard._stats[k] = 0
+
+    async def _ok(self, token):
+        return await jwt_guard.verify_request(_request("/api/chat", token))
+
+    async def test_hit_until_exp_then_revalidated(self):
+        tok = _token(exp=int(self.now) + 100)
+        self.assertTrue(await self._ok(tok))
+        self.assertTrue(await self._ok(tok))
+        self.assertEqual((jwt_guard._stats["misses"], jwt_guard._stats["hits"]), (1, 1))
+        self.now += 101                         # exp dépassé pour le cache (PyJWT suit l'horloge réelle)
+        await self._ok(tok)
+        self.assertEqual((jwt_guard._stats["expired"], jwt_guard._stats["misses"]), (1, 2))
+        self.assertEqual(jwt_guard.cache_stats()["size"], 0)   # exp passé: pas remis en cache
+
+    async def test_ttl_caps_tokens_without_exp(self):
+        tok = _token()
+        self.assertTrue(await self._ok(tok))
+        self.now += jwt_guard.JWT_CACHE_TTL - 1
+        self.assertTrue(await self._ok(tok))
+        self.now += 2
+        self.assertTrue(await self._ok(tok))
+        self.assertEqual((jwt_guard._stats["hits"], jwt_guard._stats["misses"], jwt_guard._stats["expired"]), (1, 2, 1))
+
+    async def test_lru_eviction_and_rejected_tokens_not_cached(self):
+        with mock.patch.object(jwt_guard, "JWT_CACHE_SIZE", 2):
+            a, b, c = _token(sub="a"), _token(sub="b"), _token(sub="c")
+            for t in (a, b, a, c):
+                self.assertTrue(await self._ok(t))
+            self.assertEqual(jwt_guard._stats["evictions"], 1)
+            self.assertTrue(await self._ok(a))              # a rafraîchi avant c: b évincé
+            self.assertEqual(jwt_guard._stats["hits"], 2)
+            self.assertFalse(await self._ok("pas-un-jwt"))
+            self.assertFalse(await self._ok(jwt.encode({"aud": "autre"}, SECRET, algorithm="HS256")))
+            self.assertEqual(jwt_guard.cache_stats()["size"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+"""
+KCACHE: le cache ne garde que le corps des réponses; les pieds de page propres à la requête
+(provenance, miroir, cachets KernelPrimus) sont recalculés à chaque hit.
+"""
+import json
+import unittest
+from unittest import mock
+
+from tests.core_env import load_core, scratch
+
+core = load_core()
+import kernel_adapter  # noqa: E402  (après load_core: sys.path et répertoire de travail)
+
+
+class SplitTest(unittest.TestCase):
+    def test_footers_in_order(self):
+        self.assertEqual(core.kcache_split("corps\n[Confiance] 0.9\n[Prov] f=a in=b out=c e=9 [Mirror:2]"),
+                         ("corps\n[Confiance] 0.9", ["prov", "mirror"]))
+        self.assertEqual(core.kcache_split("x [KP:OK]\n[KernelPrimus] fp=1"), ("x", ["kp", "kprimus"]))
+        self.assertEqual(core.kcache_split("sans pied [Prov] au milieu"), ("sans pied [Prov] au milieu", []))
+
+    def test_footers_rebuilt_from_body(self):
+        with mock.patch.object(core, "_kp_fingerprint", return_value="neuf"):
+            self.assertEqual(core.kcache_footers("q", "x", ["kp", "kprimus"]), " [KP:court]\n[KernelPrimus] fp=neuf")
+        self.assertEqual(core.kcache_footers("q", "x", []), "")
+
+
+class CachedAnswerTest(unittest.TestCase):
+    def setUp(self):
+        self.cache = core.KernelCache(size=8, disk=True, folder=scratch("kcache"))
+        patches = [mock.patch.object(core, "KCACHE", self.cache), mock.patch.object(core, "KCACHE_ENABLED", True),
+                   mock.patch.object(kernel_adapter, "KCACHE", self.cache), mock.patch.object(kernel_adapter, "KCACHE_ENABLED", True),
+                   mock.patch.object(core, "kcache_charge", return_value=None),
+                   mock.patch.object(kernel_adapter, "kcache_charge", return_value=None)]
+        for p in patches:
+            p.start(); self.addCleanup(p.stop)
+        core.state_put(core.ROOT / "ratelimit.json", {"win": 0, "count": 0})
+        core.EnergyBank().charge(100)
+
+    def test_stream_hit_recomputes_footer(self):
+        with mock.patch.object(core, "_kp_fingerprint", return_value="avant"):
+            miss = list(core.kernel_stream_cached("la patience", use_dream=False, rag_k=0))
+        self.assertTrue(miss[-1]["text"].endswith("fp=avant"))
+        ent, = self.cache.mem.values()
+        self.assertEqual(ent["tail"], ["kp", "kprimus"])
+        self.assertNotIn("KernelPrimus", ent["body"])
+        with mock.patch.object(core, "_kp_fingerprint", return_value="apres"):
+            hit = list(core.kernel_stream_cached("la patience", use_dream=False, rag_k=0))
+        self.assertEqual([c["stage"] for c in hit], ["cached", "footer"])
+        self.assertEqual(hit[0]["text"], ent["body"])
+        self.assertTrue(hit[1]["text"].endswith("fp=apres"))
+
+    def test_adapter_hit_gets_fresh_provenance(self):
+        q = "résume: la patience est une vertu."
+        out, hit = kernel_adapter.run_kernel_cached("kc", q)
+        self.assertFalse(hit)
+        body, tail = core.kcache_split(out)
+        self.assertIn("prov", tail)
+        with mock.patch.object(core, "_code_fingerprint", return_value="f" * 16):
+            again, hit = kernel_adapter.run_kernel_cached("kc", q)
+        self.assertTrue(hit)
+        self.assertTrue(again.startswith(body))
+        self.assertIn("[Prov] f=" + "f" * 16, again)
+        self.assertTrue(core.prov_last().get("cached"))
+
+    def test_disk_entry_without_tail_is_a_miss(self):
+        self.cache.put("k", "corps [KP:OK]")
+        self.assertEqual(json.loads(self.cache._file("k").read_text(encoding="utf-8")), {"body": "corps", "tail": ["kp"]})
+        self.cache._file("old").parent.mkdir(parents=True, exist_ok=True)
+        self.cache._file("old").write_text(json.dumps({"out": "ancien [KP:OK]"}), encoding="utf-8")
+        self.cache.clear()
+        self.assertEqual(self.cache.get("k"), {"body": "corps", "tail": ["kp"]})
+        self.assertIsNone(self.cache.get("old"))
+
+
+if __name__ == "__main__":
+    unittest.main()
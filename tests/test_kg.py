@@ -0,0 +1,42 @@
+"""
+KG-INDEX: voisins directs filtrés par sens, k sauts plafonnés au total (`limit`), chemin le plus court.
+"""
+import unittest
+
+from tests.core_env import load_core, scratch
+
+core = load_core()
+
+
+class KnowledgeGraphTest(unittest.TestCase):
+    def setUp(self):
+        self.kg = core.KnowledgeGraph(path=scratch("kg") / "kg.json")
+        for s, r, d in [("a", "cause", "b"), ("a", "cause", "c"), ("b", "cause", "d"),
+                        ("c", "cause", "e"), ("x", "voit", "a")]:
+            self.kg.add(s, r, d)
+
+    def test_neighbors_respects_direction(self):
+        both = self.kg.neighbors("a")
+        self.assertEqual(sorted(both["out"]), ["a -cause→ b", "a -cause→ c"])
+        self.assertEqual(both["in"], ["x -voit→ a"])
+        self.assertEqual(self.kg.neighbors("a", direction="in"), {"in": ["x -voit→ a"]})
+        self.assertNotIn("in", self.kg.neighbors("a", direction="out"))
+
+    def test_khop_limit_caps_total_across_levels(self):
+        full = self.kg.khop("a", depth=2)
+        self.assertEqual([sorted(l) for l in full["levels"]], [["b", "c"], ["d", "e"]])
+        self.assertFalse(full["truncated"])
+        capped = self.kg.khop("a", depth=2, limit=3)
+        self.assertEqual(capped["count"], 3)
+        self.assertEqual(sum(len(l) for l in capped["levels"]), 3)
+        self.assertTrue(capped["truncated"])
+        self.assertFalse(self.kg.khop("a", depth=2, limit=4)["truncated"])
+
+    def test_path_between(self):
+        self.assertEqual(self.kg.path_between("x", "d")["steps"], ["x -voit→ a", "a -cause→ b", "b -cause→ d"])
+        self.assertFalse(self.kg.path_between("d", "x")["ok"])
+        self.assertTrue(self.kg.path_between("d", "x", direction="both")["ok"])
+
+
+if __name__ == "__main__":
+    unittest.main()
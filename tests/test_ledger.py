@@ -0,0 +1,82 @@
+"""
+LEDGER-TAIL: points de contrôle signés HMAC (falsifiés ou d'une autre clé ignorés), vérification
+incrémentale depuis le dernier point valide, queue perdue ou en retard reconstruite, fin tronquée.
+"""
+import json
+import os
+import unittest
+from unittest import mock
+
+from tests.core_env import load_core, scratch
+
+core = load_core()
+
+
+class LedgerTest(unittest.TestCase):
+    def setUp(self):
+        d = scratch("ledger")
+        ledger = d / "ledger.jsonl"
+        patches = [mock.patch.object(core, "LEDGER", ledger),
+                   mock.patch.object(core, "LEDGER_TAIL", ledger.with_suffix(".tail.json")),
+                   mock.patch.object(core, "LEDGER_CKPT", ledger.with_suffix(".ckpt.jsonl")),
+                   mock.patch.object(core, "LEDGER_KEY_FILE", d / "ledger.key"),
+                   mock.patch.object(core, "LEDGER_CKPT_EVERY", 10),
+                   mock.patch.dict(os.environ, {"ALSADIKA_LEDGER_KEY": "cle-de-test"})]
+        for p in patches:
+            p.start(); self.addCleanup(p.stop)
+
+    def _log(self, n, start=0):
+        for i in range(start, start + n):
+            core.ledger_log(f"e{i:02d}")
+
+    def _rewrite(self, i, old, new):
+        lines = core.LEDGER.read_bytes().splitlines(keepends=True)
+        lines[i] = lines[i].replace(old, new)
+        core.LEDGER.write_bytes(b"".join(lines))
+
+    def test_incremental_verify_starts_at_last_checkpoint(self):
+        self._log(25)
+        self.assertEqual([c["count"] for c in core._ledger_checkpoints()], [10, 20])
+        self.assertEqual(core.ledger_verify(), {"ok": True, "count": 25, "from_checkpoint": 20})
+        self.assertEqual(core.ledger_verify(full=True), {"ok": True, "count": 25})
+
+    def test_tampering_is_detected(self):
+        self._log(25)
+        self._rewrite(22, b"e22", b"x22")                       # après le dernier point de contrôle
+        self.assertEqual(core.ledger_verify(), {"ok": False, "at": 22})
+        self._rewrite(22, b"x22", b"e22")
+        self._rewrite(3, b"e03", b"x03")                        # couvert par un point de contrôle
+        self.assertEqual(core.ledger_verify(full=True), {"ok": False, "at": 3})
+
+    def test_forged_or_foreign_checkpoints_are_ignored(self):
+        self._log(15)
+        c = dict(core._ledger_checkpoints()[-1], count=14, sig="0" * 64)
+        with core.LEDGER_CKPT.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(c) + "\n")
+        self.assertEqual([c["count"] for c in core._ledger_checkpoints()], [10])
+        with mock.patch.dict(os.environ, {"ALSADIKA_LEDGER_KEY": "autre-cle"}):
+            self.assertEqual(core._ledger_checkpoints(), [])
+            self.assertEqual(core.ledger_verify(), {"ok": True, "count": 15})   # depuis GENESIS
+
+    def test_lost_or_stale_tail_is_rebuilt(self):
+        self._log(12)
+        stale = core.LEDGER_TAIL.read_text(encoding="utf-8")
+        self._log(3, start=12)
+        core.LEDGER_TAIL.write_text(stale, encoding="utf-8")    # queue en retard de 3 lignes
+        self._log(1, start=15)
+        core.LEDGER_TAIL.unlink()                               # queue perdue: reprise au point de contrôle
+        self._log(1, start=16)
+        self.assertEqual(json.loads(core.LEDGER_TAIL.read_text(encoding="utf-8"))["count"], 17)
+        self.assertEqual(core.ledger_verify(full=True), {"ok": True, "count": 17})
+
+    def test_torn_tail_is_reported(self):
+        self._log(5)
+        with open(core.LEDGER, "ab") as f:
+            f.write(b'{"event": "coup')
+        res = core.ledger_verify()
+        self.assertFalse(res["ok"])
+        self.assertEqual((res["at"], res["torn_tail"]), (5, True))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+"""
+llm_client: découpage des lignes SSE (_parse_line) et flux astream_chat contre un amont local factice
+(serveur HTTP/1.1 keep-alive dans un thread): fragments reçus dans l'ordre, connexion réutilisée.
+"""
+import json
+import sys
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+
+try:
+    import httpx  # noqa: F401
+    import llm_client
+except ImportError:          # dépendance du backend absente: tests ignorés
+    llm_client = None
+
+
+def _sse(*deltas, done=True) -> bytes:
+    lines = [": keep-alive", "event: ping"]
+    for d in deltas:
+        lines.append("data: " + json.dumps({"choices": [{"delta": {"content": d}}]}))
+    lines.append("data: {pas du json")
+    if done:
+        lines.append("data: [DONE]")
+        lines.append("data: " + json.dumps({"choices": [{"delta": {"content": "après la fin"}}]}))
+    return ("\n\n".join(lines) + "\n\n").encode("utf-8")
+
+
+class _Upstream(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"          # keep-alive: une connexion peut servir plusieurs requêtes
+    connections = 0
+    requests = []
+
+    def setup(self):
+        super().setup()
+        type(self).connections += 1
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        type(self).requests.append((self.path, self.headers.get("Authorization"), body))
+        data = _sse("Sa", "lam", "", " !")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@unittest.skipIf(llm_client is None, "httpx non installé")
+class ParseLineTest(unittest.TestCase):
+    def test_delta(self):
+        line = "data: " + json.dumps({"choices": [{"delta": {"content": "bonjour"}}]})
+        self.assertEqual(llm_client._parse_line(line), "bonjour")
+        self.assertEqual(llm_client._parse_line(line.encode("utf-8")), "bonjour")
+
+    def test_done(self):
+        self.assertIs(llm_client._parse_line("data: [DONE]"), llm_client._DONE)
+        self.assertIs(llm_client._parse_line(b"data: [DONE] "), llm_client._DONE)
+
+    def test_ignored(self):
+        for line in ("", ": keep-alive", "event: ping", "data: {pas du json",
+                     "data: " + json.dumps({"choices": [{"delta": {}}]}),
+                     "data: " + json.dumps({"choices": [{"delta": {"content": None}}]})):
+            self.assertEqual(llm_client._parse_line(line), "", line)
+
+
+@unittest.skipIf(llm_client is None, "httpx non installé")
+class AStreamChatTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        _Upstream.connections, _Upstream.requests = 0, []
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _Upstream)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.saved = llm_client.BASE, llm_client.OPENROUTER_API_KEY
+        llm_client.BASE = f"http://127.0.0.1:{self.server.server_address[1]}/api/v1"
+        llm_client.OPENROUTER_API_KEY = "test-key"
+
+    async def asyncTearDown(self):
+        await llm_client.aclose_client()
+
+    def tearDown(self):
+        llm_client.BASE, llm_client.OPENROUTER_API_KEY = self.saved
+        self.server.shutdown()
+        self.server.server_close()
+
+    async def _collect(self, model=None):
+        return [d async for d in llm_client.astream_chat([{"role": "user", "content": "salut"}], model=model)]
+
+    async def test_chunks_and_pool_reuse(self):
+        self.assertEqual(await self._collect(), ["Sa", "lam", " !"])
+        self.assertEqual(await self._collect(model="autre/modele"), ["Sa", "lam", " !"])
+        self.assertEqual(_Upstream.connections, 1)          # 2e tour servi par la connexion du pool
+
+        path, auth, body = _Upstream.requests[0]
+        self.assertEqual(path, "/api/v1/chat/completions")
+        self.assertEqual(auth, "Bearer test-key")
+        self.assertEqual(body["model"], llm_client.MODEL)
+        self.assertTrue(body["stream"])
+        self.assertEqual(_Upstream.requests[1][2]["model"], "autre/modele")
+
+
+if __name__ == "__main__":
+    unittest.main()
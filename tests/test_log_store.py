@@ -0,0 +1,79 @@
+"""
+LOG-STORE: rejeu du journal au chargement (ligne partielle ignorée), compaction (instantané +
+troncature, automatique au-delà du seuil), rejeu idempotent sur un instantané plus récent,
+diff état → opérations et suivi d'un autre écrivain.
+"""
+import json
+import unittest
+from unittest import mock
+
+from tests.core_env import load_core, scratch
+
+core = load_core()
+
+
+class LogStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.path = scratch("lss") / "etat.json"
+        self.st = core.LogStore(self.path, {"items": [], "meta": {}})
+
+    def _fresh(self):
+        return core.LogStore(self.path, {"items": [], "meta": {}})
+
+    def test_reload_replays_log_and_skips_partial_line(self):
+        self.st.commit([{"op": "ext", "p": ["items"], "at": 0, "v": [1, 2]},
+                        {"op": "set", "p": ["meta", "n"], "v": 2}])
+        self.st.set(["items", 1], 20)
+        self.st.delete(["meta", "n"])
+        with open(self.st.log, "ab") as f:
+            f.write(b'{"op": "set", "p": ["meta", "x"], "v"')           # écriture interrompue
+        fresh = self._fresh()
+        self.assertEqual(fresh.state, {"items": [1, 20], "meta": {}})
+        self.assertEqual(fresh.ops, 4)
+        self.assertFalse(self.path.exists())                              # rien compacté encore
+
+    def test_compact_writes_snapshot_and_truncates_log(self):
+        self.st.extend(["items"], 0, ["a", "b"])
+        self.st.compact()
+        self.assertEqual(json.loads(self.path.read_text(encoding="utf-8")), {"items": ["a", "b"], "meta": {}})
+        self.assertEqual(self.st.log.stat().st_size, 0)
+        self.assertEqual((self.st.ops, self.st._off), (0, 0))
+        self.assertEqual(self._fresh().state, self.st.state)
+
+    def test_replay_over_newer_snapshot_is_idempotent(self):
+        self.st.extend(["items"], 0, ["a"])
+        self.st.set(["meta", "v"], 1)
+        pending = self.st.log.read_bytes()
+        self.st.compact()
+        self.st.log.write_bytes(pending)                  # crash entre os.replace et la troncature
+        self.assertEqual(self._fresh().state, {"items": ["a"], "meta": {"v": 1}})
+
+    def test_auto_compaction_after_threshold(self):
+        with mock.patch.object(core, "LSS_COMPACT_OPS", 5):
+            for i in range(5):
+                self.st.set(["meta", f"k{i}"], "x" * 20)
+        self.assertTrue(self.path.exists())
+        self.assertEqual(self.st.ops, 0)
+        self.assertEqual(len(self._fresh().state["meta"]), 5)
+
+    def test_save_state_journals_minimal_diff(self):
+        self.st.save_state({"items": [1, 2, 3], "meta": {"a": {"b": 1}}})
+        n = self.st._off
+        self.st.save_state({"items": [1, 2, 3, 4], "meta": {"a": {"b": 2}}})
+        tail = [json.loads(ln) for ln in self.st.log.read_bytes()[n:].splitlines()]
+        self.assertEqual(tail, [{"op": "ext", "p": ["items"], "at": 3, "v": [4]},
+                                {"op": "set", "p": ["meta", "a", "b"], "v": 2}])
+        self.assertEqual(self._fresh().state, {"items": [1, 2, 3, 4], "meta": {"a": {"b": 2}}})
+
+    def test_refresh_follows_other_writer(self):
+        other = self._fresh()
+        other.set(["meta", "de"], "autre")
+        self.st.refresh()
+        self.assertEqual(self.st.state["meta"], {"de": "autre"})
+        other.compact()                                   # instantané remplacé → rechargement
+        other.set(["meta", "apres"], 1)
+        self.assertEqual(self.st.snapshot_copy()["meta"], {"de": "autre", "apres": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
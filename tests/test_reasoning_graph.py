@@ -0,0 +1,62 @@
+"""
+HAKIM-INDEX: fermeture avant par comptage des prémisses (chaînes, conjonctions, cycles),
+invalidation du cache à chaque ajout, preuve ordonnée ou impasses, relecture depuis le journal.
+"""
+import unittest
+
+from tests.core_env import load_core, scratch
+
+core = load_core()
+
+
+class ReasoningGraphTest(unittest.TestCase):
+    def setUp(self):
+        self.path = scratch("rg") / "rg.json"
+        self.rg = core.ReasoningGraph(path=self.path)
+
+    def test_closure_follows_chains_and_conjunctions(self):
+        for r in ("A & B -> C", "C -> D", "D & E -> F", "X -> Y"):
+            self.rg.add_rule(r)
+        self.rg.add_fact("A"); self.rg.add_fact("B")
+        self.assertEqual(self.rg.derived(), ["A", "B", "C", "D"])
+        self.rg.add_fact("E")                                       # cache invalidé par l'ajout
+        self.assertEqual(self.rg.derived(), ["A", "B", "C", "D", "E", "F"])
+
+    def test_cycle_without_base_fact_derives_nothing(self):
+        self.rg.add_rule("P -> Q"); self.rg.add_rule("Q -> P")
+        self.assertEqual(self.rg.derived(), [])
+        self.assertFalse(self.rg.plan("P")["ok"])
+        self.rg.add_fact("Q")
+        self.assertEqual(self.rg.derived(), ["P", "Q"])
+
+    def test_plan_lists_proof_bottom_up(self):
+        self.rg.add_rule("A & B -> C"); self.rg.add_rule("C -> D")
+        self.rg.add_fact("A"); self.rg.add_fact("B")
+        res = self.rg.plan("D")
+        self.assertTrue(res["ok"])
+        self.assertEqual(res["steps"][-2:], ["Règle: A & B -> C", "Règle: C -> D"])
+        self.assertEqual(sorted(res["steps"][:2]), ["OK: A (fait)", "OK: B (fait)"])
+        self.assertEqual(res["derived"], 4)
+
+    def test_plan_reports_missing_premises(self):
+        self.rg.add_rule("A & B -> C"); self.rg.add_fact("A")
+        res = self.rg.plan("C")
+        self.assertFalse(res["ok"])
+        self.assertEqual(res["steps"], ["Règle: A & B -> C (manque: B)", "IMPASSE: B (aucune règle, pas dans les faits)"])
+
+    def test_duplicates_and_invalid_rules(self):
+        self.rg.add_fact("A"); self.rg.add_fact("A")
+        self.rg.add_rule("A  ->  B"); self.rg.add_rule("A -> B")
+        self.assertEqual((self.rg.data["facts"], self.rg.data["rules"]), (["A"], ["A -> B"]))
+        with self.assertRaises(ValueError):
+            self.rg.add_rule("A => B")
+
+    def test_reload_from_log_rebuilds_index(self):
+        self.rg.add_rule("A -> B"); self.rg.add_fact("A")
+        key = core._lss_key(self.path)
+        core._LSS.pop(key); core._RG_IDX.pop(key)
+        self.assertEqual(core.ReasoningGraph(path=self.path).derived(), ["A", "B"])
+
+
+if __name__ == "__main__":
+    unittest.main()
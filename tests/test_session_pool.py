@@ -0,0 +1,56 @@
+"""
+kernel_adapter.SessionPool: LRU borné, expiration par inactivité, composants partagés entre
+sessions et rafraîchis après invalidation, état propre à la session conservé.
+"""
+import unittest
+from unittest import mock
+
+from tests.core_env import load_core
+
+load_core()
+import kernel_adapter  # noqa: E402  (après load_core: sys.path et répertoire de travail)
+
+
+class SessionPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        p = mock.patch.object(kernel_adapter.time, "monotonic", lambda: self.now)
+        p.start(); self.addCleanup(p.stop)
+        self.pool = kernel_adapter.SessionPool(max_size=2, ttl=60)
+
+    def test_lru_evicts_least_recently_used(self):
+        a = self.pool.get("a"); self.pool.get("b")
+        self.assertIs(self.pool.get("a"), a)                   # "a" redevient le plus récent
+        self.pool.get("c")
+        st = self.pool.stats()
+        self.assertEqual((st["size"], st["hits"], st["misses"], st["evicted_lru"]), (2, 1, 3, 1))
+        self.assertIs(self.pool.get("a"), a)
+        self.assertFalse(self.pool.drop("b"))                  # évincée
+        self.assertTrue(self.pool.drop("c"))
+
+    def test_idle_sessions_expire(self):
+        a = self.pool.get("a")
+        self.now += 30; b = self.pool.get("b")
+        self.now += 40                                          # a: 70 s d'inactivité, b: 40 s
+        self.assertEqual(self.pool.stats()["size"], 1)
+        self.assertIs(self.pool.get("b"), b)
+        self.assertIsNot(self.pool.get("a"), a)
+        st = self.pool.stats()
+        self.assertEqual((st["evicted_ttl"], st["hits"], st["misses"]), (1, 1, 3))
+
+    def test_shared_parts_and_per_session_state(self):
+        a, b = self.pool.get("a"), self.pool.get("b", mode="private")
+        self.assertIs(a.memory, b.memory)
+        self.assertEqual((a.mode, b.mode), ("public", "private"))
+        a.council_n = 3
+        self.assertEqual(self.pool.get("a", mode="private").council_n, 3)
+        self.assertEqual(a.mode, "private")
+        old = a.memory
+        kernel_adapter._shared.invalidate()
+        self.assertIsNot(self.pool.get("a").memory, old)       # composants rechargés au prochain accès
+        self.assertIs(self.pool.get("a").memory, self.pool.get("b").memory)
+        self.assertGreater(self.pool.stats()["bytes"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,163 @@
+"""
+singleflight: un seul travail pour des requêtes identiques concurrentes (threads et asyncio),
+relecture puis diffusion des fragments aux doublons, repli autonome (refus, erreur, attente
+dépassée), reprise par un thread quand le meneur part, annulation quand le dernier abonné part.
+"""
+import asyncio
+import sys
+import threading
+import time
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+
+import singleflight  # noqa: E402
+
+
+def _wait_for(cond, timeout=5.0):
+    end = time.monotonic() + timeout
+    while not cond():
+        if time.monotonic() > end:
+            raise AssertionError("condition jamais atteinte")
+        time.sleep(0.005)
+
+
+class _Producer:
+    """produce() comptant ses appels; le premier s'arrête entre « a » et « b » jusqu'à go."""
+
+    def __init__(self, first="a", fail_after=None):
+        self.calls = 0
+        self.go = threading.Event()
+        self.first, self.fail_after = first, fail_after
+
+    def __call__(self):
+        self.calls += 1
+        n = self.calls
+        def gen():
+            if n == 1 and self.fail_after == 0:
+                self.go.wait(5); raise ValueError("amont")
+            yield self.first
+            if n == 1:
+                self.go.wait(5)
+                if self.fail_after == 1: raise ValueError("amont")
+            yield "b"
+        return gen()
+
+
+class SingleFlightTest(unittest.TestCase):
+    def setUp(self):
+        self.sf = singleflight.SingleFlight("test", wait=5, enabled=True)
+        self.addCleanup(singleflight.FLIGHTS.remove, self.sf)
+
+    def _follow(self, prod, out, **kw):
+        def run():
+            try: out.extend(self.sf.stream("k", prod, mark=lambda c: c.upper(), **kw))
+            except Exception as e: out.append(e)
+        t = threading.Thread(target=run); t.start()
+        _wait_for(lambda: self.sf.stats()["joined"] == 1)
+        return t
+
+    def test_duplicate_shares_leader_stream(self):
+        prod, out = _Producer(), []
+        lead = self.sf.stream("k", prod)
+        self.assertEqual(next(lead), "a")
+        t = self._follow(prod, out)
+        prod.go.set()
+        self.assertEqual(list(lead), ["b"])
+        t.join(5)
+        self.assertEqual((out, prod.calls), (["A", "B"], 1))
+        self.assertEqual(self.sf.stats(), {"leader": 1, "joined": 1, "fallback": 0, "inflight": 0})
+
+    def test_unshareable_first_chunk_runs_alone(self):
+        prod, out = _Producer(first="refus"), []
+        lead = self.sf.stream("k", prod)
+        next(lead)
+        t = self._follow(prod, out, shareable=lambda c: c != "refus")
+        t.join(5)
+        self.assertEqual((out, prod.calls), (["refus", "b"], 2))
+        prod.go.set(); list(lead)
+        self.assertEqual(self.sf.stats()["fallback"], 1)
+
+    def _lead_in_thread(self, prod):
+        t = threading.Thread(target=lambda: self._drain_lead(prod)); t.start()
+        _wait_for(lambda: prod.calls == 1)
+        return t
+
+    def _drain_lead(self, prod):
+        try: return list(self.sf.stream("k", prod))
+        except ValueError as e: return e
+
+    def test_leader_error_before_first_chunk_falls_back(self):
+        prod, out = _Producer(fail_after=0), []
+        lt = self._lead_in_thread(prod)
+        t = self._follow(prod, out)
+        prod.go.set(); lt.join(5); t.join(5)
+        self.assertEqual((out, prod.calls), (["a", "b"], 2))
+
+    def test_leader_error_after_first_chunk_reaches_follower(self):
+        prod, out = _Producer(fail_after=1), []
+        lt = self._lead_in_thread(prod)
+        _wait_for(lambda: self.sf._flights["k"].chunks)
+        t = self._follow(prod, out)
+        prod.go.set(); lt.join(5); t.join(5)
+        self.assertEqual(out[0], "A")
+        self.assertIsInstance(out[1], ValueError)
+        self.assertEqual(prod.calls, 1)
+
+    def test_leader_leaving_hands_stream_to_drain_thread(self):
+        prod, out = _Producer(), []
+        lead = self.sf.stream("k", prod)
+        next(lead)
+        t = self._follow(prod, out)
+        lead.close()                                             # client du meneur parti
+        prod.go.set(); t.join(5)
+        self.assertEqual((out, prod.calls), (["A", "B"], 1))
+
+    def test_wait_timeout_falls_back(self):
+        self.sf.wait = 0.05
+        prod = _Producer(fail_after=0)                           # le meneur ne produit rien à temps
+        lt = self._lead_in_thread(prod)
+        out = list(self.sf.stream("k", prod))
+        self.assertEqual((out, prod.calls, self.sf.stats()["fallback"]), (["a", "b"], 2, 1))
+        prod.go.set(); lt.join(5)
+
+
+class AsyncSingleFlightTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.sf = singleflight.AsyncSingleFlight("test-async", wait=5, enabled=True)
+        self.addCleanup(singleflight.FLIGHTS.remove, self.sf)
+        self.calls, self.cancelled = 0, False
+
+    def produce(self):
+        self.calls += 1
+        async def gen():
+            try:
+                for ch in ("a", "b", "c"):
+                    yield ch
+                    await asyncio.sleep(0.01)
+            except asyncio.CancelledError:
+                self.cancelled = True; raise
+        return gen()
+
+    async def _collect(self, **kw):
+        return [ch async for ch in self.sf.stream("k", self.produce, **kw)]
+
+    async def test_concurrent_callers_share_one_producer(self):
+        a, b = await asyncio.gather(self._collect(), self._collect(mark=lambda c: c + "*"))
+        self.assertEqual((a, b, self.calls), (["a", "b", "c"], ["a*", "b*", "c*"], 1))
+        self.assertEqual(self.sf.stats(), {"leader": 1, "joined": 1, "fallback": 0, "inflight": 0})
+
+    async def test_last_subscriber_leaving_cancels_producer(self):
+        it = self.sf.stream("k", self.produce)
+        self.assertEqual(await it.__anext__(), "a")
+        await it.aclose()
+        await asyncio.sleep(0.05)
+        self.assertTrue(self.cancelled)
+        self.assertEqual(self.sf.stats()["inflight"], 0)
+        self.assertEqual(await self._collect(), ["a", "b", "c"])   # nouvelle tentative: nouveau meneur
+        self.assertEqual(self.calls, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+"""
+SOLVER-COMPILED: mêmes solutions qu'une énumération brute (MRV + forward checking + AC-3),
+contraintes compilées sans eval (nœuds hors liste blanche refusés), bornes et cas dégénérés.
+"""
+import itertools
+import random
+import unittest
+
+from tests.core_env import load_core
+
+core = load_core()
+
+
+def _brute(doms, constraints):
+    names = list(doms)
+    out = []
+    for vals in itertools.product(*(list(dict.fromkeys(doms[n])) for n in names)):
+        a = dict(zip(names, vals))
+        if all(core._compile_constraint(c)[1](a) for c in constraints):
+            out.append(a)
+    return out
+
+
+def _key(sols):
+    return sorted(tuple(sorted(s.items())) for s in sols)
+
+
+class SolverTest(unittest.TestCase):
+    def test_matches_brute_force(self):
+        cases = [
+            ({"x": range(1, 6), "y": range(1, 6), "z": range(1, 6)}, ["x < y", "y < z"]),
+            ({"a": range(0, 8), "b": range(0, 8)}, ["a + b == 7", "a % 2 == 0"]),
+            ({"p": range(-3, 4), "q": range(-3, 4), "r": range(0, 3)}, ["p * q > r", "p != q or r == 0"]),
+            ({"x": range(0, 5), "y": range(0, 5), "z": range(0, 5)}, ["x + y + z == 6", "x <= y <= z"]),
+            ({"x": [1, 1, 2], "y": [2, 3]}, ["y // x >= 1"]),
+        ]
+        rnd = random.Random(7)
+        for _ in range(20):
+            doms = {v: rnd.sample(range(-4, 6), rnd.randint(1, 6)) for v in "abcd"}
+            cons = [f"{u} {rnd.choice(['<', '<=', '!=', '=='])} {v} + {rnd.randint(-2, 2)}"
+                    for u, v in rnd.sample(list(itertools.combinations("abcd", 2)), 3)]
+            cases.append((doms, cons))
+        for doms, cons in cases:
+            doms = {k: list(v) for k, v in doms.items()}
+            self.assertEqual(_key(core._sat_solve(doms, cons)), _key(_brute(doms, cons)), (doms, cons))
+
+    def test_ac3_detects_cycle_inconsistency(self):
+        big = list(range(60))
+        self.assertEqual(core._sat_solve({"x": big, "y": big, "z": big}, ["x < y", "y < z", "z < x"]), [])
+
+    def test_unary_constant_and_error_constraints(self):
+        self.assertEqual(core._sat_solve({"x": [0, 1, 2]}, ["x > 5"]), [])
+        self.assertEqual(core._sat_solve({"x": [0, 1]}, ["1 > 2"]), [])
+        self.assertEqual(core._sat_solve({"x": [0, 1, 2]}, ["6 / x == 3"]), [{"x": 2}])   # 6/0 → faux
+
+    def test_limit_and_validation(self):
+        d = list(range(10))
+        self.assertEqual(len(core._sat_solve({"x": d, "y": d}, ["x != y"], limit=7)), 7)
+        with self.assertRaises(ValueError):
+            core._sat_solve({"x": d}, ["x < y"])
+        for bad in ("__import__('os')", "x.real > 0", "[x][0] == 1", "x if x else 1"):
+            with self.assertRaises(ValueError):
+                core._sat_solve({"x": d}, [bad])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+"""
+STATE-BACKEND (SQLite WAL): transactions (commit, discard, rollback sur exception), compteur de débit
+atomique sous le handle de base, miroir JSON recopié aux points de contrôle seulement.
+"""
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+from tests.core_env import BACKEND, load_core, scratch
+
+core = load_core()
+
+# écrivain concurrent: processus séparé, même répertoire de travail (même ROOT)
+_BUMP = """
+import sys; sys.path.insert(0, sys.argv[1])
+import al_sadika_core_v2 as c
+st = c.SqliteStateBackend(sys.argv[2], mirror="off")
+for _ in range(int(sys.argv[4])):
+    with st.txn(sys.argv[3], dict) as t:
+        t.data["n"] = t.data.get("n", 0) + 1
+"""
+
+
+class SqliteStateTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = scratch("state")
+        self.st = core.SqliteStateBackend(self.dir / "state.db", mirror="checkpoint")
+        self.p = core.ROOT / self.dir.name / "k.json"          # clé = chemin relatif à ROOT
+
+    def tearDown(self):
+        core._STATE_TLS.conn = None
+
+    def test_txn_commit_discard_and_rollback(self):
+        with self.st.txn(self.p, dict) as t:
+            t.data["a"] = 1
+        with self.st.txn(self.p, dict) as t:
+            t.data["a"] = 2; t.discard()
+        with self.assertRaises(RuntimeError):
+            with self.st.txn(self.p, dict) as t:
+                t.data["a"] = 3
+                raise RuntimeError("abandon")
+        self.assertEqual(self.st.get(self.p), {"a": 1})
+        self.assertEqual(self.st.version(self.p), "1")
+
+    def test_nested_txn_joins_outer_transaction(self):
+        q = self.p.with_name("q.json")
+        with self.assertRaises(RuntimeError):
+            with self.st.txn(self.p, dict) as t:
+                t.data["a"] = 1
+                self.st.put(q, {"b": 1})                         # portée par la transaction externe
+                raise RuntimeError("abandon")
+        self.assertIsNone(self.st.get(q))
+        self.assertIsNone(self.st.get(self.p))
+
+    def test_concurrent_processes_lose_no_update(self):
+        db = self.dir / "mp.db"
+        procs = [subprocess.Popen([sys.executable, "-c", _BUMP, str(BACKEND), str(db), str(self.p), "50"],
+                                  cwd=os.getcwd()) for _ in range(3)]
+        self.assertEqual([pr.wait(60) for pr in procs], [0, 0, 0])
+        self.assertEqual(core.SqliteStateBackend(db, mirror="off").get(self.p), {"n": 150})
+
+    def test_mirror_written_at_checkpoint_only(self):
+        self.st.put(self.p, {"v": 1})
+        self.st.put(self.p, {"v": 2})
+        self.assertFalse(self.p.exists())
+        self.assertEqual(self.st.stats()["mirror_pending"], 1)
+        self.assertEqual(self.st.checkpoint(), 1)
+        self.assertEqual(json.loads(self.p.read_text(encoding="utf-8")), {"v": 2})
+        self.assertEqual(self.st.stats()["mirror_pending"], 0)
+
+    def test_unmirrored_write_wins_over_stale_file(self):
+        self.st.put(self.p, {"v": 1}); self.st.checkpoint()
+        self.st.put(self.p, {"v": 2})                             # fichier miroir en retard
+        self.assertEqual(self.st.get(self.p), {"v": 2})
+        self.st.checkpoint()
+        self.p.write_text(json.dumps({"v": 9}), encoding="utf-8")  # écrivain direct: réimporté
+        self.assertEqual(self.st.get(self.p), {"v": 9})
+
+    def test_sync_mirror_writes_every_put(self):
+        st = core.SqliteStateBackend(self.dir / "sync.db", mirror="sync")
+        st.put(self.p, {"v": 1})
+        self.assertEqual(json.loads(self.p.read_text(encoding="utf-8")), {"v": 1})
+
+
+class RateLimitTest(unittest.TestCase):
+    def setUp(self):
+        core.state_put(core.ROOT / "ratelimit.json", {"win": 0, "count": 0})
+        self.addCleanup(core.state_put, core.ROOT / "ratelimit.json", {"win": 0, "count": 0})
+        self.orch = core.Orchestrator(core.Verrou(strict=True), core.Memory.load(),
+                                      core.LanguageEngine(core.SkillRegistry()), core.LogicEngine(), core.ActionEngine())
+
+    def test_base_handle_counts_through_state_store(self):
+        self.assertIs(core._original_handle, core._st_base_handle)
+        for _ in range(30):
+            self.assertNotIn("Limite de débit", core._original_handle(self.orch, "bonjour"))
+        self.assertEqual(core.state_get(core.ROOT / "ratelimit.json")["count"], 30)
+        self.assertEqual(core._original_handle(self.orch, "bonjour"),
+                         "Limite de débit atteinte, réessaye dans une minute.")
+
+
+if __name__ == "__main__":
+    unittest.main()